@@ -0,0 +1,418 @@
+# benchmarks/bench_hot_path.py
+"""
+检测热路径基准测试
+
+用录制的画面（视频 / 图片文件夹）或可复现的合成画面，在多种窗口尺寸、区域切分方式、
+检测模式和结果传输方式下直接驱动生产代码：主进程用采集进程的 WindowCapture 把帧源的
+每一帧写入共享帧环，检测进程运行 detection.detector 中的 run_region（进程模式）或
+run_regions_batched（批量模式），结果通过 Manager().list()（旧实现）或 SharedDetectionBuffer
+发布，主进程读取结果快照。帧差门控等生产逻辑都包含在内。
+
+输出每种组合的帧率、各阶段耗时百分位（采集和各区域，取自生产代码写入的 SharedStageMetrics，
+为最近 METRICS_WINDOW 个样本）、每个检测进程的内存占用和 CPU 时间，
+写入 JSON 文件，可用 benchmarks/compare.py 对比不同提交的结果。
+
+用法（在项目根目录执行）：
+    python -m benchmarks.bench_hot_path --model none --frames 200
+    python -m benchmarks.bench_hot_path --model yolov8n.pt --sizes 1080p --layouts 2x2,3x3@32 --video session.mp4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detection.capture import WindowCapture
+from detection.detector import load_model, run_region, run_regions_batched
+from detection.frame_ring import SharedFrameRing
+from detection.metrics import CAPTURE_SLOT, SharedStageMetrics, StageRecorder, slot_names
+from detection.shared_results import SharedDetectionBuffer
+from detection.sources import FrameSource, ImageFolderSource, SyntheticSource, VideoFileSource
+from utils.tiling import tile_region
+
+WINDOW_SIZES = {
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+
+RESULTS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+# ---------------- 结果传输方式 ----------------
+
+class ManagerBuffer:
+    """旧实现：每个区域一个 Manager().list()，逐个框 append；接口与 SharedDetectionBuffer 的写入端相同"""
+
+    def __init__(self, lists, frame_ids):
+        self.lists = lists
+        self.frame_ids = frame_ids
+
+    def set_names(self, names):
+        pass
+
+    def publish(self, region_index, records, frame_id=0):
+        self.lists[region_index][:] = []
+        for record in records:
+            self.lists[region_index].append(list(record))
+        self.frame_ids[region_index] = frame_id
+
+
+class ManagerTransport:
+    def __init__(self, num_regions):
+        self.manager = multiprocessing.Manager()
+        self.buffer = ManagerBuffer([self.manager.list() for _ in range(num_regions)],
+                                    self.manager.list([0] * num_regions))
+
+    def for_worker(self):
+        return self.buffer
+
+    def frame_ids(self):
+        return list(self.buffer.frame_ids)
+
+    def snapshot(self):
+        return [item for items in self.buffer.lists for item in items]
+
+    def close(self):
+        self.manager.shutdown()
+
+
+class SharedTransport:
+    """共享内存检测结果缓冲区"""
+
+    def __init__(self, num_regions):
+        self.buffer = SharedDetectionBuffer(num_regions)
+
+    def for_worker(self):
+        return self.buffer
+
+    def frame_ids(self):
+        return self.buffer.snapshot()[0]
+
+    def snapshot(self):
+        return self.buffer.snapshot()[1]
+
+    def close(self):
+        self.buffer.close()
+
+
+TRANSPORTS = {"manager": ManagerTransport, "shared": SharedTransport}
+
+
+# ---------------- 推理后端 ----------------
+
+class NullModel:
+    """不做推理的假模型（接口与 ultralytics 模型相同），每张图返回固定数量的框，
+    用于单独衡量采集、切片、门控、转换和传输的开销"""
+
+    names = {k: f"class{k}" for k in range(80)}
+
+    def __init__(self, num_boxes, seed=0):
+        rng = np.random.default_rng(seed)
+        xy = rng.uniform(0, 200, size=(num_boxes, 2))
+        wh = rng.uniform(10, 80, size=(num_boxes, 2))
+        boxes = np.concatenate([xy, xy + wh, rng.uniform(0.5, 1, (num_boxes, 1)),
+                                rng.integers(0, 80, (num_boxes, 1))], axis=1)
+        self.result = SimpleNamespace(boxes=SimpleNamespace(data=boxes), speed={})
+
+    def __call__(self, images, **kwargs):
+        return [self.result] * (len(images) if isinstance(images, list) else 1)
+
+
+def _load_model(model_path, num_boxes):
+    if model_path in (None, "", "none"):
+        return NullModel(num_boxes), None
+    return load_model(model_path)
+
+
+class ClipSource(FrameSource):
+    """循环播放预先读入内存、已缩放到窗口尺寸的帧（录制的视频 / 图片）"""
+
+    def __init__(self, clip):
+        self.clip = clip
+        self._index = 0
+
+    def size(self):
+        return self.clip[0].shape[1], self.clip[0].shape[0]
+
+    def read(self, out=None):
+        frame = self.clip[self._index % len(self.clip)]
+        self._index += 1
+        return self._emit(frame, out)
+
+
+# ---------------- 检测进程 ----------------
+
+def _rss_mb():
+    """当前进程内存占用（MB）；没有 psutil 时退化为峰值 RSS"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2 ** 20, "rss"
+    except ImportError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return (peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024), "peak_rss"
+    except ImportError:
+        return None, None
+
+
+def _cpu_seconds():
+    t = os.times()
+    return t.user + t.system
+
+
+def bench_worker(worker_index, mode, regions, app_region, frame_ring, result_buffer, stage_metrics, model_path,
+                 num_boxes, measure_event, stop_event, messages):
+    """加载模型后运行生产检测循环，直到主进程置位 stop_event；CPU 时间从 measure_event（预热结束）开始计算"""
+    try:
+        model, device = _load_model(model_path, num_boxes)
+        cpu_start = [None]
+
+        def mark_measure_start():
+            measure_event.wait()
+            cpu_start[0] = _cpu_seconds()
+
+        threading.Thread(target=mark_measure_start, daemon=True).start()
+        messages.put({"ready": worker_index})
+        if mode == "batched":
+            run_regions_batched(model, device, regions, app_region, frame_ring, result_buffer, target_fps=0,
+                                metrics=stage_metrics, stop_event=stop_event)
+        else:
+            run_region(model, device, regions[0], app_region, frame_ring, result_buffer, worker_index,
+                       target_fps=0, metrics=stage_metrics, stop_event=stop_event)
+
+        rss, rss_kind = _rss_mb()
+        messages.put({
+            "done": worker_index,
+            "cpu_s": round(_cpu_seconds() - (cpu_start[0] or 0.0), 3),
+            "rss_mb": None if rss is None else round(rss, 1),
+            "rss_kind": rss_kind,
+        })
+    except Exception as e:
+        messages.put({"error": worker_index, "message": f"{type(e).__name__}: {e}"})
+
+
+# ---------------- 主流程 ----------------
+
+def parse_layout(text):
+    """"2x2" 或 "3x3@32"（@ 后为重叠像素）"""
+    grid, _, overlap = text.partition("@")
+    rows, cols = (int(v) for v in grid.lower().split("x"))
+    return rows, cols, int(overlap or 0)
+
+
+def load_clip(args, width, height):
+    """读取最多 clip_frames 帧录制的画面并缩放到指定窗口尺寸，基准测试循环使用这些帧"""
+    source = VideoFileSource(args.video, loop=True) if args.video else ImageFolderSource(args.images, loop=True)
+    source.open()
+    try:
+        clip = []
+        while len(clip) < args.clip_frames:
+            frame = source.read()
+            if frame is None:
+                break
+            if (frame.shape[1], frame.shape[0]) != (width, height):
+                frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            clip.append(np.ascontiguousarray(frame))
+    finally:
+        source.close()
+    if not clip:
+        raise RuntimeError("没有读取到任何帧")
+    return clip
+
+
+def make_source(args, width, height):
+    """合成画面逐帧实时生成（计入采集耗时）；录制的画面预先读入内存"""
+    if args.video or args.images:
+        return ClipSource(load_clip(args, width, height))
+    return SyntheticSource(width, height, seed=args.seed)
+
+
+def _percentiles(samples_ms):
+    if not samples_ms:
+        return {}
+    p50, p95, p99 = np.percentile(samples_ms, (50, 95, 99))
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3),
+            "count": len(samples_ms)}
+
+
+def _wait_for(condition, timeout=600, poll=0.001):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise RuntimeError("等待检测进程处理完最后一帧超时")
+        time.sleep(poll)
+
+
+def run_case(args, source, size_name, layout, mode, transport_name):
+    width, height = source.size()
+    rows, cols, overlap = parse_layout(layout)
+    app_region = {"left": 0, "top": 0, "width": width, "height": height}
+    regions = tile_region(app_region, rows, cols, overlap, min_tile_size=0)
+    groups = [regions] if mode == "batched" else [[region] for region in regions]
+
+    ctx = multiprocessing.get_context("spawn")
+    transport = TRANSPORTS[transport_name](len(regions))
+    frame_ring = SharedFrameRing(height, width, num_readers=len(groups))
+    stage_metrics = SharedStageMetrics(len(slot_names(len(regions))))
+    measure_event = ctx.Event()
+    stop_event = ctx.Event()
+    messages = ctx.Queue()
+    workers = []
+    try:
+        for worker_index, group in enumerate(groups):
+            p = ctx.Process(target=bench_worker, args=(worker_index, mode, group, app_region, frame_ring,
+                                                       transport.for_worker(), stage_metrics, args.model, args.boxes,
+                                                       measure_event, stop_event, messages))
+            p.daemon = True
+            p.start()
+            workers.append(p)
+
+        # 等待所有检测进程加载完模型
+        ready = 0
+        while ready < len(workers):
+            message = messages.get(timeout=600)
+            if "error" in message:
+                raise RuntimeError(f"检测进程 {message['error']} 出错：{message['message']}")
+            ready += 1
+
+        # 主进程充当采集进程：与 capture_frames 相同，等所有检测进程取走上一帧后再截下一帧
+        source.open()
+        capture = WindowCapture(source, frame_ring, recorder=StageRecorder(stage_metrics, CAPTURE_SLOT))
+        snapshot_ms = []
+        cpu_start = _cpu_seconds()
+        t_start = time.perf_counter()
+        for k in range(args.warmup + args.frames):
+            frame_ring.wait_for_readers(timeout=600)
+            if k == args.warmup:
+                snapshot_ms = []
+                cpu_start = _cpu_seconds()
+                t_start = time.perf_counter()
+                measure_event.set()
+            if not capture.grab():
+                raise RuntimeError("帧源提前结束")
+            capture.recorder.frame_done()
+            start = time.perf_counter()
+            transport.snapshot()
+            snapshot_ms.append((time.perf_counter() - start) * 1000.0)
+        _wait_for(lambda: min(transport.frame_ids()) >= frame_ring.latest_id)
+        wall = time.perf_counter() - t_start
+        main_cpu = _cpu_seconds() - cpu_start
+        capture.recorder.publish()
+        stop_event.set()
+
+        reports = []
+        while len(reports) < len(workers):
+            message = messages.get(timeout=600)
+            if "error" in message:
+                raise RuntimeError(f"检测进程 {message['error']} 出错：{message['message']}")
+            reports.append(message)
+        for p in workers:
+            p.join(timeout=5)
+        metrics = stage_metrics.read(slot_names(len(regions)))
+    finally:
+        stop_event.set()
+        source.close()
+        for p in workers:
+            if p.is_alive():
+                p.terminate()
+        frame_ring.close()
+        transport.close()
+        stage_metrics.close()
+
+    reports.sort(key=lambda r: r["done"])
+    for report, group in zip(reports, groups):
+        report["regions"] = {region["id"]: metrics[f"region{region['id']}"]["stages"] for region in group}
+    return {
+        "size": size_name,
+        "width": width,
+        "height": height,
+        "layout": layout,
+        "tiles": len(regions),
+        "mode": mode,
+        "transport": transport_name,
+        "frames": args.frames,
+        "wall_s": round(wall, 3),
+        "fps": round(args.frames / wall, 2) if wall > 0 else None,
+        "cpu_s": round(main_cpu + sum(r["cpu_s"] for r in reports), 3),
+        "main_cpu_s": round(main_cpu, 3),
+        "capture": metrics["capture"]["stages"],
+        "snapshot_ms": _percentiles(snapshot_ms),
+        "workers": [{k: r[k] for k in ("done", "cpu_s", "rss_mb", "rss_kind", "regions")} for r in reports],
+    }
+
+
+def _git_commit():
+    try:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=root,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检测热路径基准测试")
+    parser.add_argument("--model", default="none", help="模型路径；none 表示不推理，只测流水线开销")
+    parser.add_argument("--sizes", default="720p,1080p,4k", help=f"窗口尺寸，可选 {','.join(WINDOW_SIZES)}")
+    parser.add_argument("--layouts", default="2x2,3x3@32,4x4@64", help="区域切分，如 2x2 或 3x3@32（@ 后为重叠像素）")
+    parser.add_argument("--modes", default="process,batched", help="检测模式：process,batched")
+    parser.add_argument("--transports", default="manager,shared", help=f"结果传输方式：{','.join(TRANSPORTS)}")
+    parser.add_argument("--frames", type=int, default=200, help="计时帧数")
+    parser.add_argument("--warmup", type=int, default=10, help="预热帧数（不计时）")
+    parser.add_argument("--clip-frames", type=int, default=16, help="录制的画面预先读入内存循环使用的帧数")
+    parser.add_argument("--boxes", type=int, default=20, help="--model none 时每个区域返回的框数")
+    parser.add_argument("--video", help="录制的视频文件")
+    parser.add_argument("--images", help="录制的图片文件夹")
+    parser.add_argument("--seed", type=int, default=0, help="合成画面随机种子")
+    parser.add_argument("--output", help="结果 JSON 路径（默认 benchmarks/results/<时间>_<提交>.json）")
+    args = parser.parse_args()
+
+    commit = _git_commit()
+    meta = {
+        "commit": commit,
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "model": args.model,
+        "source": args.video or args.images or "synthetic",
+        "frames": args.frames,
+        "warmup": args.warmup,
+    }
+    results = []
+    for size_name in args.sizes.split(","):
+        width, height = WINDOW_SIZES[size_name.lower()]
+        source = make_source(args, width, height)
+        for layout in args.layouts.split(","):
+            for mode in args.modes.split(","):
+                for transport_name in args.transports.split(","):
+                    result = run_case(args, source, size_name, layout, mode, transport_name)
+                    results.append(result)
+                    print(f"{size_name:>6} {layout:>8} {mode:>8} {transport_name:>8}: "
+                          f"{result['fps']:8.2f} FPS  CPU {result['cpu_s']:7.2f}s  "
+                          f"快照 p95 {result['snapshot_ms'].get('p95', 0):.3f}ms")
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_FOLDER, exist_ok=True)
+        output = os.path.join(RESULTS_FOLDER, f"{datetime.now():%Y%m%d_%H%M%S}_{commit or 'unknown'}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": results}, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入：{output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# benchmarks/compare.py
+"""
+对比两次基准测试结果（例如两个提交），按 尺寸/切分/模式/传输方式 逐项列出帧率和耗时变化
+
+用法：
+    python -m benchmarks.compare benchmarks/results/base.json benchmarks/results/new.json
+"""
+import argparse
+import json
+
+
+def _key(result):
+    return result["size"], result["layout"], result["mode"], result["transport"]
+
+
+def _stage_p95(result, stage):
+    """所有区域中该阶段 p95 的最大值（毫秒）"""
+    values = [stages[stage]["p95"] for worker in result["workers"] for stages in worker["regions"].values()
+              if stage in stages]
+    return max(values) if values else None
+
+
+def _delta(old, new):
+    if old in (None, 0) or new is None:
+        return "    -"
+    return f"{(new - old) / old * 100:+6.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比两次基准测试结果")
+    parser.add_argument("base", help="基准结果 JSON")
+    parser.add_argument("new", help="新结果 JSON")
+    parser.add_argument("--stage", default="inference", help="对比哪个阶段的 p95 耗时")
+    args = parser.parse_args()
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+
+    print(f"基准：{base['meta'].get('commit')}  ({base['meta'].get('time')})")
+    print(f"新值：{new['meta'].get('commit')}  ({new['meta'].get('time')})")
+    print(f"{'尺寸':>6} {'切分':>8} {'模式':>8} {'传输':>8} | {'FPS 基准':>10} {'FPS 新':>10} {'变化':>7} | "
+          f"{args.stage + ' p95':>16} {'变化':>7} | {'CPU 秒变化':>9}")
+
+    base_results = {_key(r): r for r in base["results"]}
+    for result in new["results"]:
+        old = base_results.get(_key(result))
+        if old is None:
+            continue
+        old_p95 = _stage_p95(old, args.stage)
+        new_p95 = _stage_p95(result, args.stage)
+        p95_text = "-" if new_p95 is None else f"{new_p95:.2f}ms"
+        print(f"{result['size']:>6} {result['layout']:>8} {result['mode']:>8} {result['transport']:>8} | "
+              f"{old['fps'] or 0:10.2f} {result['fps'] or 0:10.2f} {_delta(old['fps'], result['fps']):>7} | "
+              f"{p95_text:>16} {_delta(old_p95, new_p95):>7} | {_delta(old['cpu_s'], result['cpu_s']):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,128 @@
 # config.py
 MODEL_PATH = "yolov8n.pt"
 DEFAULT_APP_NAME = "Chrome"
-REGION_DIVISIONS = 4  # 可配置是否要动态调整
+# 区域切分配置：TILE_ROWS × TILE_COLS 网格，相邻区域重叠 TILE_OVERLAP 像素，
+# 单个区域边长不足 MIN_TILE_SIZE 时自动减少行/列数
+TILE_ROWS = 2
+TILE_COLS = 2
+TILE_OVERLAP = 32
+MIN_TILE_SIZE = 160
+REGION_DIVISIONS = TILE_ROWS * TILE_COLS
+
+# 跨区域合并：重叠区域内的同类检测框按 NMS 或加权框融合（WBF）合并
+MERGE_METHOD = "nms"  # "nms" 或 "wbf"
+MERGE_MATCH_METRIC = "ios"  # "iou"，或 "ios"（交集 / 较小框面积，适合被区域边界截断的框）
+MERGE_THRESHOLD = 0.5
+
+# 检测模式："process" 每个区域一个进程（各自加载模型）；"batched" 单进程单模型，所有区域一次批量推理；
+# "roi" 单进程，低频整窗粗检 + 高频原分辨率 ROI 复检（见下方 ROI 配置）
+DETECTION_MODES = {"process": "进程/区域", "batched": "批量", "roi": "ROI 聚焦"}
+DEFAULT_DETECTION_MODE = "process"
 
 # 模型配置
 MODELS_FOLDER = "models"  # 本地模型文件夹路径
 DEFAULT_MODEL = "yolov8n.pt"  # 默认模型文件名
 
 # 支持的模型文件扩展名
-SUPPORTED_MODEL_EXTENSIONS = [".pt", ".pth", ".onnx", ".engine"]
\ No newline at end of file
+SUPPORTED_MODEL_EXTENSIONS = [".pt", ".pth", ".onnx", ".engine"]
+
+# 检测结果共享内存配置
+MAX_DETECTIONS_PER_REGION = 256  # 每个区域每帧最多保存的检测框数量
+
+# 帧采集配置
+FRAME_RING_SLOTS = 4  # 共享帧环槽位数
+READER_WAIT_TIMEOUT = 1.0  # 采集进程等待区域子进程取帧的最长时间（秒）
+
+# 帧差门控：区域画面变化低于阈值时跳过推理，复用上一次的检测结果
+CHANGE_THRESHOLD = 0.01  # 缩小灰度图的平均绝对差（0~1），设为 0 关闭门控
+FORCE_REFRESH_INTERVAL = 2.0  # 即使画面未变化，也至少每隔多少秒强制推理一次
+CHANGE_DETECTION_SIZE = 64  # 比较用灰度图的边长（像素）
+
+# 帧率控制：采集、检测和显示循环的目标帧率与 CPU 预算
+DEFAULT_TARGET_FPS = 15  # 0 表示不限速
+CPU_BUDGET = 0.75  # 每个循环允许占用的时间比例（0~1]，1 表示不额外让出 CPU
+
+# 性能统计：各阶段耗时滚动窗口与定期 JSONL 转储
+METRICS_WINDOW = 256  # 每个阶段保留最近多少个样本计算 p50/p95/p99
+METRICS_PUBLISH_INTERVAL = 0.5  # 子进程把统计写入共享内存的间隔（秒）
+METRICS_JSONL_PATH = None  # 设置为文件路径（如 "metrics.jsonl"）即定期追加写入统计快照
+METRICS_DUMP_INTERVAL = 5.0  # JSONL 转储间隔（秒）
+
+# 界面更新通道：后台线程只投递最新画面和事件，由 Tk 主循环定时取出
+UI_REFRESH_FPS = 60  # 主循环取画面/事件的频率
+UI_EVENT_QUEUE_SIZE = 1000  # 事件队列上限，满时丢弃最旧的事件
+UI_MAX_EVENTS_PER_TICK = 200  # 每次刷新最多处理的事件数，避免阻塞界面
+
+# 日志面板：消息先缓冲，按固定频率合并为一次插入，并限制面板行数
+LOG_FLUSH_HZ = 4  # 每秒最多刷新面板的次数
+LOG_MAX_LINES = 2000  # 面板最多保留的行数，超出时删除最早的行
+LOG_MAX_PENDING = 1000  # 两次刷新之间最多缓冲的消息数，超出时丢弃最旧的消息
+LOG_FILE_PATH = None  # 设置为文件路径（如 "logs/detection.log"）即同时写入滚动日志文件
+LOG_FILE_MAX_BYTES = 1024 * 1024  # 单个日志文件的大小上限
+LOG_FILE_BACKUPS = 3  # 保留的历史日志文件数
+
+# 常驻工作进程：加载模型后用一张空白画面推理一次预热
+WARMUP_SIZE = 640
+
+# 工作进程健康监控：心跳、卡死判定与崩溃后按指数退避自动重启
+MAX_POOL_WORKERS = 16  # 常驻检测工作进程数上限（健康状态表的槽位数）
+HEARTBEAT_INTERVAL = 0.5  # 空闲工作进程的心跳间隔（秒）；运行中每个节拍都会更新心跳
+WORKER_STALL_TIMEOUT = 10.0  # 运行中的工作进程超过该时间没有心跳即判定为卡死并重启
+SUPERVISOR_INTERVAL = 0.5  # 监控线程的检查间隔（秒）
+RESTART_BACKOFF_BASE = 1.0  # 第一次重启前的等待时间（秒），之后每次翻倍
+RESTART_BACKOFF_MAX = 30.0  # 重启等待时间上限（秒）
+RESTART_BACKOFF_RESET = 30.0  # 连续正常运行超过该时间后重置退避计数
+MODEL_LOAD_MAX_FAILURES = 3  # 连续加载模型失败该次数后不再重启（文件损坏等确定性错误），本次会话报错结束
+
+# 窗口跟踪：定时读取目标窗口位置/尺寸，移动或缩放时实时更新区域切分，最小化时暂停截图
+WINDOW_POLL_INTERVAL = 0.2  # 读取窗口几何信息的间隔（秒）
+WINDOW_RING_HEADROOM = 1.25  # 帧环按窗口宽高的多少倍分配，窗口在此范围内放大无需重启会话
+
+# CPU 线程规划：把可用核心分给各检测工作进程，限制每个进程的 torch/OpenCV/BLAS 线程数，避免超额订阅
+THREAD_PLANNING = True  # False 时保持各库的默认线程数
+RESERVED_CORES = 1  # 留给主进程（界面）和采集进程的核心数
+PIN_WORKER_CORES = False  # True 时把每个工作进程绑定到分配给它的核心（Linux 用 os.sched_setaffinity，其他系统需要 psutil）
+
+# ONNX Runtime 后端：.onnx 模型直接用 onnxruntime 推理，工作进程不导入 torch/ultralytics；未安装 onnxruntime 时回退到 ultralytics
+ONNX_RUNTIME_BACKEND = True
+ONNX_PROVIDERS = ["CPUExecutionProvider"]
+ONNX_IMGSZ = 640  # 模型输入尺寸为动态且导出元数据中没有 imgsz 时使用
+ONNX_IOU_THRESHOLD = 0.7  # NMS 的 IoU 阈值（与 ultralytics 默认值一致）
+ONNX_MAX_DETECTIONS = 300  # 每张图 NMS 后最多保留的检测框数
+ONNX_ALLOW_SPINNING = False  # 多个工作进程共享核心时关闭线程自旋等待，避免空转占用 CPU
+
+# 跟踪模式：每 KEYFRAME_INTERVAL 帧做一次完整检测，中间帧用稀疏光流移动上一帧的检测框，并为每个目标分配稳定的 track_id
+TRACKING_ENABLED = False  # 默认值，界面上可在启动前切换
+KEYFRAME_INTERVAL = 5  # 关键帧间隔（帧），1 表示每帧都检测（仍然分配 track_id）
+TRACK_IOU_THRESHOLD = 0.3  # 关键帧上检测框与已有轨迹关联的最小 IoU
+TRACK_MAX_MISSED = 2  # 轨迹连续多少个关键帧未匹配到检测框后删除
+TRACK_MIN_QUALITY = 0.5  # 光流成功跟上的轨迹比例低于该值时，下一帧提前做关键帧
+TRACK_FLOW_SCALE = 0.5  # 计算光流前把区域画面缩小的比例
+
+# ROI 聚焦模式：整窗低频粗检，其余节拍只把最近检测框和画面运动区域周围的原分辨率裁剪批量推理，小目标不会被缩没
+ROI_SIZE = 640  # ROI 裁剪边长（原分辨率像素；与模型输入尺寸一致时不缩放）
+ROI_MAX_PER_TICK = 4  # 每个节拍最多推理的 ROI 数（推理预算）
+ROI_COARSE_INTERVAL = 1.0  # 整窗粗检间隔（秒），粗检的节拍不再推理 ROI
+ROI_HOLD_TIME = 1.5  # 检测框作为 ROI 种子保留的时间（秒）
+ROI_MOTION_WIDTH = 160  # 运动检测用缩小灰度图的宽度（像素）
+ROI_MOTION_THRESHOLD = 0.08  # 缩小灰度图逐像素差（0~1）超过该值视为运动
+ROI_MOTION_MIN_AREA = 4  # 运动区域的最小面积（缩小图像素）
+
+# 模型级联：小模型（低输入尺寸）持续筛查，只有报告了候选类别（置信度不低于 CASCADE_TRIGGER_CONF）的区域
+# 或定期抽查时才调用界面上选择的大模型复检；两个模型都常驻在工作进程中
+CASCADE_ENABLED = False  # 默认值，界面上可在启动前切换
+CASCADE_FAST_MODEL = "yolov8n.pt"  # 常驻筛查的小模型
+CASCADE_FAST_IMGSZ = 320  # 小模型的输入尺寸（None 表示使用模型默认值；固定输入尺寸的 .onnx 模型忽略）
+CASCADE_TRIGGER_CONF = 0.15  # 小模型报告的候选框置信度达到该值即交给大模型复检
+CASCADE_CLASSES = None  # 需要大模型复检的类别号列表（None 表示所有类别）；其余类别直接采用小模型的结果
+CASCADE_AUDIT_INTERVAL = 2.0  # 定期抽查间隔（秒）：到期的节拍不论小模型结果如何都用大模型复检，0 表示不抽查
+
+# 多窗口监控：所有窗口共用 MULTI_WINDOW_WORKERS 个检测工作进程（每个进程一份模型）和一个采集进程，
+# 按窗口的优先级（权重）、目标帧率和已用推理时间公平调度（见 detection/scheduler.py）
+MULTI_WINDOW_WORKERS = 2
+DEFAULT_WINDOW_PRIORITY = 1.0
+# 窗口的加权虚拟时间（推理耗时 / 优先级）最多领先其他等待或正在推理的窗口多少秒；超出后即使有空闲的工作进程
+# 也先让落后的窗口推理，因此工作进程数不少于窗口数时推理时间仍按优先级分配。调大可减少等待、提高总吞吐，
+# 但优先级的作用随之减弱
+WINDOW_SHARE_SLACK = 0.05
+WINDOW_LIST_SEPARATORS = ";；"  # 界面上多个窗口关键字之间的分隔符，关键字后加 @数字 指定优先级，如 "Chrome@2; 记事本"
@@ -0,0 +1,138 @@
+# detection/capture.py
+"""
+采集进程：每个节拍从帧源读取一帧写入共享帧环
+
+多窗口模式下一个采集进程轮流为所有窗口截图（capture_windows），每个窗口只在其上一帧
+已被检测工作进程取走、并且按调度表到期时才截图。
+"""
+import time
+
+from config import READER_WAIT_TIMEOUT
+from detection.metrics import StageRecorder, CAPTURE_SLOT
+from detection.pacing import RateController
+
+
+class WindowCapture:
+    """单个窗口的截图：跟随共享布局更新截图区域，把帧源的一帧直接写入帧环"""
+
+    def __init__(self, source, frame_ring, layout=None, recorder=None):
+        self.source = source
+        self.frame_ring = frame_ring
+        self.layout = layout
+        self.recorder = recorder or StageRecorder()
+        self.layout_version = 0
+        self.frame_size = (None, None)
+        self.ended = False
+        self.last_grab = 0.0  # 最近一次截图的时间（time.monotonic）
+
+    def ready(self):
+        """布局暂停（窗口最小化）时返回 False；布局变化后按新区域截图，并在帧头记录布局版本"""
+        if self.layout is None:
+            return True
+        if self.layout.paused:
+            return False
+        if self.layout.version != self.layout_version:
+            self.layout_version, app_region, _ = self.layout.get()
+            self.source.set_region(app_region)
+            self.frame_size = (app_region["height"], app_region["width"])
+        return True
+
+    def grab(self):
+        """截一帧写入帧环；帧源已读完时标记帧环结束并返回 False"""
+        frame_id, slot = self.frame_ring.begin_write(*self.frame_size, layout=self.layout_version)
+        # 帧源直接写入共享内存槽位
+        start = time.perf_counter()
+        if self.source.read(out=slot) is None:
+            self.frame_ring.mark_ended()
+            self.ended = True
+            print(f"[采集进程] 帧源已结束：{self.source.describe()}")
+            return False
+        if self.source.timings:
+            for stage, seconds in self.source.timings.items():
+                self.recorder.record(stage, seconds)
+        else:
+            self.recorder.record("capture", time.perf_counter() - start)
+        self.frame_ring.commit(frame_id)
+        self.last_grab = time.monotonic()
+        return True
+
+
+def capture_frames(source, frame_ring, target_fps=None, metrics=None, stop_event=None, health=None, layout=None):
+    """stop_event 被置位（常驻工作进程结束本次会话）或帧源读完时退出；出错时打印后抛出，由工作进程上报
+
+    传入 layout（SharedLayout）时跟随窗口移动/缩放更新截图区域，布局暂停（窗口最小化）期间不截图。
+    """
+    try:
+        source.open()
+        pacer = RateController(target_fps)
+        recorder = StageRecorder(metrics, CAPTURE_SLOT)
+        capture = WindowCapture(source, frame_ring, layout, recorder)
+
+        while stop_event is None or not stop_event.is_set():
+            # 等待所有检测进程取走上一帧，保证一帧对应一次检测节拍
+            frame_ring.wait_for_readers(stop_event=stop_event)
+            if stop_event is not None and stop_event.is_set():
+                break
+            if health is not None:
+                health.beat()
+            if not capture.ready():
+                time.sleep(0.05)  # 窗口最小化，暂停截图
+                continue
+            pacer.restart()
+            if not capture.grab():
+                break
+            recorder.frame_done()
+            if health is not None:
+                health.frame_done()
+            pacer.tick()
+
+    except Exception as e:
+        print(f"[采集进程] 截图出错：{e}")
+        raise
+    finally:
+        source.close()
+
+
+def capture_windows(sources, frame_rings, scheduler, target_fps=None, metrics=None, stop_event=None, health=None,
+                    layouts=None):
+    """多窗口模式：轮流为各窗口截图，直到 stop_event 被置位或所有帧源都已读完
+
+    窗口的上一帧尚未被检测工作进程取走，或按调度表（SharedScheduler）尚未到期时跳过该窗口；
+    target_fps 为未单独设置帧率的窗口使用的目标帧率。
+    """
+    layouts = layouts or [None] * len(sources)
+    recorder = StageRecorder(metrics, CAPTURE_SLOT)
+    captures = [WindowCapture(source, frame_ring, layout, recorder)
+                for source, frame_ring, layout in zip(sources, frame_rings, layouts)]
+    try:
+        for source in sources:
+            source.open()
+        while (stop_event is None or not stop_event.is_set()) and not all(c.ended for c in captures):
+            if health is not None:
+                health.beat()
+            default_fps = getattr(target_fps, "value", target_fps)
+            grabbed = False
+            for index, capture in enumerate(captures):
+                if capture.ended:
+                    continue
+                now = time.monotonic()
+                # 上一帧尚未被取走时不截图（超时则认为读取方已退出，照常截图）
+                if not capture.frame_ring.readers_done() and now - capture.last_grab < READER_WAIT_TIMEOUT:
+                    continue
+                if not scheduler.due(index, now, default_fps) or not capture.ready():
+                    continue
+                if capture.grab():
+                    grabbed = True
+            if grabbed:
+                recorder.frame_done()
+                if health is not None:
+                    health.frame_done()
+            else:
+                time.sleep(0.001)  # 没有到期的窗口
+
+    except Exception as e:
+        print(f"[采集进程] 截图出错：{e}")
+        raise
+    finally:
+        for source in sources:
+            source.close()
@@ -0,0 +1,96 @@
+# detection/cascade.py
+"""
+模型级联：小模型持续筛查，大模型按需复检
+
+每个节拍先用小模型（低输入尺寸，CASCADE_FAST_IMGSZ）以较低的置信度阈值 CASCADE_TRIGGER_CONF 推理所有区域，
+只有报告了候选类别（CASCADE_CLASSES）的区域才交给大模型复检，每隔 CASCADE_AUDIT_INTERVAL 秒
+还会不论小模型结果如何整批复检一次，避免小模型漏检的目标一直得不到大模型检测。
+画面中没有候选目标时只需要小模型的推理量，出现候选目标后得到大模型的检测结果。
+
+ModelCascade 的调用方式与单个模型相同（见 detection/onnx_backend.py），
+run_region / run_regions_batched / run_roi 无需区分是否使用级联。
+"""
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from config import (CASCADE_FAST_MODEL, CASCADE_FAST_IMGSZ, CASCADE_TRIGGER_CONF, CASCADE_CLASSES,
+                    CASCADE_AUDIT_INTERVAL)
+
+CascadeBoxes = namedtuple("CascadeBoxes", ["data"])
+CascadeResult = namedtuple("CascadeResult", ["boxes", "speed"])
+
+
+def _to_numpy(data):
+    return data.cpu().numpy() if hasattr(data, "cpu") else np.asarray(data)
+
+
+def _add_speed(first, second):
+    """两次推理的各阶段耗时相加（毫秒，按单张图计）"""
+    return {key: (first.get(key) or 0.0) + (second.get(key) or 0.0) for key in set(first) | set(second)}
+
+
+def fast_model_path(enabled, path=CASCADE_FAST_MODEL):
+    """开启级联时返回小模型路径（文件不存在时抛出 FileNotFoundError），未开启时返回 None"""
+    if not enabled:
+        return None
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"级联小模型文件不存在：{path}")
+    return path
+
+
+class ModelCascade:
+    """fast 为常驻筛查的小模型，accurate 为复检用的大模型；检测结果的类别名称使用大模型的"""
+
+    def __init__(self, fast, accurate, fast_imgsz=CASCADE_FAST_IMGSZ, trigger_conf=CASCADE_TRIGGER_CONF,
+                 classes=CASCADE_CLASSES, audit_interval=CASCADE_AUDIT_INTERVAL):
+        self.fast = fast
+        self.accurate = accurate
+        self.names = accurate.names
+        self.fast_imgsz = fast_imgsz
+        self.trigger_conf = trigger_conf
+        self.classes = None if classes is None else np.asarray(classes)
+        self.audit_interval = audit_interval
+        self._last_audit = None
+        if fast.names != accurate.names:
+            print("⚠️ 级联的小模型与大模型类别不一致，小模型的检测结果按大模型的类别名称显示")
+
+    def _audit_due(self, now):
+        if not self.audit_interval:
+            return False
+        return self._last_audit is None or now - self._last_audit >= self.audit_interval
+
+    def __call__(self, source, conf=0.25, verbose=False, device=None):
+        """source 为单张 BGR 图或列表，返回每张图一个结果（boxes.data 为 (N, 6) 的 NumPy 数组）"""
+        frames = source if isinstance(source, (list, tuple)) else [source]
+        if not frames:
+            return []
+        now = time.monotonic()
+        audit = self._audit_due(now)
+        kwargs = {"imgsz": self.fast_imgsz} if self.fast_imgsz else {}
+        screened = self.fast(frames, conf=self.trigger_conf, verbose=False, device=device, **kwargs)
+
+        results = []
+        escalate = []
+        for k, result in enumerate(screened):
+            data = _to_numpy(result.boxes.data)
+            if self.classes is None:
+                candidate = np.ones(len(data), dtype=bool)
+            else:
+                candidate = np.isin(data[:, -1].astype(np.int64), self.classes)
+            if audit or candidate.any():
+                escalate.append(k)
+            # 不需要复检的类别直接采用小模型的结果（按调用方的置信度阈值过滤）
+            keep = (data[:, -2] >= conf) & ~candidate
+            results.append(CascadeResult(CascadeBoxes(data[keep]), dict(result.speed or {})))
+
+        if escalate:
+            if audit:
+                self._last_audit = now
+            checked = self.accurate([frames[k] for k in escalate], conf=conf, verbose=verbose, device=device)
+            for k, result in zip(escalate, checked):
+                speed = _add_speed(results[k].speed, result.speed or {})
+                results[k] = CascadeResult(CascadeBoxes(_to_numpy(result.boxes.data)), speed)
+        return results
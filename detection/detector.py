@@ -1,45 +1,340 @@
-import cv2
+import time
+
 import numpy as np
-import mss
-import torch
-from ultralytics import YOLO
 
+from config import WARMUP_SIZE, ONNX_RUNTIME_BACKEND
+from detection.gating import ChangeGate
+from detection.metrics import StageRecorder, region_slot
+from detection.pacing import RateController
+from detection.roi import RoiScheduler
+from detection.shared_results import DETECTION_DTYPE
+from detection.tracking import RegionTracker
 
-def detect_region(region, shared_list, i, model_path="yolov8n.pt"):
-    global sct
-    try:
-        model = YOLO(model_path)
-        names = model.names
-        monitor = {
-            "left": region["left"],
-            "top": region["top"],
-            "width": region["width"],
-            "height": region["height"]
-        }
-
-        sct = mss.mss()
-
-        while True:
-            sct_img = sct.grab(monitor)
-            frame = np.array(sct_img)
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
-            results = model(frame, conf=0.5, verbose=False, device=0 if torch.cuda.is_available() else "cpu")
-            shared_list[i][:] = []
-            for box in results[0].boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                conf = float(box.conf[0])
-                cls = int(box.cls[0])
-                cls_name = names[cls]
-                abs_x1 = region["left"] + x1
-                abs_y1 = region["top"] + y1
-                abs_x2 = region["left"] + x2
-                abs_y2 = region["top"] + y2
-                res = [abs_x1, abs_y1, abs_x2, abs_y2, conf, cls_name, region["id"],monitor]
-                shared_list[i].append(res)
 
+def _boxes_to_records(result, region):
+    """把单个区域的检测结果一次性转换为 DETECTION_DTYPE 结构化数组（绝对屏幕坐标）
+
+    boxes.data 为 (N, 6) 的 [x1, y1, x2, y2, conf, cls]（跟踪时在 conf 前多一列 id），
+    整块转为 NumPy 后加一次区域偏移；类别名称在显示时才查找。
+    """
+    data = result.boxes.data
+    if hasattr(data, "cpu"):
+        data = data.cpu().numpy()  # ultralytics 返回 torch 张量，ONNX Runtime 后端已是 NumPy 数组
+    offset = np.array([region["left"], region["top"], region["left"], region["top"]], dtype=np.int32)
+    boxes = data[:, :4].astype(np.int32) + offset
+    records = np.empty(len(data), dtype=DETECTION_DTYPE)
+    records["x1"], records["y1"], records["x2"], records["y2"] = boxes.T
+    records["conf"] = data[:, -2]
+    records["cls"] = data[:, -1]
+    records["region"] = region["id"]
+    records["track_id"] = -1
+    return records
+
+
+def _convert_results(result, region, recorder):
+    """转换检测结果，并记录 ultralytics 报告的预处理/推理/后处理耗时（毫秒，按单张图计）"""
+    start = time.perf_counter()
+    records = _boxes_to_records(result, region)
+    convert = time.perf_counter() - start
+    speed = getattr(result, "speed", None) or {}
+    recorder.record("preprocess", (speed.get("preprocess") or 0.0) / 1000.0)
+    recorder.record("inference", (speed.get("inference") or 0.0) / 1000.0)
+    recorder.record("postprocess", (speed.get("postprocess") or 0.0) / 1000.0 + convert)
+    return records
+
+
+def _region_slice(region, app_region):
+    """区域在窗口截图中的切片（帧环中保存的是整个 App 窗口）"""
+    x0 = region["left"] - app_region["left"]
+    y0 = region["top"] - app_region["top"]
+    return slice(y0, y0 + region["height"]), slice(x0, x0 + region["width"])
+
+
+def load_model(model_path):
+    """加载模型并用一次空白画面推理预热（首次推理会初始化 CUDA 上下文、算子等），返回 (model, device)
+
+    .onnx 模型优先使用 ONNX Runtime 后端（detection/onnx_backend.py），其余格式使用 ultralytics。
+    """
+    if ONNX_RUNTIME_BACKEND and model_path.lower().endswith(".onnx"):
+        try:
+            from detection.onnx_backend import OnnxDetector
+        except ImportError as e:
+            print(f"⚠️ 无法使用 ONNX Runtime 后端（{e}），改用 ultralytics 加载 {model_path}")
+        else:
+            model = OnnxDetector(model_path)
+            model.warmup()
+            return model, "cpu"
+
+    # 按需导入：使用 ONNX Runtime 后端的工作进程不加载 torch 和 ultralytics
+    import torch
+    from ultralytics import YOLO
+
+    model = YOLO(model_path)
+    device = 0 if torch.cuda.is_available() else "cpu"
+    model(np.zeros((WARMUP_SIZE, WARMUP_SIZE, 3), dtype=np.uint8), verbose=False, device=device)
+    return model, device
+
+
+def _stopped(stop_event):
+    return stop_event is not None and stop_event.is_set()
+
+
+def detect_region(region, app_region, frame_ring, result_buffer, i, model_path="yolov8n.pt", target_fps=None,
+                  metrics=None):
+    """进程/区域模式：每个子进程加载一份模型，只检测自己的区域"""
+    try:
+        model, device = load_model(model_path)
+        run_region(model, device, region, app_region, frame_ring, result_buffer, i, target_fps, metrics)
     except Exception as e:
         print(f"[子进程] 检测出错：{e}")
-    finally:
-        sct.close()
 
 
+def run_region(model, device, region, app_region, frame_ring, result_buffer, i, target_fps=None, metrics=None,
+               stop_event=None, health=None, layout=None, tracking=False):
+    """用已加载的模型检测单个区域，直到 stop_event 被置位（常驻工作进程复用同一份模型）
+
+    传入 layout 时按每帧截图所用的布局版本切片，窗口移动/缩放后无需重启。
+    tracking=True 时只在关键帧推理，中间帧由 RegionTracker 用光流移动检测框，并填写 track_id。
+    出错时直接抛出异常，由调用方（工作进程）上报健康状态并交给监控线程重启。
+    """
+    result_buffer.set_names(model.names)
+    tile = _region_slice(region, app_region)
+    gate = ChangeGate()
+    pacer = RateController(target_fps)
+    recorder = StageRecorder(metrics, region_slot(i))
+    tracker = RegionTracker(region["id"]) if tracking else None
+
+    frame_id = 0
+    layout_version = 0
+    records = np.empty(0, dtype=DETECTION_DTYPE)
+    while not _stopped(stop_event):
+        if health is not None:
+            health.beat()
+        frame_id, window = frame_ring.acquire(i, frame_id)
+        if window is None:
+            time.sleep(0.001)  # 暂无新帧
+            continue
+        pacer.restart()
+        if layout is not None and frame_ring.layout_of(frame_id) != layout_version:
+            # 窗口移动或缩放：按该帧所属的布局重新计算区域切片
+            layout_version, app_region, regions = layout.get(frame_ring.layout_of(frame_id))
+            region = regions[i]
+            tile = _region_slice(region, app_region)
+            gate.reset()
+            if tracker is not None:
+                tracker.reset()
+        frame = window[tile]  # 零拷贝切片
+        # 画面没有变化时跳过推理，沿用上一次的检测框
+        if gate.should_infer(frame):
+            if tracker is not None and not tracker.needs_keyframe():
+                with recorder.time("track"):
+                    records = tracker.propagate(frame, region)
+            else:
+                results = model(frame, conf=0.5, verbose=False, device=device)
+                records = _convert_results(results[0], region, recorder)
+                if tracker is not None:
+                    with recorder.time("track"):
+                        records = tracker.update(frame, records, region)
+        # 整帧结果一次写入共享内存，并记录所用帧号
+        with recorder.time("publish"):
+            result_buffer.publish(i, records, frame_id)
+        recorder.frame_done()
+        if health is not None:
+            health.frame_done()
+        pacer.tick()
+
+
+def detect_regions_batched(regions, app_region, frame_ring, result_buffer, model_path="yolov8n.pt", target_fps=None,
+                           metrics=None):
+    """批量模式：单个进程只加载一份模型，每个节拍把所有区域拼成一个 batch 做一次前向推理"""
+    try:
+        model, device = load_model(model_path)
+        run_regions_batched(model, device, regions, app_region, frame_ring, result_buffer, target_fps, metrics)
+    except Exception as e:
+        print(f"[批量检测进程] 检测出错：{e}")
+
+
+def run_regions_batched(model, device, regions, app_region, frame_ring, result_buffer, target_fps=None, metrics=None,
+                        stop_event=None, health=None, layout=None, tracking=False):
+    """用已加载的模型批量检测所有区域，直到 stop_event 被置位；layout、tracking 的用法同 run_region，出错时直接抛出异常"""
+    result_buffer.set_names(model.names)
+    tiles = [_region_slice(region, app_region) for region in regions]
+    gates = [ChangeGate() for _ in regions]
+    pacer = RateController(target_fps)
+    recorders = [StageRecorder(metrics, region_slot(i)) for i in range(len(regions))]
+    trackers = [RegionTracker(region["id"]) for region in regions] if tracking else None
+
+    frame_id = 0
+    layout_version = 0
+    records = [np.empty(0, dtype=DETECTION_DTYPE) for _ in regions]
+    while not _stopped(stop_event):
+        if health is not None:
+            health.beat()
+        frame_id, window = frame_ring.acquire(0, frame_id)
+        if window is None:
+            time.sleep(0.001)  # 暂无新帧
+            continue
+        pacer.restart()
+        if layout is not None and frame_ring.layout_of(frame_id) != layout_version:
+            layout_version, app_region, regions = layout.get(frame_ring.layout_of(frame_id))
+            tiles = [_region_slice(region, app_region) for region in regions]
+            for gate in gates:
+                gate.reset()
+            for tracker in trackers or ():
+                tracker.reset()
+        # 只把画面有变化的区域放进 batch
+        changed = [i for i, tile in enumerate(tiles) if gates[i].should_infer(window[tile])]
+        if trackers is not None:
+            # 跟踪模式：非关键帧的区域用光流更新，不进入 batch
+            for i in [i for i in changed if not trackers[i].needs_keyframe()]:
+                with recorders[i].time("track"):
+                    records[i] = trackers[i].propagate(window[tiles[i]], regions[i])
+                changed.remove(i)
+        if changed:
+            batch = [window[tiles[i]] for i in changed]  # 零拷贝切片
+            results = model(batch, conf=0.5, verbose=False, device=device)
+            for i, result in zip(changed, results):
+                records[i] = _convert_results(result, regions[i], recorders[i])
+                if trackers is not None:
+                    with recorders[i].time("track"):
+                        records[i] = trackers[i].update(window[tiles[i]], records[i], regions[i])
+        # 按区域写入各自的槽位（未变化的区域沿用上一次结果）
+        for i in range(len(regions)):
+            with recorders[i].time("publish"):
+                result_buffer.publish(i, records[i], frame_id)
+            recorders[i].frame_done()
+        if health is not None:
+            health.frame_done()
+        pacer.tick()
+
+
+def run_roi(model, device, region, app_region, frame_ring, result_buffer, target_fps=None, metrics=None,
+            stop_event=None, health=None, layout=None):
+    """ROI 聚焦模式：整个窗口作为一个区域，低频粗检 + 高频原分辨率 ROI 复检（见 detection/roi.py）
+
+    layout 的用法同 run_region，出错时直接抛出异常。
+    """
+    result_buffer.set_names(model.names)
+    tile = _region_slice(region, app_region)
+    gate = ChangeGate()
+    pacer = RateController(target_fps)
+    recorder = StageRecorder(metrics, region_slot(0))
+    scheduler = RoiScheduler()
+
+    frame_id = 0
+    layout_version = 0
+    records = np.empty(0, dtype=DETECTION_DTYPE)
+    while not _stopped(stop_event):
+        if health is not None:
+            health.beat()
+        frame_id, window = frame_ring.acquire(0, frame_id)
+        if window is None:
+            time.sleep(0.001)  # 暂无新帧
+            continue
+        pacer.restart()
+        if layout is not None and frame_ring.layout_of(frame_id) != layout_version:
+            layout_version, app_region, regions = layout.get(frame_ring.layout_of(frame_id))
+            region = regions[0]
+            tile = _region_slice(region, app_region)
+            gate.reset()
+            scheduler.reset()
+        frame = window[tile]
+        if gate.should_infer(frame):
+            now = time.monotonic()
+            scheduler.update_motion(frame, region)
+            if scheduler.coarse_due(now):
+                # 粗检：整个窗口缩放到模型输入尺寸推理一次
+                results = model(frame, conf=0.5, verbose=False, device=device)
+                records = _convert_results(results[0], region, recorder)
+                scheduler.observe(records, [region], now, coarse=True)
+            else:
+                # 复检：最近检测框和运动区域周围的原分辨率裁剪拼成一个 batch
+                rois = scheduler.plan(region, now)
+                if rois:
+                    crops = [frame[_region_slice(roi, region)] for roi in rois]  # 零拷贝切片
+                    results = model(crops, conf=0.5, verbose=False, device=device)
+                    found = [_convert_results(result, roi, recorder) for result, roi in zip(results, rois)]
+                    records = scheduler.combine(records, found, rois, region)
+                    scheduler.observe(np.concatenate(found), rois, now)
+        with recorder.time("publish"):
+            result_buffer.publish(0, records, frame_id)
+        recorder.frame_done()
+        if health is not None:
+            health.frame_done()
+        pacer.tick()
+
+
+def _detect_window(model, device, frame_ring, result_buffer, layout, state, recorder):
+    """多窗口模式中处理已领取窗口的最新一帧；state 为该窗口在本进程中的状态，没有新帧时返回 False
+
+    窗口由多个工作进程轮流处理（同一时刻只有领取方在写）：区域最近一次发布的不是本进程上次处理的帧时，
+    本进程的参考帧已过期，画面可能在其他进程处理期间变化后又变回，必须重新推理。
+    """
+    frame_id, window = frame_ring.acquire(0, state[0])
+    if window is None:
+        return False
+    version = frame_ring.layout_of(frame_id)
+    if version != state[1]:
+        _, app_region, regions = layout.get(version)
+        state[1:] = [version, regions, [_region_slice(region, app_region) for region in regions],
+                     [ChangeGate() for _ in regions]]
+    _, _, regions, tiles, gates = state
+    published = [result_buffer.read_region(i) for i in range(len(regions))]
+    changed = []
+    for i, tile in enumerate(tiles):
+        if published[i][0] != state[0]:
+            gates[i].reset()
+        if gates[i].should_infer(window[tile]):
+            changed.append(i)
+    records = {}
+    if changed:
+        batch = [window[tiles[i]] for i in changed]  # 零拷贝切片
+        results = model(batch, conf=0.5, verbose=False, device=device)
+        for i, result in zip(changed, results):
+            records[i] = _convert_results(result, regions[i], recorder)
+    with recorder.time("publish"):
+        for i in range(len(regions)):
+            if i not in records:
+                records[i] = published[i][1]  # 画面未变化，沿用本进程上次发布的结果
+            result_buffer.publish(i, records[i], frame_id)
+    state[0] = frame_id
+    return True
+
+
+def run_scheduled(model, device, windows, scheduler, worker, target_fps=None, metrics=None, stop_event=None,
+                  health=None):
+    """多窗口模式：从共享调度表领取窗口，把该窗口最新一帧中画面有变化的区域拼成一个 batch 推理
+
+    windows 为各窗口的 (帧环, 检测结果缓冲区, 布局) 列表，区域几何按每帧所属的布局版本读取；
+    worker 为本工作进程的编号，target_fps 为未单独设置帧率的窗口使用的目标帧率（见 detection/scheduler.py）。
+    同一窗口会由不同的工作进程轮流处理：帧差门控的参考帧属于各工作进程，只有区域最近一次发布的
+    正是本进程上次处理的帧时才用它跳过推理，画面没有变化的区域沿用共享缓冲区中的上一次结果。
+    """
+    for _, result_buffer, _ in windows:
+        result_buffer.set_names(model.names)
+    scheduler.release_owned(worker)  # 重启前领取后未归还的窗口
+    pacer = RateController(0)  # 帧率由调度表控制，这里只按 CPU 预算限速
+    recorder = StageRecorder(metrics, region_slot(worker))
+    # 各窗口在本进程中的状态：[帧号, 布局版本, 区域列表, 区域切片, 帧差门控]
+    states = [[0, None, [], [], []] for _ in windows]
+
+    while not _stopped(stop_event):
+        if health is not None:
+            health.beat()
+        index = scheduler.claim(worker, [frame_ring.latest_id for frame_ring, _, _ in windows], time.monotonic(),
+                                getattr(target_fps, "value", target_fps))
+        if index is None:
+            time.sleep(0.001)  # 没有到期的窗口
+            continue
+        pacer.restart()
+        start = time.perf_counter()
+        try:
+            frame_ring, result_buffer, layout = windows[index]
+            if not _detect_window(model, device, frame_ring, result_buffer, layout, states[index], recorder):
+                continue
+        finally:
+            scheduler.release(index, time.perf_counter() - start)
+        recorder.frame_done()
+        if health is not None:
+            health.frame_done()
+        pacer.tick()
@@ -0,0 +1,391 @@
+# detection/engine.py
+"""
+无界面检测引擎
+
+负责采集进程、检测进程、共享内存帧环和检测结果缓冲区的完整生命周期，
+不依赖 Tkinter，可用于服务、基准测试和无显示器的 Linux CI。GUI 只是它的一个客户端。
+采集和检测在常驻工作进程池中运行（见 detection/worker_pool.py），停止后模型仍保持加载，
+再次开始时无需重新加载；不再使用时调用 shutdown() 结束工作进程。运行期间监控线程
+（见 detection/supervisor.py）检查各工作进程的心跳，崩溃或卡死的工作进程按指数退避自动重启，
+health() 返回各工作进程的健康状态。模型连续加载失败等无法通过重启恢复的错误记录在 error 中，
+results() 随之抛出 RuntimeError，调用方应结束本次会话。
+
+窗口移动或缩放时调用 update_region()（GUI 中由 utils/window_tracker.py 自动调用）：
+新的窗口区域和区域切分写入共享布局（detection/layout.py），工作进程下一个节拍生效，无需重启。
+启停和重新切分可以在任意线程中调用，彼此互斥；已停止的引擎不会被迟到的 update_region() 重新启动。
+latest()/results() 在同一把锁内读取，画面合成期间会话不会被另一个线程的重启关闭。
+
+用法：
+    engine = DetectionEngine()
+    engine.start({"left": 0, "top": 0, "width": 1280, "height": 720}, "yolov8n.pt")
+    for result in engine.results():
+        print(result.frame_id, len(result.detections))
+    engine.stop()
+    engine.shutdown()
+
+通过 source 参数可以用视频文件、图片文件夹或合成画面代替屏幕截图（见 detection/sources.py），
+以完全相同的流水线回放录制的会话：
+    engine.start(None, "yolov8n.pt", source=VideoFileSource("session.mp4"))
+"""
+import multiprocessing
+import threading
+import time
+from collections import namedtuple
+from contextlib import nullcontext
+
+import numpy as np
+
+from config import (CASCADE_ENABLED, DEFAULT_DETECTION_MODE, DEFAULT_TARGET_FPS,
+                    DETECTION_MODES, METRICS_JSONL_PATH, THREAD_PLANNING, TRACKING_ENABLED, WINDOW_RING_HEADROOM)
+from detection.cascade import fast_model_path
+from detection.frame_ring import SharedFrameRing
+from detection.layout import SharedLayout
+from detection.metrics import DISPLAY_SLOT, MetricsDumper, SharedStageMetrics, StageRecorder, slot_names
+from detection.postprocess import merge_tile_detections
+from detection.shared_results import SharedDetectionBuffer
+from detection.sources import ScreenSource
+from detection.supervisor import WorkerSupervisor
+from detection.threads import plan_threads
+from detection.worker_pool import WorkerPool
+from utils.tiling import tile_region
+
+# 一次检测结果：frame 为检测所用的窗口画面（BGR，按区域拼回各自的检测帧），
+# detections 为合并后的 DETECTION_DTYPE 数组（绝对屏幕坐标），names 为类别名称表
+DetectionResult = namedtuple("DetectionResult", ["frame_id", "frame", "detections", "names", "app_region"])
+
+
+def compose_result(frame_ring, layout, result_buffer, title="", with_frame=True, out=None, recorder=None):
+    """读取一个窗口的最新画面和检测结果，返回 DetectionResult；尚无画面时返回 None
+
+    with_frame、out 的用法同 DetectionEngine.latest()；recorder 用于记录合并重复框的耗时。
+    """
+    latest_id, latest = frame_ring.latest()
+    if latest is None:
+        return None
+    if callable(out):
+        out = out(*latest.shape[:2])
+
+    # 最新帧截图时的窗口区域和区域切分
+    layout_version, app_region, regions = layout.get(frame_ring.layout_of(latest_id))
+    app_region["title"] = title
+
+    # 当前最新的检测结果（一致快照）
+    frame_ids, detections = result_buffer.snapshot()
+    frame = None
+    if with_frame:
+        if out is not None and out.shape == latest.shape:
+            np.copyto(out, latest)
+            frame = out
+        else:
+            frame = latest.copy()
+        # 每个区域贴回其检测所用的那一帧，保证检测框与画面一一对应（只贴同一布局下截取的帧）
+        for region, frame_id in zip(regions, frame_ids):
+            if frame_id == latest_id:
+                continue
+            source = frame_ring.get(frame_id)
+            if source is None or frame_ring.layout_of(frame_id) != layout_version:
+                continue
+            x0 = region["left"] - app_region["left"]
+            y0 = region["top"] - app_region["top"]
+            tile = (slice(y0, y0 + region["height"]), slice(x0, x0 + region["width"]))
+            frame[tile] = source[tile]
+
+    # 合并重叠区域的重复框
+    with recorder.time("postprocess") if recorder is not None else nullcontext():
+        detections = merge_tile_detections(detections)
+    return DetectionResult(max(frame_ids), frame, detections, result_buffer.names(), app_region)
+
+
+def window_finished(window):
+    """window（带 frame_ring、result_buffer 的会话）的帧源已读完且所有区域都已处理完最后一帧"""
+    if window.frame_ring is None or not window.frame_ring.ended:
+        return False
+    frame_ids, _ = window.result_buffer.snapshot()
+    return min(frame_ids) >= window.frame_ring.latest_id
+
+
+def read_latest(engine, index=None, with_frame=True, out=None):
+    """在引擎锁内读取会话 engine._session(index) 的最新结果，引擎未运行或尚无画面时返回 None
+
+    持锁期间 stop()/update_region() 不会关闭或替换该会话，帧环、布局、检测结果缓冲区和窗口区域
+    都来自同一次会话，直到画面合成完成。
+    """
+    with engine._lock:
+        window = engine._session(index)
+        if window is None:
+            return None
+        return compose_result(window.frame_ring, window.layout, window.result_buffer,
+                              window.app_region.get("title", ""), with_frame, out, engine.display_recorder)
+
+
+def poll_results(engine, index=None, with_frame=True, poll_interval=0.005):
+    """迭代会话 engine._session(index) 新的检测结果，直到引擎停止或帧源结束
+
+    工作进程无法恢复（engine.error 不为 None）时抛出 RuntimeError，而不是一直等待新结果。
+    """
+    last_frame_id = 0
+    while engine.is_running:
+        # 不无限等待锁：stop() 持锁等待结果回调线程退出时，这里应尽快看到引擎已停止
+        if not engine._lock.acquire(timeout=poll_interval):
+            continue
+        try:
+            window = engine._session(index)
+            if window is None:
+                return
+            if engine.error is not None:
+                raise RuntimeError(engine.error)
+            finished = window_finished(window)
+            result = read_latest(engine, index, with_frame)
+        finally:
+            engine._lock.release()
+        if result is None or result.frame_id == last_frame_id:
+            if finished:
+                return
+            time.sleep(poll_interval)
+            continue
+        last_frame_id = result.frame_id
+        yield result
+
+
+class DetectionEngine:
+    def __init__(self, mode=DEFAULT_DETECTION_MODE, target_fps=DEFAULT_TARGET_FPS, on_result=None,
+                 metrics_path=METRICS_JSONL_PATH, tracking=TRACKING_ENABLED, cascade=CASCADE_ENABLED):
+        self.mode = mode
+        self.tracking = tracking  # 关键帧检测 + 光流跟踪（见 detection/tracking.py）
+        self.cascade = cascade  # 小模型筛查 + 大模型（model_path）按需复检（见 detection/cascade.py）
+        # 目标帧率放在共享内存中，运行期间修改 engine.target_fps.value 即可作用到子进程
+        self.target_fps = multiprocessing.Value("d", target_fps, lock=False)
+        self.on_result = on_result
+        self.app_region = None
+        self.regions = []
+        self.model_path = None
+        self.pool = None  # 首次 start() 时创建，跨会话保持
+        self.result_buffer = None
+        self.frame_ring = None
+        self.layout = None
+        self.source = None
+        self.metrics_path = metrics_path
+        self.stage_metrics = None
+        # 显示端（主进程）的耗时记录器，GUI 等客户端用它记录绘制、缩放和显示耗时
+        self.display_recorder = StageRecorder()
+        self._metrics_dumper = None
+        self._supervisor = None
+        self._running = False
+        self._dispatch_thread = None
+        # start/stop/update_region 互斥：窗口跟踪等其他线程的快速重启不会与停止检测交错
+        self._lock = threading.RLock()
+
+    @property
+    def is_running(self):
+        return self._running
+
+    @property
+    def error(self):
+        """工作进程无法通过重启恢复的错误（例如模型连续加载失败），不为 None 时应结束本次会话"""
+        supervisor = self._supervisor
+        return supervisor.error if supervisor is not None else None
+
+    def start(self, app_region, model_path, mode=None, source=None, tracking=None, cascade=None):
+        """按窗口区域切分并启动采集和检测进程
+
+        source 为 None 时截取 app_region 所在的屏幕区域；指定帧源时 app_region 可以为 None，
+        此时使用帧源自身的尺寸。tracking、cascade 为 None 时沿用上一次的设置。
+        """
+        with self._lock:
+            if self._running:
+                raise RuntimeError("检测引擎已在运行")
+            mode = mode or self.mode
+            if mode not in DETECTION_MODES:
+                raise ValueError(f"未知的检测模式：{mode}")
+            if source is None:
+                source = ScreenSource(app_region)
+            if app_region is None:
+                app_region = source.region()
+
+            self.mode = mode
+            if tracking is not None:
+                self.tracking = tracking
+            if cascade is not None:
+                self.cascade = cascade
+            fast_path = fast_model_path(self.cascade)
+            self.app_region = dict(app_region)
+            self.model_path = model_path
+            self.source = source
+            self.regions = self._tile(self.app_region)
+
+            try:
+                # 所有子进程写入的检测结果（共享内存，按区域分槽）
+                self.result_buffer = SharedDetectionBuffer(len(self.regions))
+                # 采集进程每个节拍只截一次窗口，检测进程和显示端共用同一帧
+                num_readers = len(self.regions) if mode == "process" else 1
+                # 屏幕截图预留一些余量，窗口放大时无需重新分配
+                headroom = WINDOW_RING_HEADROOM if isinstance(source, ScreenSource) else 1.0
+                self.frame_ring = SharedFrameRing(int(self.app_region["height"] * headroom),
+                                                  int(self.app_region["width"] * headroom), num_readers=num_readers)
+                # 窗口区域和区域切分（窗口移动/缩放时原地更新）
+                self.layout = SharedLayout(len(self.regions))
+                self.layout.update(self.app_region, self.regions)
+                # 各进程的分阶段耗时统计
+                self.stage_metrics = SharedStageMetrics(len(slot_names(len(self.regions))))
+                self.display_recorder = StageRecorder(self.stage_metrics, DISPLAY_SLOT)
+
+                if self.pool is None:
+                    self.pool = WorkerPool(self.target_fps)
+                num_workers = len(self.regions) if mode == "process" else 1
+                if THREAD_PLANNING:
+                    # 按检测工作进程数分配 CPU 线程，避免各进程的线程池互相抢核
+                    self.pool.configure_threads(plan_threads(num_workers))
+                # 模型路径未变化的工作进程沿用已加载、已预热的模型
+                self.pool.load(model_path, num_workers, fast_path)
+                self.pool.run_capture(source, self.frame_ring, self.stage_metrics, self.layout)
+                if mode == "roi":
+                    # 单个进程：整个窗口低频粗检，其余节拍批量复检 ROI
+                    self.pool.run_detect(0, "roi", (self.regions[0], self.app_region, self.frame_ring,
+                                                    self.result_buffer),
+                                         metrics=self.stage_metrics, layout=self.layout)
+                elif mode == "batched":
+                    # 单个进程、单份模型，所有区域拼成一个 batch 推理
+                    self.pool.run_detect(0, "batched", (self.regions, self.app_region, self.frame_ring,
+                                                        self.result_buffer),
+                                         metrics=self.stage_metrics, layout=self.layout, tracking=self.tracking)
+                else:
+                    # 每个区域一个工作进程
+                    for i, region in enumerate(self.regions):
+                        self.pool.run_detect(i, "region", (region, self.app_region, self.frame_ring, self.result_buffer,
+                                                           i), metrics=self.stage_metrics, layout=self.layout,
+                                             tracking=self.tracking)
+            except Exception:
+                self.stop()
+                raise
+
+            self._running = True
+            self._supervisor = WorkerSupervisor(self.pool)
+            self._supervisor.start()
+            if self.metrics_path:
+                self._metrics_dumper = MetricsDumper(self.metrics, self.metrics_path)
+                self._metrics_dumper.start()
+            if self.on_result is not None:
+                self._dispatch_thread = threading.Thread(target=self._dispatch_loop, daemon=True)
+                self._dispatch_thread.start()
+
+    def stop(self):
+        """结束本次会话并释放共享内存；工作进程和已加载的模型保留到 shutdown()"""
+        with self._lock:
+            self._running = False
+            if self._supervisor is not None:
+                self._supervisor.stop()
+                self._supervisor = None
+            if self.pool is not None:
+                self.pool.stop()
+
+            if self._dispatch_thread is not None:
+                self._dispatch_thread.join(timeout=1.0)
+                self._dispatch_thread = None
+            if self._metrics_dumper is not None:
+                self._metrics_dumper.stop()
+                self._metrics_dumper.dump()  # 停止前写入最后一次快照
+                self._metrics_dumper = None
+            if self.result_buffer is not None:
+                self.result_buffer.close()
+                self.result_buffer = None
+            if self.frame_ring is not None:
+                self.frame_ring.close()
+                self.frame_ring = None
+            if self.layout is not None:
+                self.layout.close()
+                self.layout = None
+            if self.stage_metrics is not None:
+                self.display_recorder.shared_metrics = None
+                self.stage_metrics.close()
+                self.stage_metrics = None
+
+    def _tile(self, app_region):
+        """按当前模式切分窗口：ROI 聚焦模式把整个窗口作为一个区域"""
+        if self.mode == "roi":
+            return tile_region(app_region, rows=1, cols=1)
+        return tile_region(app_region)
+
+    def update_region(self, app_region):
+        """目标窗口移动或缩放后调用
+
+        区域数不变且帧环容量足够时只更新共享布局，采集和检测工作进程下一个节拍生效；
+        否则以新区域快速重启本次会话（工作进程和已加载的模型保持不变）。返回是否重启了会话。
+        """
+        with self._lock:
+            if not self._running:
+                return False
+            if not isinstance(self.source, ScreenSource):
+                raise RuntimeError("只有屏幕截图帧源支持跟随窗口")
+            app_region = dict(app_region, title=app_region.get("title", self.app_region.get("title", "")))
+            regions = self._tile(app_region)
+            capacity = self.frame_ring.height * self.frame_ring.width
+            if len(regions) == len(self.regions) and app_region["width"] * app_region["height"] <= capacity:
+                self.layout.update(app_region, regions)
+                self.app_region = app_region
+                self.regions = regions
+                return False
+            source = self.source
+            source.set_region(app_region)
+            self.stop()
+            self.start(app_region, self.model_path, self.mode, source=source)
+            return True
+
+    def set_paused(self, paused):
+        """暂停/恢复截图（例如目标窗口最小化时），检测工作进程随之空闲"""
+        with self._lock:
+            if self.layout is not None:
+                self.layout.set_paused(paused)
+
+    def shutdown(self):
+        """停止检测并结束所有常驻工作进程"""
+        with self._lock:
+            self.stop()
+            if self.pool is not None:
+                self.pool.shutdown()
+                self.pool = None
+
+    @property
+    def finished(self):
+        """帧源已读完且所有区域都已处理完最后一帧（屏幕帧源永远不会结束）"""
+        with self._lock:
+            return self._running and window_finished(self)
+
+    def metrics(self):
+        """各进程的分阶段耗时百分位（毫秒）和帧率，格式见 SharedStageMetrics.read()"""
+        if self.stage_metrics is None:
+            return {}
+        return self.stage_metrics.read(slot_names(len(self.regions)))
+
+    def health(self):
+        """各工作进程的健康状态，格式见 SharedWorkerHealth.read()"""
+        return self.pool.worker_health() if self.pool is not None else {}
+
+    def _session(self, index=None):
+        """本次会话（单窗口引擎自身持有会话的共享内存），未运行时返回 None；调用方需持有 _lock"""
+        return self if self._running else None
+
+    def names(self):
+        with self._lock:
+            return self.result_buffer.names() if self.result_buffer is not None else {}
+
+    def latest(self, with_frame=True, out=None):
+        """返回最新的 DetectionResult；尚无画面时返回 None
+
+        with_frame=False 时只读取检测框，不复制画面；传入与窗口同尺寸的 out 时画面合成到该缓冲区，避免每帧分配。
+        out 也可以是 out(height, width)，按最新帧的尺寸返回缓冲区（会话可能因窗口缩放而重启，尺寸以帧为准）。
+        """
+        return read_latest(self, None, with_frame, out)
+
+    def results(self, with_frame=True, poll_interval=0.005):
+        """迭代新的检测结果，直到引擎停止或帧源结束"""
+        return poll_results(self, None, with_frame, poll_interval)
+
+    def _dispatch_loop(self):
+        try:
+            for result in self.results():
+                try:
+                    self.on_result(result)
+                except Exception as e:
+                    print(f"[检测引擎] 结果回调出错：{e}")
+        except RuntimeError as e:
+            print(f"[检测引擎] 检测已中止：{e}")
@@ -0,0 +1,192 @@
+# detection/frame_ring.py
+"""
+共享内存帧环形缓冲区
+
+采集进程每个节拍只截取一次 App 窗口并写入环形缓冲区；区域子进程通过
+NumPy 切片零拷贝地读取自己的区域，显示线程复用同一帧，不再重复截图。
+"""
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from config import FRAME_RING_SLOTS, READER_WAIT_TIMEOUT
+from detection.shared_results import _align, _attach_shared_memory
+
+# 每个槽位的帧头：帧号（0 表示无效/写入中）、实际图像尺寸和截图时的区域布局版本（见 detection/layout.py）
+SLOT_HEADER_DTYPE = np.dtype([
+    ("frame_id", np.uint64),
+    ("height", np.int32),
+    ("width", np.int32),
+    ("layout", np.uint64),
+])
+
+
+class SharedFrameRing:
+    """固定槽位数的帧环形缓冲区
+
+    内存布局：latest | ended | readers[num_readers] | headers[slots] | pixels[slots, H, W, C]
+    帧号从 1 开始递增。读取方通过 acquire() 登记自己正在处理的帧号，写入方用
+    wait_for_readers() 等待所有读取方取走最新帧后再截下一帧；等待超时（某个读取方推理很慢）
+    继续截图时，新帧只写入没有被读取方登记、也不是最新帧的槽位中最旧的一个，读取方正在推理的
+    零拷贝视图不会被覆盖，检测结果对应的帧也仍然可用。槽位数至少为 num_readers + 2，总有空闲槽位。
+    """
+
+    def __init__(self, height, width, channels=3, slots=FRAME_RING_SLOTS, num_readers=0, name=None):
+        self.height = height
+        self.width = width
+        self.channels = channels
+        self.slots = max(slots, num_readers + 2)
+        self.num_readers = num_readers
+        self._owner = name is None
+
+        readers_offset = 16
+        slots = self.slots
+        headers_offset = _align(readers_offset + 8 * num_readers)
+        pixels_offset = _align(headers_offset + SLOT_HEADER_DTYPE.itemsize * slots, 64)
+        self._frame_bytes = height * width * channels
+        size = pixels_offset + self._frame_bytes * slots
+
+        if self._owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            self._shm.buf[:pixels_offset] = bytes(pixels_offset)
+        else:
+            self._shm = _attach_shared_memory(name)
+
+        buf = self._shm.buf
+        self._latest = np.ndarray((1,), dtype=np.uint64, buffer=buf, offset=0)
+        self._ended = np.ndarray((1,), dtype=np.uint64, buffer=buf, offset=8)
+        self._readers = np.ndarray((num_readers,), dtype=np.uint64, buffer=buf, offset=readers_offset)
+        self._headers = np.ndarray((slots,), dtype=SLOT_HEADER_DTYPE, buffer=buf, offset=headers_offset)
+        self._pixels = np.ndarray((slots, self._frame_bytes), dtype=np.uint8, buffer=buf, offset=pixels_offset)
+        self._writing = None  # 写入方：begin_write() 取得、commit() 发布的槽位
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def __getstate__(self):
+        return {"name": self.name, "height": self.height, "width": self.width, "channels": self.channels,
+                "slots": self.slots, "num_readers": self.num_readers}
+
+    def __setstate__(self, state):
+        self.__init__(state["height"], state["width"], state["channels"], state["slots"],
+                      state["num_readers"], name=state["name"])
+
+    def _view(self, slot, height, width):
+        return self._pixels[slot, :height * width * self.channels].reshape(height, width, self.channels)
+
+    def _slot_of(self, frame_id):
+        """帧所在的槽位；该帧已被覆盖或不存在时返回 None"""
+        slots = np.flatnonzero(self._headers["frame_id"] == frame_id)
+        return int(slots[0]) if frame_id and len(slots) else None
+
+    def _free_slot(self):
+        """没有被读取方登记、也不是最新帧的槽位中最旧的一个（空槽位优先）"""
+        frame_ids = self._headers["frame_id"]
+        busy = np.isin(frame_ids, self._readers[self._readers > 0])
+        if self._latest[0]:
+            busy |= frame_ids == self._latest[0]
+        free = np.flatnonzero(~busy)
+        return int(free[np.argmin(frame_ids[free])])
+
+    # ---------------- 写入方（采集进程） ----------------
+
+    def begin_write(self, height=None, width=None, layout=0):
+        """取得下一帧的写入槽位，返回 (帧号, 可写视图)；layout 为截图所用的区域布局版本"""
+        height = self.height if height is None else height
+        width = self.width if width is None else width
+        if height * width * self.channels > self._frame_bytes:
+            raise ValueError(f"帧尺寸 {width}x{height} 超出缓冲区容量 {self.width}x{self.height}")
+        frame_id = int(self._latest[0]) + 1
+        slot = self._writing = self._free_slot()
+        header = self._headers[slot]
+        header["frame_id"] = 0  # 写入期间标记为无效
+        header["height"] = height
+        header["width"] = width
+        header["layout"] = layout
+        return frame_id, self._view(slot, height, width)
+
+    def commit(self, frame_id):
+        """写入完成，发布为最新帧"""
+        self._headers[self._writing]["frame_id"] = frame_id
+        self._latest[0] = frame_id
+
+    def mark_ended(self):
+        """帧源已读完（视频/图片回放结束），不会再有新帧"""
+        self._ended[0] = 1
+
+    def readers_done(self):
+        """所有读取方是否都已取走最新帧"""
+        return not self.num_readers or self._readers.min() >= self._latest[0]
+
+    def wait_for_readers(self, timeout=READER_WAIT_TIMEOUT, poll=0.001, stop_event=None):
+        """等待所有读取方都已取走最新帧；超时（例如某个读取方已退出）或 stop_event 被置位则直接返回"""
+        if not self.num_readers:
+            return True
+        deadline = time.perf_counter() + timeout
+        while not self.readers_done():
+            if time.perf_counter() > deadline or (stop_event is not None and stop_event.is_set()):
+                return False
+            time.sleep(poll)
+        return True
+
+    # ---------------- 读取方（区域子进程 / 显示线程） ----------------
+
+    @property
+    def ended(self):
+        return bool(self._ended[0])
+
+    @property
+    def latest_id(self):
+        return int(self._latest[0])
+
+    def latest(self):
+        """返回 (帧号, 只读视图)；尚无帧时返回 (0, None)"""
+        frame_id = int(self._latest[0])
+        return frame_id, self.get(frame_id)
+
+    def get(self, frame_id):
+        """按帧号取帧；该帧已被覆盖或不存在时返回 None"""
+        slot = self._slot_of(frame_id)
+        if slot is None:
+            return None
+        header = self._headers[slot]
+        view = self._view(slot, int(header["height"]), int(header["width"]))
+        view.flags.writeable = False
+        return view
+
+    def layout_of(self, frame_id):
+        """帧截图时的区域布局版本（0 表示未使用布局或该帧已被覆盖）"""
+        slot = self._slot_of(frame_id)
+        return 0 if slot is None else int(self._headers[slot]["layout"])
+
+    def is_valid(self, frame_id):
+        """检查帧在读取期间是否被覆盖"""
+        return self._slot_of(frame_id) is not None
+
+    def acquire(self, reader_index, last_frame_id=0):
+        """读取方取得比 last_frame_id 更新的帧，并登记为正在处理；没有新帧时返回 (last_frame_id, None)"""
+        frame_id = int(self._latest[0])
+        if frame_id <= last_frame_id:
+            return last_frame_id, None
+        # 先登记再取视图：登记之后写入方不会再选中该槽位，取到视图说明登记之前也没有开始覆盖
+        previous = self._readers[reader_index]
+        self._readers[reader_index] = frame_id
+        view = self.get(frame_id)
+        if view is None:
+            self._readers[reader_index] = previous
+            return last_frame_id, None
+        return frame_id, view
+
+    def close(self):
+        self._latest = self._ended = self._readers = self._headers = self._pixels = None
+        try:
+            self._shm.close()
+        except BufferError:
+            pass  # 其他线程仍持有视图，映射随视图回收后释放
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,46 @@
+# detection/gating.py
+"""
+帧差门控：区域画面没有明显变化时跳过推理，复用上一次的检测结果
+"""
+import time
+
+import cv2
+import numpy as np
+
+from config import CHANGE_THRESHOLD, FORCE_REFRESH_INTERVAL, CHANGE_DETECTION_SIZE
+
+
+class ChangeGate:
+    """把区域缩小为 size × size 的灰度图，与上一次推理时的画面比较平均绝对差"""
+
+    def __init__(self, threshold=CHANGE_THRESHOLD, refresh_interval=FORCE_REFRESH_INTERVAL,
+                 size=CHANGE_DETECTION_SIZE):
+        self.threshold = threshold
+        self.refresh_interval = refresh_interval
+        self.size = size
+        self._reference = None
+        self._last_inference = 0.0
+        self._small = np.empty((size, size, 3), dtype=np.uint8)
+        self._gray = np.empty((size, size), dtype=np.uint8)
+
+    def _signature(self, frame):
+        cv2.resize(frame, (self.size, self.size), dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        return self._gray
+
+    def should_infer(self, frame):
+        """返回 True 表示需要推理（并把当前画面记为新的参考帧）"""
+        now = time.monotonic()
+        signature = self._signature(frame)
+        if (self._reference is not None and self.threshold > 0
+                and now - self._last_inference < self.refresh_interval):
+            diff = cv2.absdiff(signature, self._reference).mean() / 255.0
+            if diff <= self.threshold:
+                return False
+        self._reference = signature.copy()
+        self._last_inference = now
+        return True
+
+    def reset(self):
+        """强制下一次调用进行推理"""
+        self._reference = None
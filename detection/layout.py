@@ -0,0 +1,118 @@
+# detection/layout.py
+"""
+共享区域布局
+
+窗口移动或缩放时，主进程把新的窗口区域和区域切分写入共享内存并递增版本号，
+采集和检测工作进程在下一个节拍读取，无需重启进程或重新加载模型。
+
+采集进程把截图时的布局版本写入帧头（SharedFrameRing.layout_of），检测进程按帧
+所属的版本取区域几何，因此布局切换前后的帧都能用正确的区域切片。最近若干个版本
+保存在环形历史中，足够覆盖帧环中仍可能被读取的帧。
+"""
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from config import FRAME_RING_SLOTS
+from detection.shared_results import _attach_shared_memory
+
+
+def _layout_dtype(num_tiles):
+    return np.dtype([
+        ("version", np.uint64),
+        ("app", np.int32, (4,)),  # left, top, width, height
+        ("tiles", np.int32, (num_tiles, 4)),
+    ])
+
+
+class SharedLayout:
+    """内存布局：version | paused | entries[history]"""
+
+    def __init__(self, num_tiles, history=2 * FRAME_RING_SLOTS, name=None):
+        self.num_tiles = num_tiles
+        self.history = history
+        self._owner = name is None
+        dtype = _layout_dtype(num_tiles)
+        size = 16 + dtype.itemsize * history
+
+        if self._owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            self._shm.buf[:size] = bytes(size)
+        else:
+            self._shm = _attach_shared_memory(name)
+
+        buf = self._shm.buf
+        self._version = np.ndarray((1,), dtype=np.uint64, buffer=buf, offset=0)
+        self._paused = np.ndarray((1,), dtype=np.uint64, buffer=buf, offset=8)
+        self._entries = np.ndarray((history,), dtype=dtype, buffer=buf, offset=16)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def __getstate__(self):
+        return {"name": self.name, "num_tiles": self.num_tiles, "history": self.history}
+
+    def __setstate__(self, state):
+        self.__init__(state["num_tiles"], state["history"], name=state["name"])
+
+    # ---------------- 写入方（主进程） ----------------
+
+    def update(self, app_region, regions):
+        """发布新的窗口区域和区域切分（区域数必须与创建时一致），返回新版本号"""
+        if len(regions) != self.num_tiles:
+            raise ValueError(f"区域数 {len(regions)} 与布局容量 {self.num_tiles} 不一致")
+        version = int(self._version[0]) + 1
+        entry = self._entries[version % self.history]
+        entry["version"] = 0  # 写入期间标记为无效
+        entry["app"] = (app_region["left"], app_region["top"], app_region["width"], app_region["height"])
+        entry["tiles"] = [(r["left"], r["top"], r["width"], r["height"]) for r in regions]
+        entry["version"] = version
+        self._version[0] = version
+        return version
+
+    def set_paused(self, paused):
+        """暂停/恢复截图（例如窗口最小化时）"""
+        self._paused[0] = 1 if paused else 0
+
+    # ---------------- 读取方（采集/检测工作进程、显示端） ----------------
+
+    @property
+    def version(self):
+        return int(self._version[0])
+
+    @property
+    def paused(self):
+        return bool(self._paused[0])
+
+    def get(self, version=None):
+        """返回 (版本号, 窗口区域, 区域列表)；version 已不在历史中时返回当前布局"""
+        if version:
+            entry = self._entries[version % self.history].copy()
+            if int(entry["version"]) == version:
+                return version, *self._decode(entry)
+        while True:
+            version = int(self._version[0])
+            entry = self._entries[version % self.history].copy()
+            if int(entry["version"]) == version:
+                return version, *self._decode(entry)
+
+    @staticmethod
+    def _decode(entry):
+        left, top, width, height = (int(v) for v in entry["app"])
+        app_region = {"left": left, "top": top, "width": width, "height": height}
+        regions = [{"left": int(x), "top": int(y), "width": int(w), "height": int(h), "id": k}
+                   for k, (x, y, w, h) in enumerate(entry["tiles"])]
+        return app_region, regions
+
+    def close(self):
+        self._version = self._paused = self._entries = None
+        try:
+            self._shm.close()
+        except BufferError:
+            pass
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,220 @@
+# detection/metrics.py
+"""
+流水线分阶段耗时统计
+
+每个进程在本地用滚动窗口记录各阶段耗时，定期把 p50/p95/p99 写入共享内存中
+自己的槽位；主进程无需 IPC 即可读取所有槽位，用于界面显示、API 查询和 JSONL 定期转储。
+
+槽位约定：0 = 采集进程，1 = 显示端，2 + i = 第 i 个区域。
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from config import METRICS_WINDOW, METRICS_PUBLISH_INTERVAL, METRICS_DUMP_INTERVAL
+from detection.shared_results import _attach_shared_memory
+
+STAGES = ("capture", "convert", "preprocess", "inference", "postprocess", "track", "publish", "draw", "resize",
+          "blit")
+STAGE_LABELS = {
+    "capture": "截图",
+    "convert": "颜色转换",
+    "preprocess": "预处理",
+    "inference": "推理",
+    "postprocess": "后处理",
+    "track": "跟踪",
+    "publish": "发布",
+    "draw": "绘制",
+    "resize": "缩放",
+    "blit": "Tk 显示",
+}
+STAT_FIELDS = ("p50", "p95", "p99", "count")
+
+CAPTURE_SLOT = 0
+DISPLAY_SLOT = 1
+
+
+def region_slot(region_index):
+    return 2 + region_index
+
+
+def slot_names(num_regions):
+    return ["capture", "display"] + [f"region{i}" for i in range(num_regions)]
+
+
+class SharedStageMetrics:
+    """各槽位的分阶段耗时百分位（毫秒）、帧率和更新时间"""
+
+    def __init__(self, num_slots, name=None):
+        self.num_slots = num_slots
+        self._owner = name is None
+        stats_bytes = 8 * num_slots * len(STAGES) * len(STAT_FIELDS)
+        size = stats_bytes + 16 * num_slots
+
+        if self._owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            self._shm.buf[:size] = bytes(size)
+        else:
+            self._shm = _attach_shared_memory(name)
+
+        buf = self._shm.buf
+        self._stats = np.ndarray((num_slots, len(STAGES), len(STAT_FIELDS)), dtype=np.float64, buffer=buf)
+        self._fps = np.ndarray((num_slots,), dtype=np.float64, buffer=buf, offset=stats_bytes)
+        self._updated = np.ndarray((num_slots,), dtype=np.float64, buffer=buf, offset=stats_bytes + 8 * num_slots)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def __getstate__(self):
+        return {"name": self.name, "num_slots": self.num_slots}
+
+    def __setstate__(self, state):
+        self.__init__(state["num_slots"], name=state["name"])
+
+    def write(self, slot, stats, fps):
+        self._stats[slot] = stats
+        self._fps[slot] = fps
+        self._updated[slot] = time.time()
+
+    def read(self, names=None):
+        """返回 {槽位名: {"fps": ..., "updated": ..., "stages": {阶段: {p50, p95, p99, count}}}}"""
+        names = names or [str(i) for i in range(self.num_slots)]
+        stats = self._stats.copy()
+        report = {}
+        for slot, slot_name in enumerate(names):
+            stages = {}
+            for k, stage in enumerate(STAGES):
+                if stats[slot, k, 3] > 0:
+                    stages[stage] = dict(zip(STAT_FIELDS, (round(float(v), 3) for v in stats[slot, k])))
+            report[slot_name] = {"fps": round(float(self._fps[slot]), 2), "updated": float(self._updated[slot]),
+                                 "stages": stages}
+        return report
+
+    def close(self):
+        self._stats = self._fps = self._updated = None
+        try:
+            self._shm.close()
+        except BufferError:
+            pass
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class StageRecorder:
+    """进程内的分阶段耗时记录器（滚动窗口），定期发布到 SharedStageMetrics 的某个槽位
+
+    shared_metrics 为 None 时只在本地统计，可用于基准测试。
+    """
+
+    def __init__(self, shared_metrics=None, slot=0, window=METRICS_WINDOW, publish_interval=METRICS_PUBLISH_INTERVAL):
+        self.shared_metrics = shared_metrics
+        self.slot = slot
+        self.window = window
+        self.publish_interval = publish_interval
+        self._samples = np.zeros((len(STAGES), window), dtype=np.float64)
+        self._counts = np.zeros(len(STAGES), dtype=np.int64)
+        self._index = {stage: k for k, stage in enumerate(STAGES)}
+        self._frames = 0
+        self._last_publish = time.perf_counter()
+        self.fps = 0.0
+
+    def record(self, stage, seconds):
+        k = self._index[stage]
+        self._samples[k, self._counts[k] % self.window] = seconds * 1000.0
+        self._counts[k] += 1
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def frame_done(self):
+        """一帧处理完毕；到达发布间隔时把统计写入共享内存"""
+        self._frames += 1
+        now = time.perf_counter()
+        elapsed = now - self._last_publish
+        if elapsed >= self.publish_interval:
+            self.fps = self._frames / elapsed
+            self._frames = 0
+            self._last_publish = now
+            self.publish()
+
+    def stats(self):
+        """返回 (阶段数, 4) 数组：p50, p95, p99（毫秒）和累计样本数"""
+        stats = np.zeros((len(STAGES), len(STAT_FIELDS)), dtype=np.float64)
+        for k in range(len(STAGES)):
+            n = min(int(self._counts[k]), self.window)
+            if n:
+                stats[k, :3] = np.percentile(self._samples[k, :n], (50, 95, 99))
+                stats[k, 3] = self._counts[k]
+        return stats
+
+    def summary(self):
+        """本地统计，格式同 SharedStageMetrics.read() 的单个槽位"""
+        stats = self.stats()
+        stages = {stage: dict(zip(STAT_FIELDS, (round(float(v), 3) for v in stats[k])))
+                  for k, stage in enumerate(STAGES) if stats[k, 3] > 0}
+        return {"fps": round(self.fps, 2), "stages": stages}
+
+    def publish(self):
+        if self.shared_metrics is not None:
+            self.shared_metrics.write(self.slot, self.stats(), self.fps)
+
+
+class MetricsDumper:
+    """后台线程：定期把 read_metrics() 的结果追加写入 JSONL 文件（每行一个快照）"""
+
+    def __init__(self, read_metrics, path, interval=METRICS_DUMP_INTERVAL):
+        self.read_metrics = read_metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.dump()
+
+    def dump(self):
+        try:
+            record = {"time": time.time(), "metrics": self.read_metrics()}
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except Exception as e:
+            print(f"[性能统计] 写入 {self.path} 失败：{e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+
+def format_metrics(report, stages=("capture", "inference", "postprocess", "track", "draw", "resize", "blit")):
+    """把 read() 的结果格式化为多行文本（每个槽位一行），用于界面显示"""
+    lines = []
+    for slot_name, slot in report.items():
+        if not slot["stages"]:
+            continue
+        parts = [f"{slot_name:<8} {slot['fps']:5.1f} FPS"]
+        for stage in stages:
+            stat = slot["stages"].get(stage)
+            if stat:
+                parts.append(f"{STAGE_LABELS[stage]} {stat['p50']:.1f}/{stat['p95']:.1f}/{stat['p99']:.1f}ms")
+        lines.append(" | ".join(parts))
+    return "\n".join(lines)
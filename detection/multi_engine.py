@@ -0,0 +1,292 @@
+# detection/multi_engine.py
+"""
+多窗口检测引擎
+
+同时监控多个 App 窗口，所有窗口共用一个采集进程和 MULTI_WINDOW_WORKERS 个检测工作进程
+（每个进程一份模型），增加窗口不会增加进程数和模型副本。每个窗口有自己的帧环、布局和
+检测结果缓冲区；检测工作进程从共享调度表（detection/scheduler.py）按窗口的优先级、
+目标帧率和已用推理时间轮流领取窗口，对该窗口最新一帧的所有区域做一次批量推理。
+
+不指定窗口下标时，app_region、latest()、update_region() 等作用于 display_index 指定的窗口
+（界面上当前显示的窗口）。跟踪模式和 ROI 聚焦模式只在单窗口的 DetectionEngine 中可用，模型级联可以使用。
+启停、重新切分和调整窗口可以在任意线程中调用，彼此互斥（同 DetectionEngine）。
+
+用法：
+    engine = MultiWindowEngine()
+    engine.start([{"region": chrome_region, "priority": 2}, {"region": notepad_region, "target_fps": 5}],
+                 "yolov8n.pt")
+    result = engine.latest(index=1)
+    engine.configure_window(0, priority=1)
+    engine.stop()
+    engine.shutdown()
+"""
+import multiprocessing
+import threading
+
+from config import (CASCADE_ENABLED, DEFAULT_TARGET_FPS, DEFAULT_WINDOW_PRIORITY,
+                    METRICS_JSONL_PATH, MULTI_WINDOW_WORKERS, THREAD_PLANNING, WINDOW_RING_HEADROOM)
+from detection.cascade import fast_model_path
+from detection.engine import poll_results, read_latest, window_finished
+from detection.frame_ring import SharedFrameRing
+from detection.layout import SharedLayout
+from detection.metrics import DISPLAY_SLOT, MetricsDumper, SharedStageMetrics, StageRecorder
+from detection.scheduler import SharedScheduler
+from detection.shared_results import SharedDetectionBuffer
+from detection.sources import ScreenSource
+from detection.supervisor import WorkerSupervisor
+from detection.threads import plan_threads
+from detection.worker_pool import WorkerPool
+from utils.tiling import tile_region
+
+
+class WindowSession:
+    """单个窗口的帧源、区域切分和共享内存（帧环、布局、检测结果缓冲区）"""
+
+    def __init__(self, spec):
+        self.source = spec.get("source") or ScreenSource(spec["region"])
+        self.app_region = dict(spec.get("region") or self.source.region())
+        self.regions = tile_region(self.app_region)
+        self.frame_ring = None
+        self.layout = None
+        self.result_buffer = None
+
+    @property
+    def title(self):
+        return self.app_region.get("title", "")
+
+    def open(self):
+        self.result_buffer = SharedDetectionBuffer(len(self.regions))
+        # 同一时刻只有领取了该窗口的一个检测工作进程在读
+        headroom = WINDOW_RING_HEADROOM if isinstance(self.source, ScreenSource) else 1.0
+        self.frame_ring = SharedFrameRing(int(self.app_region["height"] * headroom),
+                                          int(self.app_region["width"] * headroom), num_readers=1)
+        self.layout = SharedLayout(len(self.regions))
+        self.layout.update(self.app_region, self.regions)
+
+    @property
+    def finished(self):
+        return window_finished(self)
+
+    def close(self):
+        for shared in (self.result_buffer, self.frame_ring, self.layout):
+            if shared is not None:
+                shared.close()
+        self.result_buffer = self.frame_ring = self.layout = None
+
+
+class MultiWindowEngine:
+    def __init__(self, target_fps=DEFAULT_TARGET_FPS, num_workers=MULTI_WINDOW_WORKERS,
+                 metrics_path=METRICS_JSONL_PATH, cascade=CASCADE_ENABLED):
+        # 全局目标帧率（未单独设置帧率的窗口使用），运行期间修改 engine.target_fps.value 即可生效
+        self.target_fps = multiprocessing.Value("d", target_fps, lock=False)
+        self.num_workers = num_workers
+        self.cascade = cascade  # 小模型筛查 + 大模型按需复检（见 detection/cascade.py）
+        self.metrics_path = metrics_path
+        self.windows = []
+        self.display_index = 0
+        self.model_path = None
+        self.pool = None  # 首次 start() 时创建，跨会话保持
+        self.scheduler = None
+        self.stage_metrics = None
+        self.display_recorder = StageRecorder()
+        self._specs = []
+        self._num_workers = 0
+        self._metrics_dumper = None
+        self._supervisor = None
+        self._running = False
+        # start/stop/update_region 互斥：窗口跟踪等其他线程的快速重启不会与停止检测或其他窗口的重启交错
+        self._lock = threading.RLock()
+
+    @property
+    def is_running(self):
+        return self._running
+
+    @property
+    def error(self):
+        """工作进程无法通过重启恢复的错误（例如模型连续加载失败），不为 None 时应结束本次会话"""
+        supervisor = self._supervisor
+        return supervisor.error if supervisor is not None else None
+
+    def start(self, windows, model_path, cascade=None):
+        """启动所有窗口的采集和检测
+
+        windows 为窗口列表，每项为 {"region": 窗口区域, "source": 帧源, "priority": 优先级, "target_fps": 目标帧率}，
+        region 和 source 至少提供一个（同 DetectionEngine.start），priority 默认 DEFAULT_WINDOW_PRIORITY，
+        target_fps 默认 0（使用全局目标帧率）。cascade 为 None 时沿用上一次的设置。
+        """
+        with self._lock:
+            if self._running:
+                raise RuntimeError("检测引擎已在运行")
+            if not windows:
+                raise ValueError("至少需要一个窗口")
+            if cascade is not None:
+                self.cascade = cascade
+            fast_path = fast_model_path(self.cascade)
+            self.model_path = model_path
+            self._specs = [dict(spec) for spec in windows]
+
+            try:
+                self.windows = []
+                for spec in self._specs:
+                    window = WindowSession(spec)
+                    self.windows.append(window)
+                    window.open()
+                self.display_index = min(self.display_index, len(self.windows) - 1)
+                self.scheduler = SharedScheduler(len(self.windows))
+                for index, spec in enumerate(self._specs):
+                    self.scheduler.configure(index, spec.get("priority", DEFAULT_WINDOW_PRIORITY),
+                                             spec.get("target_fps", 0))
+                # 工作进程数不超过窗口数（同一窗口同一时刻只由一个工作进程处理）
+                self._num_workers = max(1, min(self.num_workers, len(self.windows)))
+                self.stage_metrics = SharedStageMetrics(2 + self._num_workers)
+                self.display_recorder = StageRecorder(self.stage_metrics, DISPLAY_SLOT)
+
+                if self.pool is None:
+                    self.pool = WorkerPool(self.target_fps)
+                if THREAD_PLANNING:
+                    self.pool.configure_threads(plan_threads(self._num_workers))
+                self.pool.load(model_path, self._num_workers, fast_path)
+                self.pool.run_capture_windows([w.source for w in self.windows], [w.frame_ring for w in self.windows],
+                                              self.scheduler, self.stage_metrics, [w.layout for w in self.windows])
+                shared = [(w.frame_ring, w.result_buffer, w.layout) for w in self.windows]
+                for worker in range(self._num_workers):
+                    self.pool.run_detect(worker, "scheduled", (shared, self.scheduler, worker),
+                                         metrics=self.stage_metrics)
+            except Exception:
+                self.stop()
+                raise
+
+            self._running = True
+            self._supervisor = WorkerSupervisor(self.pool)
+            self._supervisor.start()
+            if self.metrics_path:
+                self._metrics_dumper = MetricsDumper(self.metrics, self.metrics_path)
+                self._metrics_dumper.start()
+
+    def stop(self):
+        """结束本次会话并释放共享内存；工作进程和已加载的模型保留到 shutdown()"""
+        with self._lock:
+            self._running = False
+            if self._supervisor is not None:
+                self._supervisor.stop()
+                self._supervisor = None
+            if self.pool is not None:
+                self.pool.stop()
+            if self._metrics_dumper is not None:
+                self._metrics_dumper.stop()
+                self._metrics_dumper.dump()  # 停止前写入最后一次快照
+                self._metrics_dumper = None
+            for window in self.windows:
+                window.close()
+            if self.scheduler is not None:
+                self.scheduler.close()
+                self.scheduler = None
+            if self.stage_metrics is not None:
+                self.display_recorder.shared_metrics = None
+                self.stage_metrics.close()
+                self.stage_metrics = None
+
+    def shutdown(self):
+        """停止检测并结束所有常驻工作进程"""
+        with self._lock:
+            self.stop()
+            if self.pool is not None:
+                self.pool.shutdown()
+                self.pool = None
+
+    @property
+    def worker_count(self):
+        """本次会话实际使用的检测工作进程数"""
+        return self._num_workers
+
+    def _window(self, index):
+        return self.windows[self.display_index if index is None else index]
+
+    @property
+    def app_region(self):
+        return self._window(None).app_region if self.windows else None
+
+    @property
+    def regions(self):
+        return self._window(None).regions if self.windows else []
+
+    def titles(self):
+        return [window.title or f"窗口{k + 1}" for k, window in enumerate(self.windows)]
+
+    def configure_window(self, index, priority=None, target_fps=None):
+        """运行中调整窗口的优先级和目标帧率（0 表示使用全局目标帧率）"""
+        with self._lock:
+            if self.scheduler is not None:
+                self.scheduler.configure(index, priority, target_fps)
+            if priority is not None:
+                self._specs[index]["priority"] = priority
+            if target_fps is not None:
+                self._specs[index]["target_fps"] = target_fps
+
+    def update_region(self, app_region, index=None):
+        """窗口移动或缩放后调用，用法同 DetectionEngine.update_region()
+
+        区域数变化或帧环容量不足时以新区域快速重启本次会话（所有窗口一起重启，工作进程和模型保持不变）。
+        """
+        with self._lock:
+            if not self._running:
+                return False
+            index = self.display_index if index is None else index
+            window = self.windows[index]
+            if not isinstance(window.source, ScreenSource):
+                raise RuntimeError("只有屏幕截图帧源支持跟随窗口")
+            app_region = dict(app_region, title=app_region.get("title", window.title))
+            regions = tile_region(app_region)
+            capacity = window.frame_ring.height * window.frame_ring.width
+            if len(regions) == len(window.regions) and app_region["width"] * app_region["height"] <= capacity:
+                window.layout.update(app_region, regions)
+                window.app_region = app_region
+                window.regions = regions
+                return False
+            window.source.set_region(app_region)
+            specs = [dict(spec, source=w.source, region=w.app_region) for spec, w in zip(self._specs, self.windows)]
+            specs[index]["region"] = app_region
+            self.stop()
+            self.start(specs, self.model_path)
+            return True
+
+    def set_paused(self, paused, index=None):
+        """暂停/恢复某个窗口的截图（例如该窗口最小化时），其他窗口照常检测"""
+        with self._lock:
+            window = self._window(index)
+            if window.layout is not None:
+                window.layout.set_paused(paused)
+
+    def metrics(self):
+        """采集、显示和各检测工作进程的分阶段耗时，格式见 SharedStageMetrics.read()"""
+        if self.stage_metrics is None:
+            return {}
+        names = ["capture", "display"] + [f"worker{k}" for k in range(self._num_workers)]
+        return self.stage_metrics.read(names)
+
+    def schedule(self):
+        """各窗口的调度状态，格式见 SharedScheduler.read()，另加 "title" """
+        if self.scheduler is None:
+            return []
+        return [dict(entry, title=title) for entry, title in zip(self.scheduler.read(), self.titles())]
+
+    def health(self):
+        """各工作进程的健康状态，格式见 SharedWorkerHealth.read()"""
+        return self.pool.worker_health() if self.pool is not None else {}
+
+    def _session(self, index=None):
+        """窗口 index 本次会话的 WindowSession，未运行时返回 None；调用方需持有 _lock"""
+        return self._window(index) if self._running else None
+
+    def names(self, index=None):
+        with self._lock:
+            window = self._session(index)
+            return window.result_buffer.names() if window is not None else {}
+
+    def latest(self, with_frame=True, out=None, index=None):
+        """返回窗口 index 最新的 DetectionResult，用法同 DetectionEngine.latest()"""
+        return read_latest(self, index, with_frame, out)
+
+    def results(self, index=None, with_frame=True, poll_interval=0.005):
+        """迭代窗口 index 新的检测结果，直到引擎停止或该窗口的帧源结束"""
+        return poll_results(self, index, with_frame, poll_interval)
@@ -0,0 +1,176 @@
+# detection/onnx_backend.py
+"""
+ONNX Runtime 推理后端
+
+直接用 onnxruntime.InferenceSession 运行 ultralytics 导出的 .onnx 检测模型，工作进程不再导入
+torch 和 ultralytics，也省去每次调用时 ultralytics 的 Python 开销：
+
+- 预处理：detection/preprocess.py 把区域画面 letterbox 后直接写入预先分配的输入张量；
+  输入尺寸为动态的模型只补齐到 stride 的倍数（矩形输入）
+- 后处理：向量化解码输出（YOLOv8/11 的 (B, 4+nc, anchors)，或 end2end 模型的 (B, N, 6)），
+  置信度过滤后做类别感知 NMS（复用 detection.postprocess.box_overlap）
+
+调用方式与 ultralytics.YOLO 相同：model(frame 或 frame 列表, conf=...) 返回每张图一个结果，
+结果的 boxes 提供 xyxy/conf/cls/data，speed 为各阶段耗时（毫秒，按单张图计），
+因此 run_region / run_regions_batched 无需区分后端。
+"""
+import ast
+import time
+from collections import namedtuple
+
+import numpy as np
+import onnxruntime as ort
+
+from config import (ONNX_PROVIDERS, ONNX_IMGSZ, ONNX_IOU_THRESHOLD, ONNX_MAX_DETECTIONS, ONNX_ALLOW_SPINNING,
+                    WARMUP_SIZE)
+from detection.postprocess import box_overlap
+from detection.preprocess import InputBuffers
+from detection.threads import planned_threads
+
+MAX_WH = 7680  # 类别感知 NMS 时按类别平移框的距离（与 ultralytics 一致）
+MAX_NMS_CANDIDATES = 30000  # 进入 NMS 的候选框上限
+
+OnnxResult = namedtuple("OnnxResult", ["boxes", "speed"])
+
+
+class OnnxBoxes:
+    """与 ultralytics Boxes 接口兼容的检测框：data 为 (N, 6) 的 [x1, y1, x2, y2, conf, cls]"""
+
+    def __init__(self, data):
+        self.data = data
+
+    @property
+    def xyxy(self):
+        return self.data[:, :4]
+
+    @property
+    def conf(self):
+        return self.data[:, 4]
+
+    @property
+    def cls(self):
+        return self.data[:, 5]
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            index = slice(index, index + 1)
+        return OnnxBoxes(self.data[index])
+
+    def __iter__(self):
+        return (self[k] for k in range(len(self.data)))
+
+
+def nms(boxes, scores, iou_threshold, max_det):
+    """贪心 NMS，返回保留框的下标（按置信度从高到低）"""
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while len(order) and len(keep) < max_det:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        order = rest[box_overlap(boxes[i], boxes[rest]) <= iou_threshold]
+    return np.asarray(keep, dtype=np.intp)
+
+
+class OnnxDetector:
+    """ONNX Runtime 检测模型；names 为 {类别号: 名称}"""
+
+    def __init__(self, model_path, providers=ONNX_PROVIDERS, threads=None, iou=ONNX_IOU_THRESHOLD,
+                 max_det=ONNX_MAX_DETECTIONS):
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        # 未指定时使用线程规划分给本进程的线程数（0 表示由 onnxruntime 决定）
+        options.intra_op_num_threads = threads or planned_threads() or 0
+        if not ONNX_ALLOW_SPINNING:
+            options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+        available = ort.get_available_providers()
+        self.session = ort.InferenceSession(model_path, sess_options=options,
+                                            providers=[p for p in providers if p in available] or available)
+        self.iou = iou
+        self.max_det = max_det
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(metadata["names"]) if "names" in metadata else {}
+        self.end2end = metadata.get("end2end") == "True"
+        batch, _, height, width = model_input.shape
+        dynamic = not isinstance(height, int) or not isinstance(width, int)
+        if dynamic:
+            imgsz = ast.literal_eval(metadata["imgsz"]) if "imgsz" in metadata else ONNX_IMGSZ
+            height, width = (imgsz, imgsz) if isinstance(imgsz, int) else imgsz
+        self.input_size = (height, width)
+        self.max_batch = batch if isinstance(batch, int) else None  # None 表示动态 batch
+        # 每个工作进程一份输入缓冲区；动态输入尺寸的模型使用矩形输入
+        self.inputs = InputBuffers(self.input_size, int(metadata.get("stride", 32)), rect=dynamic)
+
+    def infer(self, blob):
+        if self.max_batch is None or len(blob) <= self.max_batch:
+            return self.session.run(None, {self.input_name: blob})[0]
+        # 固定 batch 的模型逐张推理
+        step = self.max_batch
+        return np.concatenate([self.session.run(None, {self.input_name: blob[k:k + step]})[0]
+                               for k in range(0, len(blob), step)])
+
+    def decode(self, output, letterbox, conf):
+        """解码单张图的输出，返回 (N, 6) 的 [x1, y1, x2, y2, conf, cls]（原图坐标）"""
+        if self.end2end:
+            # end2end 模型已在图内完成 NMS：(N, 6) = xyxy, conf, cls
+            dets = output[output[:, 4] > conf].astype(np.float32)
+            letterbox.restore(dets[:, :4])
+            return dets
+
+        if output.shape[0] > output.shape[1]:
+            output = output.T  # (anchors, 4+nc) -> (4+nc, anchors)
+        scores = output[4:]
+        cls = scores.argmax(axis=0)
+        best = scores[cls, np.arange(scores.shape[1])]
+        candidates = np.flatnonzero(best > conf)
+        if len(candidates) > MAX_NMS_CANDIDATES:
+            candidates = candidates[np.argsort(-best[candidates])[:MAX_NMS_CANDIDATES]]
+        if not len(candidates):
+            return np.empty((0, 6), dtype=np.float32)
+
+        cx, cy, w, h = output[:4, candidates]
+        boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+        cls = cls[candidates]
+        best = best[candidates]
+        # 按类别平移后做一次 NMS，等价于逐类别 NMS
+        keep = nms(boxes + cls[:, None] * MAX_WH, best, self.iou, self.max_det)
+        dets = np.empty((len(keep), 6), dtype=np.float32)
+        dets[:, :4] = letterbox.restore(boxes[keep])
+        dets[:, 4] = best[keep]
+        dets[:, 5] = cls[keep]
+        return dets
+
+    def __call__(self, source, conf=0.25, verbose=False, device=None, imgsz=None):
+        """source 为单张 BGR 图或列表，返回 OnnxResult 列表（verbose/device 仅为兼容 ultralytics 的调用方式）
+
+        imgsz 与 ultralytics 的同名参数相同，只对动态输入尺寸的模型生效（固定尺寸的模型忽略）。
+        """
+        frames = source if isinstance(source, (list, tuple)) else [source]
+        if not frames:
+            return []
+        count = len(frames)
+        start = time.perf_counter()
+        blob, letterboxes = self.inputs.prepare(frames, imgsz)
+        preprocessed = time.perf_counter()
+        outputs = self.infer(blob)
+        inferred = time.perf_counter()
+        dets = [self.decode(outputs[k], letterboxes[k], conf) for k in range(count)]
+        done = time.perf_counter()
+        speed = {
+            "preprocess": (preprocessed - start) * 1000 / count,
+            "inference": (inferred - preprocessed) * 1000 / count,
+            "postprocess": (done - inferred) * 1000 / count,
+        }
+        return [OnnxResult(OnnxBoxes(d), speed) for d in dets]
+
+    def warmup(self, size=WARMUP_SIZE):
+        """用一次空白画面推理预热（首次运行会分配内存并选择算子实现）"""
+        self(np.zeros((size, size, 3), dtype=np.uint8))
@@ -0,0 +1,61 @@
+# detection/pacing.py
+"""
+自适应帧率控制：按目标 FPS 和 CPU 预算为循环限速，避免忙等抢占 GUI 和被监控的 App
+"""
+import time
+
+from config import DEFAULT_TARGET_FPS, CPU_BUDGET
+
+
+class RateController:
+    """在每次循环末尾调用 tick()，根据本次迭代耗时决定休眠多久
+
+    - target_fps：目标帧率，可以是数字，也可以是 multiprocessing.Value（运行中可调），<= 0 表示不限速，
+      None 表示使用 config.DEFAULT_TARGET_FPS
+    - cpu_budget：循环允许占用的时间比例（0~1]，耗时 t 的迭代之后至少休眠 t * (1 / cpu_budget - 1)
+    迭代耗时超过帧间隔时不再休眠，由调用方直接取最新帧，中间的帧自然被丢弃。
+    """
+
+    def __init__(self, target_fps=None, cpu_budget=CPU_BUDGET, smoothing=0.1):
+        self.target_fps = DEFAULT_TARGET_FPS if target_fps is None else target_fps
+        self.cpu_budget = cpu_budget
+        self.smoothing = smoothing
+        self.latency = 0.0  # 迭代耗时（指数滑动平均，秒）
+        self.fps = 0.0  # 实际帧率（指数滑动平均）
+        self.dropped = 0  # 因耗时超出帧间隔而落后的次数
+        self._start = time.perf_counter()
+        self._last_tick = None
+
+    def _target(self):
+        value = getattr(self.target_fps, "value", self.target_fps)
+        return float(value or 0)
+
+    def tick(self):
+        """结束一次迭代：统计耗时并休眠到下一个节拍，返回休眠秒数"""
+        now = time.perf_counter()
+        work = now - self._start
+        self.latency += self.smoothing * (work - self.latency)
+        if self._last_tick is not None:
+            interval = now - self._last_tick
+            if interval > 0:
+                self.fps += self.smoothing * (1.0 / interval - self.fps)
+
+        sleep = 0.0
+        target = self._target()
+        if target > 0:
+            period = 1.0 / target
+            if work > period:
+                self.dropped += 1
+            sleep = max(sleep, period - work)
+        if 0 < self.cpu_budget < 1:
+            sleep = max(sleep, work * (1.0 / self.cpu_budget - 1.0))
+        if sleep > 0:
+            time.sleep(sleep)
+
+        self._last_tick = now
+        self._start = time.perf_counter()
+        return sleep
+
+    def restart(self):
+        """跳过空闲等待的时间（例如等待新帧），从现在开始计算本次迭代耗时"""
+        self._start = time.perf_counter()
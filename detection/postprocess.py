@@ -0,0 +1,63 @@
+# detection/postprocess.py
+"""
+检测结果后处理：跨区域合并（类别感知 NMS / 加权框融合）
+
+相邻区域有重叠时，同一个目标可能在两个区域各被检测一次，或被区域边界截成
+两半。合并在绝对屏幕坐标下进行，只在不同区域的同类框之间做抑制/融合，
+单个区域内部的框已由模型自身的 NMS 处理过。
+"""
+import numpy as np
+
+from config import MERGE_METHOD, MERGE_MATCH_METRIC, MERGE_THRESHOLD
+
+
+def box_overlap(box, boxes, metric="iou"):
+    """计算一个框与一组框的重叠度（xyxy），metric 为 "iou" 或 "ios"（交集 / 较小框面积）"""
+    ix1 = np.maximum(box[0], boxes[:, 0])
+    iy1 = np.maximum(box[1], boxes[:, 1])
+    ix2 = np.minimum(box[2], boxes[:, 2])
+    iy2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    if metric == "ios":
+        denom = np.minimum(area, areas)
+    else:
+        denom = area + areas - inter
+    return inter / np.maximum(denom, 1e-6)
+
+
+def merge_tile_detections(detections, threshold=MERGE_THRESHOLD, metric=MERGE_MATCH_METRIC, method=MERGE_METHOD):
+    """合并各区域的检测框（DETECTION_DTYPE 结构化数组），返回合并后的新数组"""
+    if len(detections) < 2:
+        return detections
+
+    order = np.argsort(-detections["conf"], kind="stable")
+    dets = detections[order]
+    boxes = np.stack([dets["x1"], dets["y1"], dets["x2"], dets["y2"]], axis=1).astype(np.float32)
+    conf = dets["conf"].astype(np.float32)
+
+    alive = np.ones(len(dets), dtype=bool)
+    keep = []
+    fused = []
+    for i in range(len(dets)):
+        if not alive[i]:
+            continue
+        alive[i] = False
+        rest = np.flatnonzero(alive)
+        members = rest[(dets["cls"][rest] == dets["cls"][i]) & (dets["region"][rest] != dets["region"][i])]
+        if len(members):
+            members = members[box_overlap(boxes[i], boxes[members], metric) > threshold]
+            alive[members] = False
+        keep.append(i)
+        if method == "wbf" and len(members):
+            cluster = np.concatenate(([i], members))
+            weights = conf[cluster]
+            fused.append(np.round((boxes[cluster] * weights[:, None]).sum(axis=0) / weights.sum()))
+        else:
+            fused.append(boxes[i])
+
+    merged = dets[keep].copy()
+    fused = np.asarray(fused)
+    merged["x1"], merged["y1"], merged["x2"], merged["y2"] = fused.T.astype(np.int32)
+    return merged
@@ -0,0 +1,140 @@
+# detection/roi.py
+"""
+ROI 聚焦调度："roi" 检测模式的两级调度
+
+固定的 2×2 切分下，1080p 窗口的每个区域（约 960×540）都要缩小到模型输入尺寸，小目标容易丢失；
+把整窗切得更细又要每帧推理更多区域。ROI 模式改为：
+
+- 粗检：每隔 ROI_COARSE_INTERVAL 秒把整个窗口推理一次，找出大致的目标
+- 复检：其余节拍只裁剪最近检测框和画面运动区域周围的 ROI_SIZE × ROI_SIZE 原分辨率画面，
+  最多 ROI_MAX_PER_TICK 个拼成一个 batch 推理，每个节拍的推理量有上限
+
+复检结果替换完整落在 ROI 内的原有检测框，ROI 之间和 ROI 边缘的重复框
+按跨区域合并规则（detection.postprocess.merge_tile_detections）处理。
+坐标均为绝对屏幕坐标，区域/ROI 均为 {"left", "top", "width", "height", "id"}。
+"""
+import cv2
+import numpy as np
+
+from config import (ROI_SIZE, ROI_MAX_PER_TICK, ROI_COARSE_INTERVAL, ROI_HOLD_TIME, ROI_MOTION_WIDTH,
+                    ROI_MOTION_THRESHOLD, ROI_MOTION_MIN_AREA)
+from detection.postprocess import merge_tile_detections
+from detection.shared_results import DETECTION_DTYPE
+
+
+def _contained(records, rois):
+    """完整落在任一 ROI 内的检测框掩码（只有这些框能被该 ROI 的复检结果替换）"""
+    mask = np.zeros(len(records), dtype=bool)
+    for roi in rois:
+        mask |= ((records["x1"] >= roi["left"]) & (records["x2"] <= roi["left"] + roi["width"])
+                 & (records["y1"] >= roi["top"]) & (records["y2"] <= roi["top"] + roi["height"]))
+    return mask
+
+
+class RoiScheduler:
+    """记录 ROI 种子（最近的检测框）和画面运动区域，决定每个节拍做粗检还是复检哪些 ROI"""
+
+    def __init__(self, roi_size=ROI_SIZE, max_rois=ROI_MAX_PER_TICK, coarse_interval=ROI_COARSE_INTERVAL,
+                 hold_time=ROI_HOLD_TIME, motion_width=ROI_MOTION_WIDTH, motion_threshold=ROI_MOTION_THRESHOLD,
+                 motion_min_area=ROI_MOTION_MIN_AREA):
+        self.roi_size = roi_size
+        self.max_rois = max_rois
+        self.coarse_interval = coarse_interval
+        self.hold_time = hold_time
+        self.motion_width = motion_width
+        self.motion_threshold = motion_threshold
+        self.motion_min_area = motion_min_area
+        self._seeds = np.empty(0, dtype=DETECTION_DTYPE)
+        self._seen = np.empty(0, dtype=np.float64)  # 种子最近一次被检测到的时间
+        self._motion = []  # 本节拍的运动区域 [(x1, y1, x2, y2, 面积), ...]，按面积从大到小
+        self._last_coarse = None
+        self._small = None
+        self._gray = None
+        self._previous = None
+        self._diff = None
+
+    def reset(self):
+        """窗口几何变化后清空种子，下一个节拍做粗检"""
+        self._seeds = np.empty(0, dtype=DETECTION_DTYPE)
+        self._seen = np.empty(0, dtype=np.float64)
+        self._motion = []
+        self._last_coarse = None
+        self._small = None
+
+    def coarse_due(self, now):
+        return self._last_coarse is None or now - self._last_coarse >= self.coarse_interval
+
+    def update_motion(self, frame, region):
+        """与上一节拍的缩小灰度图比较，找出画面运动区域"""
+        h, w = frame.shape[:2]
+        size = (self.motion_width, max(1, round(h * self.motion_width / w)))
+        if self._small is None or self._small.shape[1::-1] != size:
+            self._small = np.empty((size[1], size[0], 3), dtype=np.uint8)
+            self._gray = np.empty((size[1], size[0]), dtype=np.uint8)
+            self._previous = None
+            self._diff = np.empty_like(self._gray)
+        cv2.resize(frame, size, dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+
+        self._motion = []
+        if self._previous is not None:
+            cv2.absdiff(self._gray, self._previous, dst=self._diff)
+            mask = (self._diff > self.motion_threshold * 255).astype(np.uint8)
+            mask = cv2.dilate(mask, np.ones((3, 3), np.uint8))
+            count, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+            scale = w / size[0]
+            for x, y, bw, bh, area in stats[1:count]:
+                if area >= self.motion_min_area:
+                    self._motion.append((region["left"] + x * scale, region["top"] + y * scale,
+                                         region["left"] + (x + bw) * scale, region["top"] + (y + bh) * scale,
+                                         int(area)))
+            self._motion.sort(key=lambda box: -box[4])
+            self._gray, self._previous = self._previous, self._gray
+        else:
+            self._previous = self._gray.copy()
+
+    def observe(self, detections, covered, now, coarse=False):
+        """记录一次推理的结果：covered（推理过的区域/ROI 列表）范围内的旧种子换成新的检测框"""
+        keep = (now - self._seen <= self.hold_time) & ~_contained(self._seeds, covered)
+        self._seeds = np.concatenate([self._seeds[keep], detections])
+        self._seen = np.concatenate([self._seen[keep], np.full(len(detections), now)])
+        if coarse:
+            self._last_coarse = now
+
+    def plan(self, region, now):
+        """本节拍要复检的 ROI 列表（种子和运动区域轮流取，已被覆盖的跳过，最多 max_rois 个）"""
+        alive = now - self._seen <= self.hold_time
+        seeds = self._seeds[alive]
+        seeds = seeds[np.argsort(-seeds["conf"], kind="stable")]
+        candidates = []
+        for k in range(max(len(seeds), len(self._motion))):
+            if k < len(seeds):
+                seed = seeds[k]
+                candidates.append((seed["x1"], seed["y1"], seed["x2"], seed["y2"]))
+            if k < len(self._motion):
+                candidates.append(self._motion[k][:4])
+
+        width = min(self.roi_size, region["width"])
+        height = min(self.roi_size, region["height"])
+        rois = []
+        for x1, y1, x2, y2 in candidates:
+            if len(rois) >= self.max_rois:
+                break
+            if x2 - x1 > width or y2 - y1 > height:
+                continue  # 比 ROI 还大的目标在粗检中已足够清晰
+            if any(roi["left"] <= x1 and roi["top"] <= y1 and x2 <= roi["left"] + roi["width"]
+                   and y2 <= roi["top"] + roi["height"] for roi in rois):
+                continue
+            left = int(min(max((x1 + x2) / 2 - width / 2, region["left"]), region["left"] + region["width"] - width))
+            top = int(min(max((y1 + y2) / 2 - height / 2, region["top"]), region["top"] + region["height"] - height))
+            rois.append({"left": left, "top": top, "width": width, "height": height, "id": len(rois) + 1})
+        return rois
+
+    @staticmethod
+    def combine(previous, found, rois, region):
+        """用各 ROI 的新结果替换 previous 中完整落在 ROI 内的检测框，合并重复框后返回"""
+        kept = previous[~_contained(previous, rois)]
+        kept["region"] = 0
+        merged = merge_tile_detections(np.concatenate([kept, *found]))
+        merged["region"] = region["id"]
+        return merged
@@ -0,0 +1,204 @@
+# detection/scheduler.py
+"""
+多窗口共享调度表
+
+多窗口模式下所有窗口共用同一组检测工作进程（每个进程一份模型）。工作进程空闲时从共享调度表中
+领取一个窗口，把该窗口最新一帧的所有区域拼成一个 batch 推理，完成后归还；采集进程只在窗口
+到期时截图。调度规则：
+
+- 目标帧率：每个窗口两次领取的间隔不小于 1 / 目标帧率（0 表示使用全局目标帧率）
+- 优先级与公平：按加权虚拟时间（stride 调度）选择，每完成一次推理，窗口的虚拟时间增加
+  推理耗时 / 优先级，到期的窗口中虚拟时间最小的先被领取
+- 份额上限：虚拟时间领先其他活跃窗口（正在推理或有待领取的新帧）超过 WINDOW_SHARE_SLACK 秒的窗口
+  暂不领取，即使有空闲的工作进程。工作进程数不少于窗口数时（例如默认的 2 个进程监控 2 个窗口）
+  每个窗口都能分到一个进程，仅靠排序不会产生竞争，由这条规则保证推理时间仍按优先级分配；
+  优先级高的窗口没有新帧或未到期时，其他窗口不受限制
+- 空闲过的窗口（暂停、未到期）领取时虚拟时间不低于当前的最小值，不会因为积累了额度而长时间独占工作进程
+- 同一窗口同一时刻只会被一个工作进程领取，结果按帧号顺序发布
+
+领取和归还需要互斥：锁由工作进程池在创建进程时传入（multiprocessing.Lock 只能通过继承共享），
+单进程使用时可以不加锁。
+"""
+import time
+from contextlib import nullcontext
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from config import WINDOW_SHARE_SLACK
+from detection.shared_results import _attach_shared_memory
+
+LOCK_TIMEOUT = 1.0  # 领取时等待锁的最长时间（秒），超时本次不领取；归还一直等待
+RATE_SMOOTHING = 0.2  # 实际帧率的指数滑动平均系数
+
+SCHEDULE_DTYPE = np.dtype([
+    ("priority", np.float64),
+    ("target_fps", np.float64),  # 0 表示使用全局目标帧率
+    ("vtime", np.float64),  # 加权虚拟时间（秒）
+    ("started", np.float64),  # 最近一次领取的时间（time.monotonic）
+    ("fps", np.float64),  # 实际帧率（指数滑动平均）
+    ("busy", np.float64),  # 累计推理时间（秒）
+    ("frames", np.uint64),
+    ("frame_id", np.uint64),  # 最近一次领取时的最新帧号
+    ("owner", np.int32),  # 正在处理该窗口的工作进程编号，-1 表示空闲
+])
+
+
+class SharedScheduler:
+    """内存布局：min_vtime | entries[num_windows]"""
+
+    def __init__(self, num_windows, name=None, slack=WINDOW_SHARE_SLACK):
+        self.num_windows = num_windows
+        self.slack = slack
+        self.lock = None
+        self._owner = name is None
+        size = 8 + SCHEDULE_DTYPE.itemsize * num_windows
+        if self._owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            self._shm.buf[:size] = bytes(size)
+        else:
+            self._shm = _attach_shared_memory(name)
+        buf = self._shm.buf
+        self._min_vtime = np.ndarray((1,), dtype=np.float64, buffer=buf, offset=0)
+        self._table = np.ndarray((num_windows,), dtype=SCHEDULE_DTYPE, buffer=buf, offset=8)
+        if self._owner:
+            self._table["priority"] = 1.0
+            self._table["owner"] = -1
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def __getstate__(self):
+        return {"name": self.name, "num_windows": self.num_windows, "slack": self.slack}
+
+    def __setstate__(self, state):
+        self.__init__(state["num_windows"], name=state["name"], slack=state["slack"])
+
+    def _locked(self, timeout=LOCK_TIMEOUT):
+        """timeout 为 None 时一直等到取得锁"""
+        if self.lock is None:
+            return nullcontext(True)
+        return _TimedLock(self.lock, timeout)
+
+    # ---------------- 主进程 ----------------
+
+    def configure(self, index, priority=None, target_fps=None):
+        """设置窗口的优先级（权重，> 0）和目标帧率（0 表示使用全局目标帧率），运行中修改下一次领取即生效"""
+        if priority is not None:
+            if priority <= 0:
+                raise ValueError(f"优先级必须大于 0：{priority}")
+            self._table[index]["priority"] = priority
+        if target_fps is not None:
+            self._table[index]["target_fps"] = max(0.0, target_fps)
+
+    def read(self):
+        """返回各窗口的 {"priority", "target_fps", "fps", "frames", "share"}，share 为累计推理时间占比"""
+        table = self._table.copy()
+        total = float(table["busy"].sum())
+        return [{"priority": float(e["priority"]), "target_fps": float(e["target_fps"]),
+                 "fps": round(float(e["fps"]), 2), "frames": int(e["frames"]),
+                 "share": float(e["busy"]) / total if total else 0.0} for e in table]
+
+    # ---------------- 采集进程 ----------------
+
+    def due(self, index, now, default_fps=0.0):
+        """窗口是否已到下一次推理的时间（采集进程据此决定是否截图）"""
+        entry = self._table[index]
+        fps = float(entry["target_fps"]) or float(default_fps or 0)
+        return fps <= 0 or now - float(entry["started"]) >= 1.0 / fps
+
+    # ---------------- 检测工作进程 ----------------
+
+    def claim(self, worker, latest_ids, now, default_fps=0.0):
+        """领取一个有新帧、已到期且空闲的窗口，返回窗口下标；没有可领取的窗口时返回 None
+
+        latest_ids 为各窗口帧环的最新帧号。
+        """
+        with self._locked() as acquired:
+            if not acquired:
+                return None
+            best = None
+            active = []  # 正在处理或可以领取的窗口的虚拟时间
+            for index in range(self.num_windows):
+                entry = self._table[index]
+                if entry["owner"] >= 0:
+                    active.append(float(entry["vtime"]))
+                    continue
+                if latest_ids[index] <= entry["frame_id"] or not self.due(index, now, default_fps):
+                    continue
+                active.append(float(entry["vtime"]))
+                if best is None or entry["vtime"] < self._table[best]["vtime"]:
+                    best = index
+            if best is None:
+                return None
+            # 虚拟时间的下限只随活跃窗口前进，空闲过的窗口不保留积累的额度
+            floor = max(float(self._min_vtime[0]), min(active))
+            self._min_vtime[0] = floor
+            entry = self._table[best]
+            entry["vtime"] = max(float(entry["vtime"]), floor)
+            if entry["vtime"] > floor + self.slack:
+                return None  # 已超出按优先级应得的份额，等落后的窗口推理
+            if entry["started"] > 0:
+                interval = now - float(entry["started"])
+                if interval > 0:
+                    entry["fps"] += RATE_SMOOTHING * (1.0 / interval - entry["fps"])
+            entry["started"] = now
+            entry["frame_id"] = latest_ids[best]
+            entry["owner"] = worker
+            return best
+
+    def release(self, index, seconds):
+        """归还窗口：seconds 为本次推理耗时，按优先级折算进虚拟时间（一直等到取得锁，归还不能丢）"""
+        with self._locked(timeout=None):
+            entry = self._table[index]
+            entry["vtime"] += seconds / float(entry["priority"])
+            entry["busy"] += seconds
+            entry["frames"] += 1
+            entry["owner"] = -1
+
+    def release_owned(self, worker):
+        """释放 worker 领取后未归还的窗口（工作进程崩溃重启后调用），这些窗口的当前帧可以重新领取"""
+        with self._locked(timeout=None):
+            owned = self._table["owner"] == worker
+            self._table["frame_id"][owned] = 0
+            self._table["owner"][owned] = -1
+
+    def close(self):
+        self._min_vtime = self._table = None
+        try:
+            self._shm.close()
+        except BufferError:
+            pass
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class _TimedLock:
+    """带超时的 with 语句：进入时返回是否取得锁（timeout 为 None 时一直等待）"""
+
+    def __init__(self, lock, timeout=LOCK_TIMEOUT):
+        self.lock = lock
+        self.timeout = timeout
+        self.acquired = False
+
+    def __enter__(self):
+        self.acquired = self.lock.acquire(timeout=self.timeout)
+        return self.acquired
+
+    def __exit__(self, *exc):
+        if self.acquired:
+            self.lock.release()
+
+
+def format_schedule(report):
+    """把 MultiWindowEngine.schedule() 的结果格式化为一行文本，用于界面显示"""
+    parts = []
+    for entry in report:
+        target = f"/{entry['target_fps']:g}" if entry["target_fps"] else ""
+        parts.append(f"{entry['title']} ×{entry['priority']:g} {entry['fps']:.1f}{target} FPS "
+                     f"占用{entry['share']:.0%}")
+    return " | ".join(parts)
@@ -0,0 +1,161 @@
+# detection/shared_results.py
+"""
+共享内存检测结果缓冲区
+
+替代 multiprocessing.Manager().list()：每个区域在共享内存中拥有固定容量的
+结构化数组和一个序列号（seqlock）。子进程一次写入整帧检测框，显示线程无需
+IPC 即可读取到一致的快照。
+"""
+import json
+import sys
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from config import MAX_DETECTIONS_PER_REGION
+
+# 单个检测框的记录格式（绝对屏幕坐标）
+DETECTION_DTYPE = np.dtype([
+    ("x1", np.int32),
+    ("y1", np.int32),
+    ("x2", np.int32),
+    ("y2", np.int32),
+    ("conf", np.float32),
+    ("cls", np.int32),
+    ("region", np.int32),
+    ("track_id", np.int32),  # 跟踪模式下的目标编号，未跟踪时为 -1
+])
+
+# 类别名称区大小（JSON 编码，由第一个加载完模型的子进程写入）
+NAMES_BYTES = 64 * 1024
+
+
+def _align(offset, alignment=8):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def _attach_shared_memory(name):
+    """按名称连接已存在的共享内存（子进程不参与资源回收）"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+class SharedDetectionBuffer:
+    """固定容量的多区域检测结果共享缓冲区
+
+    内存布局：seq[n] | frame[n] | count[n] | boxes[n, capacity] | names_len | names
+    写入方先把 seq 加一（奇数表示写入中），写完后再加一；读取方在 seq 为偶数
+    且读取前后不变时才认为快照一致。
+    """
+
+    def __init__(self, num_regions, capacity=MAX_DETECTIONS_PER_REGION, name=None):
+        self.num_regions = num_regions
+        self.capacity = capacity
+        self._owner = name is None
+
+        self._seq_offset = 0
+        self._frame_offset = _align(8 * num_regions)
+        self._count_offset = _align(self._frame_offset + 8 * num_regions)
+        self._boxes_offset = _align(self._count_offset + 4 * num_regions)
+        self._names_offset = _align(self._boxes_offset + DETECTION_DTYPE.itemsize * num_regions * capacity)
+        size = self._names_offset + 8 + NAMES_BYTES
+
+        if self._owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            self._shm.buf[:size] = bytes(size)
+        else:
+            self._shm = _attach_shared_memory(name)
+
+        buf = self._shm.buf
+        self._seq = np.ndarray((num_regions,), dtype=np.uint64, buffer=buf, offset=self._seq_offset)
+        self._frame = np.ndarray((num_regions,), dtype=np.uint64, buffer=buf, offset=self._frame_offset)
+        self._count = np.ndarray((num_regions,), dtype=np.int32, buffer=buf, offset=self._count_offset)
+        self._boxes = np.ndarray((num_regions, capacity), dtype=DETECTION_DTYPE, buffer=buf,
+                                 offset=self._boxes_offset)
+        self._names_len = np.ndarray((1,), dtype=np.int64, buffer=buf, offset=self._names_offset)
+        self._names_cache = None
+        self._last_snapshot = [(0, np.empty(0, dtype=DETECTION_DTYPE)) for _ in range(num_regions)]
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    # 通过名称在子进程中重新连接，而不是复制整个缓冲区
+    def __getstate__(self):
+        return {"name": self.name, "num_regions": self.num_regions, "capacity": self.capacity}
+
+    def __setstate__(self, state):
+        self.__init__(state["num_regions"], state["capacity"], name=state["name"])
+
+    def publish(self, region_index, records, frame_id=0):
+        """一次性写入某个区域当前帧的全部检测框（超出容量的部分被丢弃）
+
+        frame_id 为检测所用帧在共享帧环中的帧号，显示端据此取回同一帧绘制。
+        """
+        n = min(len(records), self.capacity)
+        seq = int(self._seq[region_index])
+        self._seq[region_index] = seq + 1
+        if n:
+            self._boxes[region_index, :n] = records[:n]
+        self._count[region_index] = n
+        self._frame[region_index] = frame_id
+        self._seq[region_index] = seq + 2
+
+    def read_region(self, region_index, retries=8):
+        """读取单个区域的一致快照 (帧号, 检测框)；多次重试仍在写入时返回上一次的结果"""
+        for _ in range(retries):
+            seq = int(self._seq[region_index])
+            if seq & 1:
+                continue
+            n = int(self._count[region_index])
+            frame_id = int(self._frame[region_index])
+            data = self._boxes[region_index, :n].copy()
+            if int(self._seq[region_index]) == seq:
+                self._last_snapshot[region_index] = (frame_id, data)
+                return frame_id, data
+        return self._last_snapshot[region_index]
+
+    def snapshot(self):
+        """读取所有区域的检测结果，返回 (各区域帧号列表, DETECTION_DTYPE 结构化数组)"""
+        frame_ids = []
+        parts = []
+        for i in range(self.num_regions):
+            frame_id, data = self.read_region(i)
+            frame_ids.append(frame_id)
+            parts.append(data)
+        detections = np.concatenate(parts) if parts else np.empty(0, dtype=DETECTION_DTYPE)
+        return frame_ids, detections
+
+    def set_names(self, names):
+        """写入类别名称表（{类别ID: 名称}）"""
+        data = json.dumps({int(k): v for k, v in dict(names).items()}, ensure_ascii=False).encode("utf-8")
+        if len(data) > NAMES_BYTES:
+            raise ValueError(f"类别名称表过大：{len(data)} 字节")
+        start = self._names_offset + 8
+        self._shm.buf[start:start + len(data)] = data
+        self._names_len[0] = len(data)
+
+    def names(self):
+        """读取类别名称表，尚未写入时返回空字典"""
+        if self._names_cache is None:
+            n = int(self._names_len[0])
+            if not n:
+                return {}
+            start = self._names_offset + 8
+            raw = bytes(self._shm.buf[start:start + n])
+            self._names_cache = {int(k): v for k, v in json.loads(raw.decode("utf-8")).items()}
+        return self._names_cache
+
+    def close(self):
+        # 先释放自身持有的 numpy 视图，否则 SharedMemory.close() 会因导出的缓冲区报错
+        self._seq = self._frame = self._count = self._boxes = self._names_len = None
+        try:
+            self._shm.close()
+        except BufferError:
+            pass  # 其他线程仍持有视图，映射随视图回收后释放
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
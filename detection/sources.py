@@ -0,0 +1,258 @@
+# detection/sources.py
+"""
+帧源抽象：屏幕截图、视频文件、图片文件夹、合成画面
+
+帧源对象本身只保存配置，可以作为参数传给采集进程；真正的句柄（mss、
+VideoCapture 等）在采集进程中调用 open() 时才创建。read() 返回 BGR 图像，
+传入 out 时直接写入该缓冲区（例如共享帧环的槽位），读完返回 None。
+"""
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+
+class FrameSource:
+    """帧源接口"""
+
+    # 最近一次 read() 的分阶段耗时（秒），例如 {"capture": ..., "convert": ...}；None 表示只统计总耗时
+    timings = None
+
+    def size(self):
+        """返回 (宽, 高)，用于在启动前分配共享帧环"""
+        raise NotImplementedError
+
+    def region(self):
+        """帧在屏幕上的位置（检测框使用的坐标系）；非屏幕帧源位于原点"""
+        width, height = self.size()
+        return {"left": 0, "top": 0, "width": width, "height": height, "title": self.describe()}
+
+    def describe(self):
+        return type(self).__name__
+
+    def set_region(self, region):
+        """窗口移动或缩放后更新截图区域；非屏幕帧源的画面固定，忽略"""
+        pass
+
+    def open(self):
+        pass
+
+    def read(self, out=None):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def _emit(frame, out):
+        if out is None:
+            return frame
+        np.copyto(out, frame)
+        return out
+
+
+class ScreenSource(FrameSource):
+    """mss 屏幕截图（生产环境默认帧源）"""
+
+    def __init__(self, app_region):
+        self.monitor = {
+            "left": app_region["left"],
+            "top": app_region["top"],
+            "width": app_region["width"],
+            "height": app_region["height"]
+        }
+        self.title = app_region.get("title", "")
+        self._sct = None
+
+    def size(self):
+        return self.monitor["width"], self.monitor["height"]
+
+    def region(self):
+        return dict(self.monitor, title=self.title)
+
+    def describe(self):
+        return f"屏幕截图 {self.title}".strip()
+
+    def set_region(self, region):
+        self.monitor = {key: region[key] for key in ("left", "top", "width", "height")}
+
+    def open(self):
+        import mss
+        self._sct = mss.mss()
+
+    def read(self, out=None):
+        start = time.perf_counter()
+        sct_img = self._sct.grab(self.monitor)
+        grabbed = time.perf_counter()
+        # np.asarray 直接引用 mss 的原始缓冲区，颜色转换直接写入目标缓冲区
+        frame = cv2.cvtColor(np.asarray(sct_img), cv2.COLOR_BGRA2BGR, dst=out)
+        self.timings = {"capture": grabbed - start, "convert": time.perf_counter() - grabbed}
+        return frame
+
+    def close(self):
+        if self._sct is not None:
+            self._sct.close()
+            self._sct = None
+
+
+class VideoFileSource(FrameSource):
+    """视频文件回放（起止时间的处理方式与 tools/get_img.py 的视频转图片一致）"""
+
+    def __init__(self, video_path, start_time=0.0, end_time=None, loop=False):
+        self.video_path = video_path
+        self.start_time = start_time
+        self.end_time = end_time
+        self.loop = loop
+        self._cap = None
+        self._start_frame = 0
+        self._end_frame = None
+        self._current_frame = 0
+
+    def size(self):
+        cap = cv2.VideoCapture(self.video_path)
+        try:
+            if not cap.isOpened():
+                raise RuntimeError(f"无法打开视频文件：{self.video_path}")
+            return int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        finally:
+            cap.release()
+
+    def describe(self):
+        return f"视频 {os.path.basename(self.video_path)}"
+
+    def open(self):
+        self._cap = cv2.VideoCapture(self.video_path)
+        if not self._cap.isOpened():
+            raise RuntimeError(f"无法打开视频文件：{self.video_path}")
+        fps = self._cap.get(cv2.CAP_PROP_FPS) or 30.0
+        total_frames = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self._start_frame = int(self.start_time * fps)
+        end_frame = total_frames - 1 if self.end_time is None else int(self.end_time * fps)
+        self._end_frame = min(end_frame, total_frames - 1) if total_frames > 0 else end_frame
+        self._seek_start()
+
+    def _seek_start(self):
+        self._current_frame = self._start_frame
+        self._cap.set(cv2.CAP_PROP_POS_FRAMES, self._current_frame)
+
+    def read(self, out=None):
+        if self._current_frame > self._end_frame:
+            if not self.loop:
+                return None
+            self._seek_start()
+        ret, frame = self._cap.read()
+        if not ret:
+            if not self.loop or self._current_frame == self._start_frame:
+                return None
+            self._seek_start()
+            ret, frame = self._cap.read()
+            if not ret:
+                return None
+        self._current_frame += 1
+        return self._emit(frame, out)
+
+    def close(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+
+class ImageFolderSource(FrameSource):
+    """按文件名顺序读取文件夹中的图片；尺寸与第一张不同的图片会被缩放"""
+
+    IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".webp")
+
+    def __init__(self, folder, loop=False):
+        self.folder = folder
+        self.loop = loop
+        self._files = []
+        self._index = 0
+        self._size = None
+
+    def _list_files(self):
+        files = [f for f in sorted(glob.glob(os.path.join(self.folder, "*")))
+                 if f.lower().endswith(self.IMAGE_EXTENSIONS)]
+        if not files:
+            raise RuntimeError(f"文件夹中没有图片：{self.folder}")
+        return files
+
+    def size(self):
+        if self._size is None:
+            first = cv2.imread(self._list_files()[0])
+            if first is None:
+                raise RuntimeError(f"无法读取图片：{self._list_files()[0]}")
+            self._size = (first.shape[1], first.shape[0])
+        return self._size
+
+    def describe(self):
+        return f"图片文件夹 {self.folder}"
+
+    def open(self):
+        self._files = self._list_files()
+        self._index = 0
+        self.size()
+
+    def read(self, out=None):
+        # 跳过无法读取的文件；连续一整轮都无法读取时报错，而不是无限重试
+        for _ in range(len(self._files)):
+            if self._index >= len(self._files):
+                if not self.loop:
+                    return None
+                self._index = 0
+            frame = cv2.imread(self._files[self._index])
+            self._index += 1
+            if frame is not None:
+                break
+        else:
+            raise RuntimeError(f"无法读取图片：{self.folder} 中连续 {len(self._files)} 个文件都无法读取")
+        if (frame.shape[1], frame.shape[0]) != self._size:
+            frame = cv2.resize(frame, self._size, interpolation=cv2.INTER_AREA)
+        return self._emit(frame, out)
+
+
+class SyntheticSource(FrameSource):
+    """可复现的合成画面：纹理背景上若干匀速移动的彩色矩形（帧内容只取决于种子和帧序号）"""
+
+    def __init__(self, width=1280, height=720, num_objects=8, num_frames=None, seed=0):
+        self.width = width
+        self.height = height
+        self.num_objects = num_objects
+        self.num_frames = num_frames
+        self.seed = seed
+        self._background = None
+        self._objects = None
+        self._index = 0
+
+    def size(self):
+        return self.width, self.height
+
+    def describe(self):
+        return f"合成画面 {self.width}x{self.height}"
+
+    def open(self):
+        rng = np.random.default_rng(self.seed)
+        noise = rng.integers(0, 64, size=(self.height // 8 + 1, self.width // 8 + 1, 3), dtype=np.uint8)
+        self._background = cv2.resize(noise, (self.width, self.height), interpolation=cv2.INTER_LINEAR)
+        sizes = rng.integers(24, max(25, min(self.width, self.height) // 4), size=(self.num_objects, 2))
+        positions = rng.uniform(0, 1, size=(self.num_objects, 2)) * [self.width, self.height]
+        velocities = rng.uniform(-6, 6, size=(self.num_objects, 2))
+        colors = rng.integers(64, 256, size=(self.num_objects, 3))
+        self._objects = list(zip(positions, velocities, sizes, colors))
+        self._index = 0
+
+    def read(self, out=None):
+        if self.num_frames is not None and self._index >= self.num_frames:
+            return None
+        frame = out if out is not None else np.empty((self.height, self.width, 3), dtype=np.uint8)
+        np.copyto(frame, self._background)
+        span = np.array([self.width, self.height], dtype=np.float64)
+        for position, velocity, (w, h), color in self._objects:
+            # 在画面内往返运动
+            x, y = np.abs((position + velocity * self._index) % (2 * span) - span)
+            x1 = int(min(x, self.width - w))
+            y1 = int(min(y, self.height - h))
+            cv2.rectangle(frame, (x1, y1), (x1 + int(w), y1 + int(h)), tuple(int(c) for c in color), -1)
+        self._index += 1
+        return frame
@@ -0,0 +1,238 @@
+# detection/supervisor.py
+"""
+工作进程健康监控
+
+每个常驻工作进程在共享内存中有一个健康槽位：状态、心跳时间、最近一帧的时间、
+累计帧数、出错和重启次数以及最近一次错误信息。工作进程在每个节拍（空闲时按
+HEARTBEAT_INTERVAL）更新心跳；主进程中的 WorkerSupervisor 线程定期检查，
+发现进程崩溃、任务出错或心跳停止（卡死）时按指数退避重启该工作进程并重新派发本次会话的任务。
+模型连续加载失败 MODEL_LOAD_MAX_FAILURES 次（文件损坏、格式不支持等）时不再重启，
+WorkerSupervisor.error 记录失败原因，检测引擎据此结束本次会话。
+
+槽位约定：0 = 采集工作进程，1 + i = 第 i 个检测工作进程。
+"""
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from config import (WORKER_STALL_TIMEOUT, SUPERVISOR_INTERVAL, RESTART_BACKOFF_BASE, RESTART_BACKOFF_MAX,
+                    RESTART_BACKOFF_RESET, MODEL_LOAD_MAX_FAILURES)
+from detection.shared_results import _attach_shared_memory
+
+IDLE, LOADING, RUNNING, ERROR, DEAD = range(5)
+STATE_LABELS = {IDLE: "空闲", LOADING: "加载模型", RUNNING: "运行中", ERROR: "出错", DEAD: "已退出"}
+
+HEALTH_DTYPE = np.dtype([
+    ("state", np.int32),
+    ("pid", np.int32),
+    ("heartbeat", np.float64),
+    ("last_frame", np.float64),
+    ("frames", np.uint64),
+    ("errors", np.uint32),
+    ("restarts", np.uint32),
+    ("load_failures", np.uint32),  # 连续加载模型失败的次数，加载成功后清零
+    ("message", "S120"),
+])
+
+CAPTURE_WORKER_SLOT = 0
+
+
+def worker_slot(worker_index):
+    return 1 + worker_index
+
+
+class SharedWorkerHealth:
+    """所有工作进程的健康状态表（共享内存）"""
+
+    def __init__(self, num_slots, name=None):
+        self.num_slots = num_slots
+        self._owner = name is None
+        size = HEALTH_DTYPE.itemsize * num_slots
+        if self._owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            self._shm.buf[:size] = bytes(size)
+        else:
+            self._shm = _attach_shared_memory(name)
+        self._table = np.ndarray((num_slots,), dtype=HEALTH_DTYPE, buffer=self._shm.buf)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def __getstate__(self):
+        return {"name": self.name, "num_slots": self.num_slots}
+
+    def __setstate__(self, state):
+        self.__init__(state["num_slots"], name=state["name"])
+
+    def set_state(self, slot, state, message=None):
+        entry = self._table[slot]
+        entry["state"] = state
+        entry["heartbeat"] = time.time()
+        if state == ERROR:
+            entry["errors"] += 1
+        if message is not None:
+            entry["message"] = message.encode("utf-8")[:HEALTH_DTYPE["message"].itemsize]
+
+    def beat(self, slot):
+        self._table[slot]["heartbeat"] = time.time()
+
+    def frame_done(self, slot):
+        now = time.time()
+        entry = self._table[slot]
+        entry["heartbeat"] = now
+        entry["last_frame"] = now
+        entry["frames"] += 1
+
+    def set_pid(self, slot, pid):
+        self._table[slot]["pid"] = pid
+
+    def add_restart(self, slot):
+        self._table[slot]["restarts"] += 1
+
+    def record_load(self, slot, ok):
+        entry = self._table[slot]
+        entry["load_failures"] = 0 if ok else entry["load_failures"] + 1
+
+    def read(self, slot):
+        entry = self._table[slot].copy()
+        return {
+            "state": int(entry["state"]),
+            "pid": int(entry["pid"]),
+            "heartbeat": float(entry["heartbeat"]),
+            "last_frame": float(entry["last_frame"]),
+            "frames": int(entry["frames"]),
+            "errors": int(entry["errors"]),
+            "restarts": int(entry["restarts"]),
+            "load_failures": int(entry["load_failures"]),
+            "message": entry["message"].decode("utf-8", errors="ignore"),
+        }
+
+    def close(self):
+        self._table = None
+        try:
+            self._shm.close()
+        except BufferError:
+            pass
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class HealthReporter:
+    """绑定到某个槽位的心跳上报器，传给采集/检测循环（接口与 None 判空配合使用）"""
+
+    def __init__(self, health, slot):
+        self.health = health
+        self.slot = slot
+
+    def beat(self):
+        self.health.beat(self.slot)
+
+    def frame_done(self):
+        self.health.frame_done(self.slot)
+
+
+class WorkerSupervisor:
+    """后台线程：检查工作进程是否崩溃、出错或卡死，并按指数退避重启
+
+    pool 需要提供 active_workers()（本次会话有任务的工作进程）、status(key) 和 restart(key, hard)。
+    """
+
+    def __init__(self, pool, interval=SUPERVISOR_INTERVAL, stall_timeout=WORKER_STALL_TIMEOUT,
+                 backoff_base=RESTART_BACKOFF_BASE, backoff_max=RESTART_BACKOFF_MAX,
+                 backoff_reset=RESTART_BACKOFF_RESET, max_load_failures=MODEL_LOAD_MAX_FAILURES, log=print):
+        self.pool = pool
+        self.interval = interval
+        self.stall_timeout = stall_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.backoff_reset = backoff_reset
+        self.max_load_failures = max_load_failures
+        self.log = log
+        self.error = None  # 无法通过重启恢复的错误（模型连续加载失败），本次会话应结束
+        self._failures = {}  # 连续失败次数
+        self._next_attempt = {}  # 下一次允许重启的时间
+        self._last_restart = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            # 等待进行中的检查和重启结束（重启最多等待旧进程退出 1 秒），
+            # 避免它在下一次会话派发任务之后才根据旧会话的状态重启工作进程
+            self._thread.join()
+            self._thread = None
+        self._failures.clear()
+        self._next_attempt.clear()
+        self._last_restart.clear()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                self.log(f"[监控] 检查工作进程出错：{e}")
+
+    def check(self):
+        now = time.monotonic()
+        for key in self.pool.active_workers():
+            alive, health = self.pool.status(key)
+            stalled = (health["state"] == RUNNING and self.stall_timeout > 0
+                       and time.time() - health["heartbeat"] > self.stall_timeout)
+            if alive and health["state"] != ERROR and not stalled:
+                # 连续正常运行一段时间后重置退避
+                if now - self._last_restart.get(key, 0.0) > self.backoff_reset:
+                    self._failures.pop(key, None)
+                continue
+            if health["load_failures"] >= self.max_load_failures:
+                # 确定性的加载错误，重启只会重复失败
+                if self.error is None:
+                    self.error = f"工作进程 {key} 连续 {health['load_failures']} 次加载模型失败：{health['message']}"
+                    self.log(f"[监控] {self.error}，不再重启")
+                continue
+            if now < self._next_attempt.get(key, 0.0):
+                continue
+
+            failures = self._failures.get(key, 0) + 1
+            self._failures[key] = failures
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (failures - 1))
+            self._next_attempt[key] = now + delay
+            self._last_restart[key] = now
+            reason = "进程已退出" if not alive else ("心跳超时" if stalled else health["message"] or "任务出错")
+            self.log(f"[监控] 工作进程 {key} {reason}，第 {failures} 次重启（下次至少等待 {delay:.0f}s）")
+            self.pool.restart(key, hard=not alive or stalled)
+
+
+def format_health(report):
+    """把 DetectionEngine.health() 的结果格式化为一行文本，用于界面显示"""
+    parts = []
+    now = time.time()
+    for name, health in report.items():
+        state = health["state"]
+        if state == RUNNING and health["heartbeat"] and now - health["heartbeat"] > WORKER_STALL_TIMEOUT / 2:
+            icon, text = "⚠️", f"无心跳 {now - health['heartbeat']:.0f}s"
+        elif state == ERROR and health["load_failures"] >= MODEL_LOAD_MAX_FAILURES:
+            icon, text = "❌", "模型加载失败"
+        elif state in (ERROR, DEAD):
+            icon, text = "❌", STATE_LABELS[state]
+        elif state == LOADING:
+            icon, text = "⏳", STATE_LABELS[state]
+        else:
+            icon, text = "✅", STATE_LABELS[state]
+        if state == RUNNING and health["last_frame"]:
+            text += f" {now - health['last_frame']:.1f}s前出帧"
+        if health["restarts"]:
+            text += f" 重启{health['restarts']}次"
+        parts.append(f"{icon} {name} {text}")
+    return " | ".join(parts)
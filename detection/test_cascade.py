@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模型级联测试脚本
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detection.cascade import ModelCascade, fast_model_path
+
+NAMES = {0: "person", 1: "car"}
+
+
+class FakeModel:
+    """按画面左上角像素值返回预设检测结果的模型，记录每次调用的图片数和参数"""
+
+    def __init__(self, outputs):
+        self.names = NAMES
+        self.outputs = outputs  # 像素值 -> [[x1, y1, x2, y2, conf, cls], ...]
+        self.calls = []
+
+    def __call__(self, frames, conf=0.25, verbose=False, device=None, **kwargs):
+        self.calls.append((len(frames), conf, kwargs))
+        results = []
+        for frame in frames:
+            data = np.array(self.outputs.get(int(frame[0, 0, 0]), []), dtype=np.float32).reshape(-1, 6)
+            results.append(SimpleNamespace(boxes=SimpleNamespace(data=data[data[:, 4] >= conf]),
+                                           speed={"inference": 1.0}))
+        return results
+
+
+def _frame(value):
+    return np.full((64, 64, 3), value, dtype=np.uint8)
+
+
+def test_escalation():
+    """测试只有出现候选目标的区域交给大模型"""
+    print("=== 测试按需复检 ===")
+
+    fast = FakeModel({1: [[0, 0, 10, 10, 0.2, 0]]})
+    accurate = FakeModel({1: [[1, 1, 11, 11, 0.9, 0]]})
+    cascade = ModelCascade(fast, accurate, fast_imgsz=320, trigger_conf=0.15, audit_interval=0)
+    results = cascade([_frame(0), _frame(1)], conf=0.5)
+    print(fast.calls, accurate.calls)
+    assert fast.calls == [(2, 0.15, {"imgsz": 320})]
+    assert accurate.calls == [(1, 0.5, {})]
+    assert len(results[0].boxes.data) == 0
+    assert np.allclose(results[1].boxes.data, [[1, 1, 11, 11, 0.9, 0]])
+    assert results[1].speed["inference"] == 2.0  # 小模型 + 大模型
+    print()
+
+
+def test_classes():
+    """测试非候选类别直接采用小模型的结果"""
+    print("=== 测试候选类别 ===")
+
+    fast = FakeModel({0: [[0, 0, 10, 10, 0.7, 1], [20, 20, 30, 30, 0.3, 1]]})
+    accurate = FakeModel({})
+    cascade = ModelCascade(fast, accurate, trigger_conf=0.15, classes=[0], audit_interval=0)
+    results = cascade(_frame(0), conf=0.5)
+    print(results[0].boxes.data)
+    assert not accurate.calls
+    assert results[0].boxes.data[:, 5].tolist() == [1]
+    assert np.allclose(results[0].boxes.data[:, 4], [0.7])
+    print()
+
+
+def test_audit():
+    """测试定期抽查：首次调用和抽查到期时整批复检"""
+    print("=== 测试定期抽查 ===")
+
+    fast = FakeModel({})
+    accurate = FakeModel({0: [[0, 0, 10, 10, 0.9, 0]]})
+    cascade = ModelCascade(fast, accurate, audit_interval=60)
+    first = cascade([_frame(0), _frame(0)], conf=0.5)
+    assert accurate.calls == [(2, 0.5, {})]
+    assert len(first[0].boxes.data) == 1
+    cascade([_frame(0)], conf=0.5)
+    assert len(accurate.calls) == 1  # 未到抽查时间，小模型没有候选目标
+    cascade._last_audit -= 60
+    cascade([_frame(0)], conf=0.5)
+    assert len(accurate.calls) == 2
+    print()
+
+
+def test_fast_model_path():
+    """测试开启级联时检查小模型文件是否存在"""
+    print("=== 测试小模型路径检查 ===")
+
+    assert fast_model_path(False, "不存在.pt") is None
+    assert fast_model_path(True, __file__) == __file__
+    try:
+        fast_model_path(True, "不存在.pt")
+        assert False, "小模型文件不存在时应报错"
+    except FileNotFoundError as e:
+        print(e)
+    print()
+
+
+def main():
+    """主函数"""
+    print("模型级联测试")
+    print("=" * 50)
+
+    try:
+        test_escalation()
+        test_classes()
+        test_audit()
+        test_fast_model_path()
+
+        print("所有测试完成！")
+
+    except Exception as e:
+        print(f"测试过程中出现错误: {e}")
+        import traceback
+        traceback.print_exc()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+帧差门控测试脚本
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detection.detector import _detect_window
+from detection.frame_ring import SharedFrameRing
+from detection.gating import ChangeGate
+from detection.layout import SharedLayout
+from detection.metrics import StageRecorder
+from detection.shared_results import SharedDetectionBuffer
+
+
+def _frame(value, block=None):
+    frame = np.full((120, 160, 3), value, dtype=np.uint8)
+    if block is not None:
+        frame[:60, :80] = block
+    return frame
+
+
+def test_skip_unchanged():
+    """测试画面不变时跳过推理，明显变化后重新推理"""
+    print("=== 测试跳过不变画面 ===")
+
+    gate = ChangeGate(threshold=0.02, refresh_interval=60, size=32)
+    assert gate.should_infer(_frame(50))  # 第一帧总是推理
+    assert not gate.should_infer(_frame(50))
+    assert not gate.should_infer(_frame(51))  # 变化低于阈值
+    assert gate.should_infer(_frame(50, block=200))  # 四分之一画面变化
+    assert not gate.should_infer(_frame(50, block=200))  # 参考帧已更新为变化后的画面
+    gate.reset()
+    assert gate.should_infer(_frame(50, block=200))
+    print()
+
+
+def test_refresh_and_disable():
+    """测试超过强制刷新间隔后重新推理，阈值为 0 时每帧推理"""
+    print("=== 测试强制刷新 ===")
+
+    gate = ChangeGate(threshold=0.02, refresh_interval=60, size=32)
+    gate.should_infer(_frame(50))
+    gate._last_inference -= 60
+    assert gate.should_infer(_frame(50))
+
+    gate = ChangeGate(threshold=0, refresh_interval=60, size=32)
+    assert gate.should_infer(_frame(50)) and gate.should_infer(_frame(50))
+    print()
+
+
+class _BrightnessModel:
+    """假模型：每张图返回一个框，置信度为画面平均亮度，用于区分检测结果来自哪一帧"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, batch, **kwargs):
+        self.calls += 1
+        return [type("Result", (), {"boxes": type("Boxes", (), {
+            "data": np.array([[0, 0, 10, 10, image.mean() / 255.0, 0]], dtype=np.float32)})})()
+            for image in batch]
+
+
+def test_window_handoff():
+    """测试多窗口模式中窗口在工作进程之间轮转时，过期的参考帧不会让画面变回后跳过推理"""
+    print("=== 测试窗口轮转 ===")
+
+    app_region = {"left": 0, "top": 0, "width": 160, "height": 120}
+    ring = SharedFrameRing(120, 160, num_readers=1)
+    buffer = SharedDetectionBuffer(1)
+    layout = SharedLayout(1)
+    layout.update(app_region, [dict(app_region, id=0)])
+    model = _BrightnessModel()
+    worker_a, worker_b = ([0, None, [], [], []] for _ in range(2))  # 两个工作进程中该窗口的状态
+    try:
+        for value, state in ((50, worker_a), (200, worker_b), (50, worker_a)):
+            frame_id, slot = ring.begin_write(layout=layout.version)
+            slot[:] = value
+            ring.commit(frame_id)
+            assert _detect_window(model, None, ring, buffer, layout, state, StageRecorder())
+        frame_id, records = buffer.read_region(0)
+        print(model.calls, records["conf"])
+        # 工作进程 A 的参考帧（第 1 帧）与第 3 帧相同，但期间 B 发布了第 2 帧，A 必须重新推理
+        assert model.calls == 3 and frame_id == 3 and abs(records["conf"][0] - 50 / 255) < 1e-3
+
+        # 同一工作进程连续处理、画面不变时仍然跳过推理
+        frame_id, slot = ring.begin_write(layout=layout.version)
+        slot[:] = 50
+        ring.commit(frame_id)
+        assert _detect_window(model, None, ring, buffer, layout, worker_a, StageRecorder())
+        assert model.calls == 3 and buffer.read_region(0)[0] == 4
+    finally:
+        ring.close()
+        buffer.close()
+        layout.close()
+    print()
+
+
+def main():
+    """主函数"""
+    print("帧差门控测试")
+    print("=" * 50)
+
+    try:
+        test_skip_unchanged()
+        test_refresh_and_disable()
+        test_window_handoff()
+
+        print("所有测试完成！")
+
+    except Exception as e:
+        print(f"测试过程中出现错误: {e}")
+        import traceback
+        traceback.print_exc()
+
+
+if __name__ == "__main__":
+    main()
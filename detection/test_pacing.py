@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自适应帧率控制测试脚本
+"""
+
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detection.pacing import RateController
+
+
+def test_target_fps():
+    """测试按目标帧率补足帧间隔，耗时超出帧间隔时不休眠并计入落后次数"""
+    print("=== 测试目标帧率 ===")
+
+    pacer = RateController(20, cpu_budget=1.0)
+    pacer.restart()
+    sleep = pacer.tick()
+    print(f"休眠 {sleep * 1000:.1f}ms")
+    assert 0.04 < sleep <= 0.05
+
+    pacer.restart()
+    time.sleep(0.06)
+    assert pacer.tick() == 0.0 and pacer.dropped == 1
+
+    pacer = RateController(0, cpu_budget=1.0)  # 不限速
+    assert pacer.tick() == 0.0
+    print()
+
+
+def test_live_target_and_budget():
+    """测试运行中修改共享的目标帧率，以及 CPU 预算限制"""
+    print("=== 测试运行中调整 ===")
+
+    target = multiprocessing.Value("d", 0, lock=False)
+    pacer = RateController(target, cpu_budget=1.0)
+    assert pacer.tick() == 0.0
+    target.value = 50
+    assert 0.015 < pacer.tick() <= 0.02
+
+    # CPU 预算 50%：耗时 t 的迭代之后至少休眠 t
+    pacer = RateController(0, cpu_budget=0.5)
+    pacer.restart()
+    time.sleep(0.02)
+    assert pacer.tick() >= 0.02
+    print()
+
+
+def main():
+    """主函数"""
+    print("自适应帧率控制测试")
+    print("=" * 50)
+
+    try:
+        test_target_fps()
+        test_live_target_and_budget()
+
+        print("所有测试完成！")
+
+    except Exception as e:
+        print(f"测试过程中出现错误: {e}")
+        import traceback
+        traceback.print_exc()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+区域切分与跨区域合并测试脚本
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detection.postprocess import merge_tile_detections
+from detection.shared_results import DETECTION_DTYPE
+from utils.tiling import tile_region
+
+
+def test_tile_region_grid():
+    """测试网格切分和重叠"""
+    print("=== 测试网格切分 ===")
+
+    app_region = {"left": 100, "top": 50, "width": 1920, "height": 1080}
+    regions = tile_region(app_region, rows=2, cols=3, overlap=64, min_tile_size=0)
+    for region in regions:
+        print(region)
+
+    assert len(regions) == 6
+    assert [r["id"] for r in regions] == list(range(6))
+    # 覆盖整个窗口，最后一块与右/下边缘对齐
+    assert regions[0]["left"] == 100 and regions[0]["top"] == 50
+    assert regions[-1]["left"] + regions[-1]["width"] == 100 + 1920
+    assert regions[-1]["top"] + regions[-1]["height"] == 50 + 1080
+    # 相邻区域至少重叠 overlap 像素
+    assert regions[0]["left"] + regions[0]["width"] - regions[1]["left"] >= 64
+    print()
+
+
+def test_tile_region_min_size():
+    """测试区域过小时自动减少行列数"""
+    print("=== 测试最小区域尺寸 ===")
+
+    app_region = {"left": 0, "top": 0, "width": 500, "height": 300}
+    regions = tile_region(app_region, rows=4, cols=4, overlap=0, min_tile_size=200)
+    print(f"切分结果：{len(regions)} 个区域")
+
+    assert len(regions) == 2  # 宽度只能切 2 列，高度只能切 1 行
+    assert all(r["width"] >= 200 and r["height"] >= 200 for r in regions)
+    print()
+
+
+def test_tile_region_large_overlap():
+    """测试重叠宽度接近或超过区域边长时区域不越界，负的重叠报错"""
+    print("=== 测试过大的重叠 ===")
+
+    for width, overlap in [(170, 160), (200, 200), (200, 300)]:
+        app_region = {"left": 10, "top": 20, "width": width, "height": 100}
+        regions = tile_region(app_region, rows=2, cols=2, overlap=overlap, min_tile_size=0)
+        print(width, overlap, [(r["left"], r["width"]) for r in regions])
+        for region in regions:
+            assert region["left"] >= 10 and region["left"] + region["width"] <= 10 + width
+            assert region["top"] >= 20 and region["top"] + region["height"] <= 20 + 100
+        assert len(regions) == (2 if width > overlap else 1)  # 高度 100 不超过重叠宽度，不切分
+
+    try:
+        tile_region({"left": 0, "top": 0, "width": 640, "height": 480}, overlap=-1)
+        assert False, "负的重叠应报错"
+    except ValueError:
+        pass
+    print()
+
+
+def test_merge_across_tiles():
+    """测试跨区域同类框合并"""
+    print("=== 测试跨区域合并 ===")
+
+    detections = np.array([
+        (100, 100, 200, 200, 0.9, 0, 0, -1),  # 区域 0 中的完整框
+        (150, 100, 200, 200, 0.6, 0, 1, -1),  # 区域 1 中被边界截断的同一目标
+        (100, 100, 200, 200, 0.8, 1, 1, -1),  # 不同类别，保留
+        (105, 100, 205, 200, 0.7, 0, 0, -1),  # 同一区域内的框，不参与跨区域抑制
+    ], dtype=DETECTION_DTYPE)
+
+    merged = merge_tile_detections(detections, threshold=0.5, metric="ios", method="nms")
+    print(merged)
+    assert len(merged) == 3
+    assert 0.6 not in np.round(merged["conf"], 2)
+
+    fused = merge_tile_detections(detections[:2], threshold=0.5, metric="ios", method="wbf")
+    print(fused)
+    assert len(fused) == 1 and fused["x1"][0] > 100
+    print()
+
+
+def main():
+    """主函数"""
+    print("区域切分与跨区域合并测试")
+    print("=" * 50)
+
+    try:
+        test_tile_region_grid()
+        test_tile_region_min_size()
+        test_tile_region_large_overlap()
+        test_merge_across_tiles()
+
+        print("所有测试完成！")
+
+    except Exception as e:
+        print(f"测试过程中出现错误: {e}")
+        import traceback
+        traceback.print_exc()
+
+
+if __name__ == "__main__":
+    main()
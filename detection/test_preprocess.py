@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+推理输入预处理与 ONNX 输出解码测试脚本
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detection.preprocess import InputBuffers, Letterbox, LETTERBOX_COLOR
+
+try:
+    from detection.onnx_backend import OnnxDetector
+except ImportError:  # 未安装 onnxruntime
+    OnnxDetector = None
+
+
+def _bgr(height, width, color=(10, 20, 30)):
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = color
+    return frame
+
+
+def test_letterbox_geometry():
+    """测试缩放比例、填充位置、BGR→RGB 归一化写入和坐标还原"""
+    print("=== 测试 letterbox 几何 ===")
+
+    tensor = np.zeros((3, 64, 64), dtype=np.float32)
+    letterbox = Letterbox()
+    letterbox.write(_bgr(100, 200), tensor, generation=1)
+    print(letterbox.gain, letterbox.pad)
+    assert letterbox.gain == 0.32 and letterbox.pad == (0, 16)
+    # 上下各 16 行填充，中间 32 行为画面（通道顺序为 RGB）
+    pad = LETTERBOX_COLOR / 255.0
+    assert np.allclose(tensor[:, :16], pad) and np.allclose(tensor[:, 48:], pad)
+    assert np.allclose(tensor[:, 16:48], np.array([30, 20, 10])[:, None, None] / 255.0)
+
+    boxes = np.array([[0, 16, 64, 48], [-5, 0, 32, 32]], dtype=np.float32)
+    letterbox.restore(boxes)
+    print(boxes)
+    assert np.allclose(boxes, [[0, 0, 200, 100], [0, 0, 100, 50]])  # 超出原图的部分被裁剪
+
+    # 区域尺寸变化后重新计算几何并重写填充
+    letterbox.write(_bgr(64, 32), tensor, generation=1)
+    assert letterbox.gain == 1.0 and letterbox.pad == (16, 0)
+    assert np.allclose(tensor[:, :, :16], LETTERBOX_COLOR / 255.0)
+    print()
+
+
+def test_input_buffers():
+    """测试矩形/正方形输入形状、输入尺寸覆盖和张量复用"""
+    print("=== 测试输入缓冲区 ===")
+
+    frames = [_bgr(556, 976), _bgr(556, 976)]
+    rect = InputBuffers((640, 640), rect=True)
+    tensor, letterboxes = rect.prepare(frames)
+    print(tensor.shape)
+    assert tensor.shape == (2, 3, 384, 640) and len(letterboxes) == 2
+    again, _ = rect.prepare(frames[:1])
+    assert again.shape == (1, 3, 384, 640) and np.shares_memory(again, tensor)  # 复用同一块张量
+    assert rect.prepare(frames, imgsz=320)[0].shape == (2, 3, 192, 320)
+
+    square = InputBuffers((640, 640))
+    assert square.prepare(frames)[0].shape == (2, 3, 640, 640)
+    assert square.prepare(frames, imgsz=320)[0].shape == (2, 3, 640, 640)  # 固定输入尺寸忽略覆盖
+    print()
+
+
+def _onnx_detector(end2end=False):
+    """不加载模型，只用于测试输出解码"""
+    detector = OnnxDetector.__new__(OnnxDetector)
+    detector.end2end = end2end
+    detector.iou = 0.45
+    detector.max_det = 300
+    return detector
+
+
+def test_onnx_decode():
+    """测试 YOLOv8 输出的置信度过滤、类别感知 NMS 和坐标还原，以及 end2end 输出"""
+    print("=== 测试 ONNX 输出解码 ===")
+    if OnnxDetector is None:
+        print("未安装 onnxruntime，跳过")
+        return
+
+    letterbox = Letterbox()
+    letterbox.write(_bgr(320, 640), np.zeros((3, 640, 640), dtype=np.float32), generation=1)  # 上方填充 160 行
+    # (4 + 2 类, 8 个锚点)：cx, cy, w, h, 类别 0 分数, 类别 1 分数；后 4 个锚点没有目标
+    output = np.zeros((6, 8), dtype=np.float32)
+    output[:, :4] = np.array([
+        [100, 102, 100, 300],
+        [260, 260, 260, 400],
+        [40, 40, 40, 40],
+        [40, 40, 40, 40],
+        [0.9, 0.8, 0.0, 0.1],
+        [0.0, 0.0, 0.7, 0.0],
+    ])
+    detector = _onnx_detector()
+    dets = detector.decode(output, letterbox, conf=0.25)
+    print(dets)
+    # 同类重叠框只保留置信度最高的，不同类别的框保留，低置信度的框被过滤
+    assert dets[:, 5].tolist() == [0, 1]
+    assert np.allclose(dets[:, 4], [0.9, 0.7])
+    assert np.allclose(dets[0, :4], [80, 80, 120, 120])
+    assert np.allclose(detector.decode(output.T.copy(), letterbox, conf=0.25), dets)  # (锚点, 4+nc) 布局
+
+    e2e = np.array([[80, 240, 120, 280, 0.9, 1], [0, 0, 10, 10, 0.1, 0]], dtype=np.float32)
+    dets = _onnx_detector(end2end=True).decode(e2e, letterbox, conf=0.25)
+    assert np.allclose(dets, [[80, 80, 120, 120, 0.9, 1]])
+    print()
+
+
+def main():
+    """主函数"""
+    print("推理输入预处理测试")
+    print("=" * 50)
+
+    try:
+        test_letterbox_geometry()
+        test_input_buffers()
+        test_onnx_decode()
+
+        print("所有测试完成！")
+
+    except Exception as e:
+        print(f"测试过程中出现错误: {e}")
+        import traceback
+        traceback.print_exc()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多窗口调度表测试脚本
+"""
+
+import multiprocessing
+import os
+import sys
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import MULTI_WINDOW_WORKERS
+from detection.scheduler import SharedScheduler
+
+
+def _simulate(scheduler, cost, rounds, workers=1):
+    """模拟 workers 个工作进程轮流领取（每个窗口每轮都有新帧，推理耗时 cost 秒），返回各窗口的领取次数"""
+    counts = [0] * scheduler.num_windows
+    frame_id = 0
+    now = 1000.0
+    for _ in range(rounds):
+        frame_id += 1
+        claimed = []
+        for worker in range(workers):
+            index = scheduler.claim(worker, [frame_id] * scheduler.num_windows, now)
+            if index is not None:
+                claimed.append(index)
+                counts[index] += 1
+        for index in claimed:
+            scheduler.release(index, cost)
+        now += cost
+    return counts
+
+
+def test_priority_share():
+    """测试推理时间按优先级分配"""
+    print("=== 测试优先级 ===")
+
+    scheduler = SharedScheduler(3)
+    try:
+        scheduler.configure(2, priority=2)
+        counts = _simulate(scheduler, cost=0.1, rounds=400)
+        print(counts)
+        assert abs(counts[0] - 100) <= 2 and abs(counts[1] - 100) <= 2 and abs(counts[2] - 200) <= 2
+        report = scheduler.read()
+        assert abs(report[2]["share"] - 0.5) < 0.01
+    finally:
+        scheduler.close()
+    print()
+
+
+def _simulate_parallel(scheduler, workers, cost, duration, has_frame=None, dt=0.001):
+    """模拟 workers 个并行的工作进程（每个窗口总有新帧，推理耗时 cost 秒），返回各窗口的累计推理时间
+
+    has_frame(index) 返回 False 的窗口没有新帧。
+    """
+    busy = [0.0] * scheduler.num_windows
+    running = {}  # 工作进程 -> (窗口, 结束时间)
+    frame_id = 0
+    now = 1000.0
+    end = now + duration
+    while now < end:
+        frame_id += 1
+        for worker, (index, finish) in list(running.items()):
+            if now >= finish:
+                scheduler.release(index, cost)
+                busy[index] += cost
+                del running[worker]
+        latest = [frame_id if has_frame is None or has_frame(k) else 0 for k in range(scheduler.num_windows)]
+        for worker in range(workers):
+            if worker not in running:
+                index = scheduler.claim(worker, latest, now)
+                if index is not None:
+                    running[worker] = (index, now + cost)
+        now += dt
+    return busy
+
+
+def test_priority_with_idle_workers():
+    """测试工作进程数不少于窗口数（默认配置）时推理时间仍按优先级分配"""
+    print("=== 测试空闲工作进程下的优先级 ===")
+
+    scheduler = SharedScheduler(2)
+    try:
+        scheduler.configure(0, priority=2)
+        busy = _simulate_parallel(scheduler, MULTI_WINDOW_WORKERS, cost=0.1, duration=30)
+        shares = [b / sum(busy) for b in busy]
+        print(shares, [round(e["share"], 3) for e in scheduler.read()])
+        assert abs(shares[0] - 2 / 3) < 0.03
+    finally:
+        scheduler.close()
+
+    # 优先级高的窗口没有新帧时，其他窗口不受限制
+    scheduler = SharedScheduler(2)
+    try:
+        scheduler.configure(0, priority=2)
+        busy = _simulate_parallel(scheduler, MULTI_WINDOW_WORKERS, cost=0.1, duration=3, has_frame=lambda k: k == 1)
+        print(busy)
+        assert busy[0] == 0 and busy[1] >= 2.9
+    finally:
+        scheduler.close()
+    print()
+
+
+def test_exclusive_claims():
+    """测试同一窗口同一时刻只被一个工作进程领取，没有新帧的窗口不被领取"""
+    print("=== 测试独占领取 ===")
+
+    scheduler = SharedScheduler(2)
+    try:
+        assert scheduler.claim(0, [1, 1], 10.0) == 0
+        assert scheduler.claim(1, [1, 1], 10.0) == 1
+        assert scheduler.claim(2, [1, 1], 10.0) is None  # 两个窗口都已被领取
+        scheduler.release(0, 0.01)
+        assert scheduler.claim(2, [1, 1], 10.1) is None  # 窗口 0 没有新帧
+        assert scheduler.claim(2, [2, 1], 10.1) == 0
+
+        # 工作进程 1 崩溃后重启：它领取的窗口被释放，当前帧可以重新领取
+        scheduler.release(0, 0.01)
+        scheduler.release_owned(1)
+        assert scheduler.claim(1, [2, 1], 10.2) == 1
+    finally:
+        scheduler.close()
+    print()
+
+
+def test_release_waits_for_lock():
+    """测试锁被占用时归还会等待，而不是不加锁直接修改"""
+    print("=== 测试归还等待锁 ===")
+
+    scheduler = SharedScheduler(1)
+    scheduler.lock = multiprocessing.Lock()
+    try:
+        assert scheduler.claim(0, [1], 10.0) == 0
+        scheduler.lock.acquire()
+        releaser = threading.Thread(target=scheduler.release, args=(0, 0.1))
+        releaser.start()
+        releaser.join(timeout=1.5)  # 超过领取时的锁超时
+        assert releaser.is_alive() and scheduler.read()[0]["frames"] == 0
+        scheduler.lock.release()
+        releaser.join(timeout=1.0)
+        assert not releaser.is_alive() and scheduler.read()[0]["frames"] == 1
+    finally:
+        scheduler.close()
+    print()
+
+
+def test_target_fps():
+    """测试窗口的目标帧率和全局目标帧率"""
+    print("=== 测试目标帧率 ===")
+
+    scheduler = SharedScheduler(2)
+    try:
+        scheduler.configure(0, target_fps=2)
+        assert scheduler.claim(0, [1, 0], 10.0) == 0
+        scheduler.release(0, 0.01)
+        assert not scheduler.due(0, 10.3)
+        assert scheduler.claim(0, [2, 0], 10.3) is None
+        assert scheduler.claim(0, [2, 0], 10.5) == 0
+        scheduler.release(0, 0.01)
+
+        # 窗口 1 未单独设置帧率，使用全局目标帧率
+        assert scheduler.claim(0, [2, 1], 10.6, default_fps=5) == 1
+        scheduler.release(1, 0.01)
+        assert scheduler.claim(0, [2, 2], 10.7, default_fps=5) is None
+        assert scheduler.claim(0, [2, 2], 10.8, default_fps=5) == 1
+    finally:
+        scheduler.close()
+    print()
+
+
+def test_idle_window():
+    """测试空闲过的窗口不会因积累的额度长时间独占工作进程"""
+    print("=== 测试空闲窗口 ===")
+
+    scheduler = SharedScheduler(2)
+    try:
+        now = 10.0
+        for frame_id in range(1, 51):  # 只有窗口 0 有新帧
+            assert scheduler.claim(0, [frame_id, 0], now) == 0
+            scheduler.release(0, 0.1)
+            now += 0.1
+        counts = [0, 0]
+        for frame_id in range(51, 71):  # 窗口 1 开始有新帧
+            index = scheduler.claim(0, [frame_id, frame_id], now)
+            counts[index] += 1
+            scheduler.release(index, 0.1)
+            now += 0.1
+        print(counts)
+        assert counts == [10, 10]
+    finally:
+        scheduler.close()
+    print()
+
+
+def main():
+    """主函数"""
+    print("多窗口调度表测试")
+    print("=" * 50)
+
+    try:
+        test_priority_share()
+        test_priority_with_idle_workers()
+        test_exclusive_claims()
+        test_release_waits_for_lock()
+        test_target_fps()
+        test_idle_window()
+
+        print("所有测试完成！")
+
+    except Exception as e:
+        print(f"测试过程中出现错误: {e}")
+        import traceback
+        traceback.print_exc()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享内存结构测试脚本
+"""
+
+import os
+import pickle
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detection.frame_ring import SharedFrameRing
+from detection.shared_results import SharedDetectionBuffer, DETECTION_DTYPE
+
+
+def _records(n, region=0):
+    records = np.zeros(n, dtype=DETECTION_DTYPE)
+    records["x1"] = np.arange(n)
+    records["x2"] = np.arange(n) + 10
+    records["conf"] = 0.5
+    records["region"] = region
+    return records
+
+
+def test_detection_buffer():
+    """测试检测结果跨进程（按名称重新连接）读写、容量截断和类别名称表"""
+    print("=== 测试检测结果缓冲区 ===")
+
+    buffer = SharedDetectionBuffer(2, capacity=4)
+    # 子进程收到的是按名称重新连接的缓冲区
+    child = pickle.loads(pickle.dumps(buffer))
+    try:
+        child.publish(0, _records(3), frame_id=7)
+        child.publish(1, _records(6, region=1), frame_id=8)  # 超出容量的部分被丢弃
+        child.set_names({0: "人", 1: "car"})
+
+        frame_id, data = buffer.read_region(0)
+        assert frame_id == 7 and data["x1"].tolist() == [0, 1, 2]
+        frame_ids, detections = buffer.snapshot()
+        print(frame_ids, len(detections))
+        assert frame_ids == [7, 8]
+        assert len(detections) == 7 and detections["region"].tolist() == [0] * 3 + [1] * 4
+        assert buffer.names() == {0: "人", 1: "car"}
+
+        # 写入中（序列号为奇数）读取方返回上一次的一致快照
+        buffer._seq[0] += 1
+        assert buffer.read_region(0)[0] == 7
+        buffer._seq[0] += 1
+        child.publish(0, _records(0), frame_id=9)
+        frame_id, data = buffer.read_region(0)
+        assert frame_id == 9 and len(data) == 0
+    finally:
+        child.close()
+        buffer.close()
+    print()
+
+
+def _write(ring, value, height=None, width=None):
+    frame_id, slot = ring.begin_write(height, width)
+    slot[:] = value
+    ring.commit(frame_id)
+    return frame_id
+
+
+def test_frame_ring():
+    """测试帧环的写入/读取、读取方登记、登记帧不被覆盖和容量检查"""
+    print("=== 测试帧环 ===")
+
+    ring = SharedFrameRing(4, 6, slots=3, num_readers=2)
+    reader = pickle.loads(pickle.dumps(ring))
+    try:
+        assert reader.latest() == (0, None)
+        assert ring.readers_done()  # 还没有帧
+
+        first = _write(ring, 1)
+        assert not ring.readers_done()
+        frame_id, view = reader.acquire(0)
+        assert frame_id == first and view.shape == (4, 6, 3) and int(view[0, 0, 0]) == 1
+        assert not view.flags.writeable
+        assert reader.acquire(0, frame_id) == (frame_id, None)  # 没有新帧
+        assert not ring.wait_for_readers(timeout=0.01)  # 读取方 1 尚未取走
+        reader.acquire(1)
+        assert ring.wait_for_readers(timeout=0.01)
+
+        # 小于容量的帧按实际尺寸读取
+        second = _write(ring, 2, height=2, width=3)
+        assert reader.get(second).shape == (2, 3, 3)
+
+        # 读取方登记的帧不会被覆盖：读取方 0、1 都停留在第一帧，新帧轮流写入其余槽位
+        assert ring.slots == 4  # 至少 num_readers + 2
+        for value in range(3, 9):
+            _write(ring, value)
+        assert reader.is_valid(first) and int(reader.get(first)[0, 0, 0]) == 1
+        assert reader.get(second) is None  # 未被登记的旧帧照常覆盖
+        assert reader.latest_id == first + 7
+
+        # 读取方取走新帧后，第一帧所在槽位可以复用
+        reader.acquire(0)
+        reader.acquire(1)
+        _write(ring, 9)
+        _write(ring, 10)
+        assert reader.get(first) is None and not reader.is_valid(first)
+
+        try:
+            ring.begin_write(5, 6)
+            assert False, "超出容量的帧应报错"
+        except ValueError:
+            pass
+
+        ring.mark_ended()
+        assert reader.ended
+    finally:
+        reader.close()
+        ring.close()
+    print()
+
+
+def main():
+    """主函数"""
+    print("共享内存结构测试")
+    print("=" * 50)
+
+    try:
+        test_detection_buffer()
+        test_frame_ring()
+
+        print("所有测试完成！")
+
+    except Exception as e:
+        print(f"测试过程中出现错误: {e}")
+        import traceback
+        traceback.print_exc()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+工作进程健康监控测试脚本
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detection.supervisor import SharedWorkerHealth, WorkerSupervisor, worker_slot, ERROR, IDLE, RUNNING
+
+
+class FakePool:
+    """只记录重启请求的工作进程池"""
+
+    def __init__(self, health, keys):
+        self.health = health
+        self.keys = keys
+        self.restarts = []
+
+    def active_workers(self):
+        return list(self.keys)
+
+    def status(self, key):
+        return True, self.health.read(worker_slot(key))
+
+    def restart(self, key, hard=False):
+        self.restarts.append((key, hard))
+
+
+def test_restart_backoff():
+    """测试出错的工作进程按指数退避重启，恢复正常后不再重启"""
+    print("=== 测试重启退避 ===")
+
+    health = SharedWorkerHealth(2)
+    try:
+        pool = FakePool(health, [0])
+        supervisor = WorkerSupervisor(pool, backoff_base=10.0, log=lambda message: None)
+        health.set_state(worker_slot(0), RUNNING)
+        supervisor.check()
+        assert pool.restarts == []
+
+        health.set_state(worker_slot(0), ERROR, "detect: boom")
+        supervisor.check()
+        supervisor.check()  # 退避期内不再重启
+        print(pool.restarts)
+        assert pool.restarts == [(0, False)] and supervisor.error is None
+    finally:
+        health.close()
+    print()
+
+
+def test_load_failures():
+    """测试模型连续加载失败后不再重启，并记录错误原因"""
+    print("=== 测试模型加载失败 ===")
+
+    health = SharedWorkerHealth(2)
+    logs = []
+    try:
+        pool = FakePool(health, [0])
+        supervisor = WorkerSupervisor(pool, backoff_base=0.0, max_load_failures=3, log=logs.append)
+        slot = worker_slot(0)
+        for _ in range(3):
+            health.record_load(slot, False)
+            health.set_state(slot, ERROR, "batched: 模型未加载（invalid checkpoint）")
+            supervisor.check()
+        print(pool.restarts, supervisor.error)
+        assert len(pool.restarts) == 2  # 第三次失败后放弃
+        assert "连续 3 次加载模型失败" in supervisor.error and "invalid checkpoint" in supervisor.error
+        supervisor.check()
+        assert len(pool.restarts) == 2 and sum("不再重启" in line for line in logs) == 1
+
+        # 加载成功后清零，之后的普通错误照常重启
+        health.record_load(slot, True)
+        assert health.read(slot)["load_failures"] == 0
+        health.set_state(slot, IDLE)
+        supervisor = WorkerSupervisor(pool, backoff_base=0.0, log=logs.append)
+        health.set_state(slot, ERROR, "batched: boom")
+        supervisor.check()
+        assert len(pool.restarts) == 3 and supervisor.error is None
+    finally:
+        health.close()
+    print()
+
+
+def main():
+    """主函数"""
+    print("工作进程健康监控测试")
+    print("=" * 50)
+
+    try:
+        test_restart_backoff()
+        test_load_failures()
+
+        print("所有测试完成！")
+
+    except Exception as e:
+        print(f"测试过程中出现错误: {e}")
+        import traceback
+        traceback.print_exc()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+关键帧检测 + 光流跟踪测试脚本
+"""
+
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detection.shared_results import DETECTION_DTYPE
+from detection.tracking import RegionTracker, TRACK_ID_BLOCK, associate
+
+REGION = {"left": 1000, "top": 500, "width": 320, "height": 240, "id": 2}
+
+
+def _frame(x, y, seed=0):
+    """灰色背景上一块有纹理的方块，左上角位于区域内 (x, y)"""
+    rng = np.random.default_rng(seed)
+    frame = np.full((REGION["height"], REGION["width"], 3), 90, dtype=np.uint8)
+    patch = cv2.GaussianBlur(rng.integers(0, 255, (60, 60, 3), dtype=np.uint8), (5, 5), 0)
+    frame[y:y + 60, x:x + 60] = patch
+    return frame
+
+
+def _detection(x, y, conf=0.9, cls=0):
+    """区域内 (x, y) 处 60×60 方块的检测记录（绝对屏幕坐标）"""
+    left, top = REGION["left"] + x, REGION["top"] + y
+    return np.array([(left, top, left + 60, top + 60, conf, cls, REGION["id"], -1)], dtype=DETECTION_DTYPE)
+
+
+def test_associate():
+    """测试按 IoU 关联，只匹配同类别"""
+    print("=== 测试轨迹关联 ===")
+
+    tracks = np.concatenate([_detection(10, 10), _detection(200, 100, cls=1)])
+    detections = np.concatenate([_detection(200, 102, cls=1), _detection(12, 10), _detection(12, 10, cls=3)])
+    matches = associate(tracks, detections, threshold=0.3)
+    print(matches)
+    assert sorted(matches) == [(0, 1), (1, 0)]
+    print()
+
+
+def test_keyframe_ids():
+    """测试关键帧上沿用和分配 track_id"""
+    print("=== 测试关键帧编号 ===")
+
+    tracker = RegionTracker(REGION["id"], keyframe_interval=3)
+    first = tracker.update(_frame(50, 50), _detection(50, 50), REGION)
+    track_id = int(first["track_id"][0])
+    assert track_id == REGION["id"] * TRACK_ID_BLOCK + 1
+
+    # 同一目标稍微移动后仍沿用原编号，新出现的目标分配新编号
+    detections = np.concatenate([_detection(54, 52), _detection(200, 150, cls=1)])
+    second = tracker.update(_frame(54, 52), detections, REGION)
+    print(second[["x1", "y1", "cls", "track_id"]])
+    assert int(second["track_id"][0]) == track_id
+    assert int(second["track_id"][1]) == track_id + 1
+
+    # 漏检一次的目标在后续关键帧中接回原编号
+    tracker.update(_frame(54, 52), _detection(200, 150, cls=1), REGION)
+    third = tracker.update(_frame(56, 52), np.concatenate([_detection(56, 52), _detection(200, 150, cls=1)]), REGION)
+    assert sorted(third["track_id"].tolist()) == [track_id, track_id + 1]
+    print()
+
+
+def test_propagate():
+    """测试中间帧用光流移动检测框"""
+    print("=== 测试光流传播 ===")
+
+    tracker = RegionTracker(REGION["id"], keyframe_interval=4, flow_scale=0.5)
+    tracker.update(_frame(50, 50), _detection(50, 50), REGION)
+    assert not tracker.needs_keyframe()
+
+    x, y = 50, 50
+    for step in range(1, 3):
+        x, y = x + 6, y + 4
+        records = tracker.propagate(_frame(x, y), REGION)
+        print(records[["x1", "y1", "x2", "y2", "track_id"]])
+        assert abs(int(records["x1"][0]) - (REGION["left"] + x)) <= 2
+        assert abs(int(records["y1"][0]) - (REGION["top"] + y)) <= 2
+        assert int(records["track_id"][0]) == REGION["id"] * TRACK_ID_BLOCK + 1
+
+    # 达到关键帧间隔后要求重新检测
+    tracker.propagate(_frame(x, y), REGION)
+    assert tracker.needs_keyframe()
+    print()
+
+
+def main():
+    """主函数"""
+    print("关键帧检测 + 光流跟踪测试")
+    print("=" * 50)
+
+    try:
+        test_associate()
+        test_keyframe_ids()
+        test_propagate()
+
+        print("所有测试完成！")
+
+    except Exception as e:
+        print(f"测试过程中出现错误: {e}")
+        import traceback
+        traceback.print_exc()
+
+
+if __name__ == "__main__":
+    main()
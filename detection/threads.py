@@ -0,0 +1,118 @@
+# detection/threads.py
+"""
+CPU 线程规划
+
+每个检测工作进程默认会让 torch、OpenCV 和 BLAS 各自开一个与机器核心数相同的线程池，
+4 个区域进程在 8 核机器上就是 30 多个忙线程争抢核心。plan_threads() 把可用核心
+（扣除留给界面和采集的 RESERVED_CORES）平均分给各检测工作进程，工作进程在执行任务前
+调用 apply_thread_plan() 设置线程数，并可选地绑定到分配的核心。
+"""
+import os
+import sys
+from contextlib import contextmanager
+
+from config import RESERVED_CORES, PIN_WORKER_CORES
+
+# 在 import 时读取线程数的库（OpenMP、MKL、OpenBLAS 等）只能通过环境变量控制
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS",
+                   "VECLIB_MAXIMUM_THREADS")
+
+_planned_threads = None
+
+
+def available_cores():
+    """当前进程可用的核心编号"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def plan_threads(num_workers, reserve=RESERVED_CORES, pin=PIN_WORKER_CORES, cores=None):
+    """返回 {"capture": 规划, 0: 规划, 1: 规划, ...}，每个规划为 {"threads": 线程数, "cores": 核心元组或 None}
+
+    检测工作进程平分扣除保留核心后的核心（不能整除时前几个多分一个）；工作进程多于核心时每个只用 1 个线程，
+    轮流共享核心。采集进程只需要 1 个线程，绑定时使用保留的核心。
+    """
+    cores = list(cores) if cores is not None else available_cores()
+    reserved = cores[:reserve] if 0 < reserve < len(cores) else []
+    worker_cores = cores[len(reserved):]
+
+    plans = {"capture": {"threads": 1, "cores": tuple(reserved or cores) if pin else None}}
+    if num_workers <= 0:
+        return plans
+    if num_workers >= len(worker_cores):
+        for k in range(num_workers):
+            plans[k] = {"threads": 1, "cores": (worker_cores[k % len(worker_cores)],) if pin else None}
+        return plans
+
+    base, extra = divmod(len(worker_cores), num_workers)
+    start = 0
+    for k in range(num_workers):
+        count = base + (1 if k < extra else 0)
+        plans[k] = {"threads": count, "cores": tuple(worker_cores[start:start + count]) if pin else None}
+        start += count
+    return plans
+
+
+def _pin(cores):
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+        return True
+    try:
+        import psutil
+    except ImportError:
+        return False
+    psutil.Process().cpu_affinity(list(cores))
+    return True
+
+
+def planned_threads():
+    """本进程最近一次应用的线程规划中的线程数，未应用时为 None（供 onnxruntime 等按会话设置线程数的库使用）"""
+    return _planned_threads
+
+
+def apply_thread_plan(plan):
+    """在工作进程中应用线程规划，返回一行说明"""
+    global _planned_threads
+    threads = plan["threads"]
+    _planned_threads = threads
+    # 尚未导入的库（例如按需导入的 torch）在 import 时读取环境变量
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+    try:
+        import cv2
+        cv2.setNumThreads(threads)
+    except ImportError:
+        pass
+    try:
+        # 可选依赖：运行期间调整 numpy 所用 BLAS 的线程数
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=threads)
+    except ImportError:
+        pass
+
+    text = f"线程数 {threads}"
+    if plan.get("cores"):
+        if _pin(plan["cores"]):
+            text += f"，绑定核心 {list(plan['cores'])}"
+        else:
+            text += "（当前系统不支持绑定核心，需要安装 psutil）"
+    return text
+
+
+@contextmanager
+def single_threaded_env():
+    """创建工作进程期间把线程环境变量设为 1，子进程中 import 时读取的库不会先开满线程池
+
+    工作进程执行任务前再用 apply_thread_plan() 设置实际线程数；用户已显式设置的变量保持不变。
+    """
+    changed = [name for name in THREAD_ENV_VARS if name not in os.environ]
+    for name in changed:
+        os.environ[name] = "1"
+    try:
+        yield
+    finally:
+        for name in changed:
+            os.environ.pop(name, None)
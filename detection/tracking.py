@@ -0,0 +1,168 @@
+# detection/tracking.py
+"""
+关键帧检测 + 光流跟踪
+
+跟踪模式下每个区域只在关键帧做完整检测，中间帧用稀疏光流（Lucas-Kanade，正反向校验）
+把上一帧的检测框平移到当前帧，CPU 上的有效帧率可以提高数倍，框的位置仍然跟得上画面。
+
+关键帧上的检测框按 IoU 与已有轨迹贪心关联（只在同类别之间），匹配上的沿用原来的
+track_id，未匹配的分配新编号；连续 TRACK_MAX_MISSED 个关键帧未匹配的轨迹被删除。
+中间帧光流跟丢的轨迹比例过高时，下一帧提前做关键帧。
+
+track_id 按区域分段（区域号 × TRACK_ID_BLOCK + 序号），不同区域的编号不会冲突。
+"""
+import cv2
+import numpy as np
+
+from config import (KEYFRAME_INTERVAL, TRACK_IOU_THRESHOLD, TRACK_MAX_MISSED, TRACK_MIN_QUALITY,
+                    TRACK_FLOW_SCALE)
+from detection.postprocess import box_overlap
+from detection.shared_results import DETECTION_DTYPE
+
+TRACK_ID_BLOCK = 1_000_000
+GRID_POINTS = 3  # 每个框内取 GRID_POINTS × GRID_POINTS 个光流点
+MIN_GOOD_POINTS = 3  # 一个框至少有多少个点通过校验才认为跟上了
+MAX_FB_ERROR = 1.0  # 正反向光流的最大误差（缩小后的像素）
+LK_PARAMS = dict(winSize=(15, 15), maxLevel=2,
+                 criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+
+def associate(tracks, detections, threshold):
+    """按 IoU 从高到低贪心匹配同类别的轨迹和检测框，返回 [(轨迹下标, 检测下标), ...]"""
+    if not len(tracks) or not len(detections):
+        return []
+    track_boxes = np.stack([tracks["x1"], tracks["y1"], tracks["x2"], tracks["y2"]], axis=1).astype(np.float32)
+    det_boxes = np.stack([detections["x1"], detections["y1"], detections["x2"], detections["y2"]],
+                         axis=1).astype(np.float32)
+    iou = np.stack([box_overlap(box, det_boxes) for box in track_boxes])
+    iou[tracks["cls"][:, None] != detections["cls"][None, :]] = 0.0
+
+    matches = []
+    while True:
+        t, d = np.unravel_index(np.argmax(iou), iou.shape)
+        if iou[t, d] < threshold:
+            break
+        matches.append((int(t), int(d)))
+        iou[t, :] = 0.0
+        iou[:, d] = 0.0
+    return matches
+
+
+class RegionTracker:
+    """单个区域的轨迹；update() 处理关键帧的检测结果，propagate() 处理中间帧"""
+
+    def __init__(self, region_id, keyframe_interval=KEYFRAME_INTERVAL, iou_threshold=TRACK_IOU_THRESHOLD,
+                 max_missed=TRACK_MAX_MISSED, min_quality=TRACK_MIN_QUALITY, flow_scale=TRACK_FLOW_SCALE):
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.min_quality = min_quality
+        self.flow_scale = flow_scale
+        self._next_id = region_id * TRACK_ID_BLOCK + 1
+        self._tracks = np.empty(0, dtype=DETECTION_DTYPE)  # 所有轨迹（含暂时未匹配的），绝对屏幕坐标
+        self._missed = np.empty(0, dtype=np.int32)  # 连续未匹配的关键帧数
+        self._since_keyframe = 0
+        self._quality = 1.0
+        self._gray = None  # 上一帧（缩小后的灰度图）
+        self._spare = None  # 与 _gray 轮换使用的缓冲区
+        self._small = None
+
+    def reset(self):
+        """区域几何变化后清空轨迹，下一帧做关键帧（编号继续递增，不会重复）"""
+        self._tracks = np.empty(0, dtype=DETECTION_DTYPE)
+        self._missed = np.empty(0, dtype=np.int32)
+        self._gray = None
+
+    def needs_keyframe(self):
+        return (self._gray is None or self._since_keyframe + 1 >= self.keyframe_interval
+                or self._quality < self.min_quality)
+
+    def _to_gray(self, frame):
+        """把区域画面缩小并转为灰度，写入轮换的缓冲区"""
+        h, w = frame.shape[:2]
+        size = (max(1, int(w * self.flow_scale)), max(1, int(h * self.flow_scale)))
+        if self._small is None or self._small.shape[1::-1] != size:
+            self._small = np.empty((size[1], size[0], 3), dtype=np.uint8)
+            self._spare = np.empty((size[1], size[0]), dtype=np.uint8)
+            self._gray = None
+        cv2.resize(frame, size, dst=self._small, interpolation=cv2.INTER_AREA)
+        gray = self._spare
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=gray)
+        self._spare = self._gray if self._gray is not None else np.empty_like(gray)
+        self._gray = gray
+        return gray
+
+    def _active(self):
+        return self._tracks[self._missed == 0].copy()
+
+    def update(self, frame, detections, region):
+        """关键帧：关联检测框与轨迹，返回带 track_id 的检测记录"""
+        matches = associate(self._tracks, detections, self.iou_threshold)
+        matched_tracks = np.zeros(len(self._tracks), dtype=bool)
+        records = detections.copy()
+        for t, d in matches:
+            records["track_id"][d] = self._tracks["track_id"][t]
+            matched_tracks[t] = True
+        new = np.ones(len(records), dtype=bool)
+        new[[d for _, d in matches]] = False
+        records["track_id"][new] = np.arange(self._next_id, self._next_id + int(new.sum()), dtype=np.int32)
+        self._next_id += int(new.sum())
+
+        # 未匹配的旧轨迹保留几个关键帧（目标被遮挡或漏检一次时可以接回原来的编号）
+        missed = self._missed[~matched_tracks] + 1
+        keep = missed <= self.max_missed
+        self._tracks = np.concatenate([records, self._tracks[~matched_tracks][keep]])
+        self._missed = np.concatenate([np.zeros(len(records), dtype=np.int32), missed[keep]])
+
+        self._to_gray(frame)
+        self._since_keyframe = 0
+        self._quality = 1.0
+        return records
+
+    def propagate(self, frame, region):
+        """中间帧：用光流把当前可见的轨迹移动到新画面，返回更新后的检测记录"""
+        previous = self._gray
+        gray = self._to_gray(frame)
+        self._since_keyframe += 1
+        if previous is None or previous.shape != gray.shape:
+            self._quality = 0.0  # 没有可比较的上一帧，下一帧做关键帧
+            return self._active()
+        active = np.flatnonzero(self._missed == 0)
+        if not len(active):
+            return self._active()
+
+        # 每个框内取规则网格点（向内收缩 20%，避开背景），统一做一次正向和一次反向光流
+        tracks = self._tracks[active]
+        scale = self.flow_scale
+        x1 = (tracks["x1"] - region["left"]) * scale
+        y1 = (tracks["y1"] - region["top"]) * scale
+        x2 = (tracks["x2"] - region["left"]) * scale
+        y2 = (tracks["y2"] - region["top"]) * scale
+        steps = np.linspace(0.2, 0.8, GRID_POINTS)
+        gx, gy = np.meshgrid(steps, steps)
+        gx, gy = gx.ravel(), gy.ravel()
+        points = np.stack([x1[:, None] + (x2 - x1)[:, None] * gx, y1[:, None] + (y2 - y1)[:, None] * gy],
+                          axis=-1).reshape(-1, 1, 2).astype(np.float32)
+        forward, status, _ = cv2.calcOpticalFlowPyrLK(previous, gray, points, None, **LK_PARAMS)
+        backward, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, previous, forward, None, **LK_PARAMS)
+        error = np.linalg.norm((backward - points).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (back_status.ravel() == 1) & (error < MAX_FB_ERROR)
+        good = good.reshape(len(tracks), -1)
+        motion = (forward - points).reshape(len(tracks), -1, 2)
+
+        # 每个跟上的框按通过校验的点的位移中位数平移
+        tracked = good.sum(axis=1) >= MIN_GOOD_POINTS
+        if tracked.any():
+            shift = np.nanmedian(np.where(good[tracked, :, None], motion[tracked], np.nan), axis=1) / scale
+            dx, dy = np.round(shift).astype(np.int32).T
+            for key, delta in (("x1", dx), ("x2", dx), ("y1", dy), ("y2", dy)):
+                tracks[key][tracked] += delta
+        # 移出区域的部分裁掉
+        right, bottom = region["left"] + region["width"], region["top"] + region["height"]
+        for key in ("x1", "x2"):
+            np.clip(tracks[key], region["left"], right, out=tracks[key])
+        for key in ("y1", "y2"):
+            np.clip(tracks[key], region["top"], bottom, out=tracks[key])
+        self._tracks[active] = tracks
+        self._quality = float(tracked.mean())
+        return self._active()
@@ -0,0 +1,309 @@
+# detection/worker_pool.py
+"""
+常驻工作进程池
+
+工作进程在多次“开始/停止检测”之间保持运行，模型只在首次使用或模型路径变化时加载，
+并用一次空白推理预热。开始检测只是给工作进程发送任务，停止检测只是让本次会话失效，
+不再每次都重新导入 torch/ultralytics、加载权重和创建进程。
+
+会话控制：池中有一个共享的会话计数器，每个任务都带着发出时的会话号；
+停止时计数器加一，正在运行的任务在下一个节拍发现会话号不一致后退出，
+队列中尚未开始的旧任务直接跳过（加载模型的任务不受会话影响）。
+开启模型级联时工作进程同时常驻小模型和大模型（见 detection/cascade.py），各自只在路径变化时重新加载。
+多窗口模式下所有窗口共用同一组检测工作进程，由共享调度表（detection/scheduler.py）分配，
+调度表的锁在创建工作进程时传入。
+
+每个工作进程把状态和心跳写入共享的健康状态表（见 detection/supervisor.py），
+池记录本次会话派发给各工作进程的任务，供监控线程在崩溃或卡死后重新派发。
+创建工作进程、派发任务、重启和结束会话在同一把锁内进行：监控线程正在进行的重启
+不会与下一次会话的派发交错，重启在锁内核对会话号，已结束会话的任务不会被重新派发。
+"""
+import multiprocessing
+import pickle
+import queue
+import threading
+
+from contextlib import nullcontext
+
+from config import HEARTBEAT_INTERVAL, MAX_POOL_WORKERS, THREAD_PLANNING
+from detection.capture import capture_frames, capture_windows
+from detection.cascade import ModelCascade
+from detection.detector import load_model, run_region, run_regions_batched, run_roi, run_scheduled
+from detection.frame_ring import SharedFrameRing
+from detection.layout import SharedLayout
+from detection.metrics import SharedStageMetrics
+from detection.scheduler import SharedScheduler
+from detection.shared_results import SharedDetectionBuffer
+from detection.supervisor import (SharedWorkerHealth, HealthReporter, CAPTURE_WORKER_SLOT, worker_slot, IDLE,
+                                  LOADING, RUNNING, ERROR, DEAD)
+from detection.threads import apply_thread_plan, single_threaded_env
+
+DETECT_TARGETS = {"region": run_region, "batched": run_regions_batched, "roi": run_roi, "scheduled": run_scheduled}
+CAPTURE_TARGETS = {"capture": capture_frames, "windows": capture_windows}
+CAPTURE_WORKER = "capture"
+
+
+class SessionToken:
+    """与 Event 接口兼容的会话令牌：会话计数器变化后 is_set() 返回 True"""
+
+    def __init__(self, counter, session):
+        self.counter = counter
+        self.session = session
+
+    def is_set(self):
+        return self.counter.value != self.session
+
+
+def _close_shared(objects):
+    """关闭任务参数中附加的共享内存（只解除映射，由主进程负责 unlink）；多窗口任务的参数为嵌套列表"""
+    for obj in objects:
+        if isinstance(obj, (list, tuple)):
+            _close_shared(obj)
+        elif isinstance(obj, (SharedFrameRing, SharedDetectionBuffer, SharedStageMetrics, SharedLayout,
+                              SharedScheduler)):
+            try:
+                obj.close()
+            except Exception:
+                pass
+
+
+def _attach_lock(objects, lock):
+    """把工作进程继承的调度锁交给任务参数中的共享调度表"""
+    for obj in objects:
+        if isinstance(obj, SharedScheduler):
+            obj.lock = lock
+
+
+def _worker_main(index, commands, session_counter, target_fps, health, slot, schedule_lock):
+    model = None
+    device = None
+    model_path = None
+    fast_model = None  # 模型级联的小模型（未开启级联时为 None）
+    fast_model_path = None
+    cascade_path = None  # 本次会话要求的级联小模型路径，未加载成功时检测任务拒绝运行
+    load_error = None  # 最近一次加载失败的原因
+    reporter = HealthReporter(health, slot)
+    health.set_state(slot, IDLE)
+    while True:
+        try:
+            command = commands.get(timeout=HEARTBEAT_INTERVAL)
+        except queue.Empty:
+            reporter.beat()  # 空闲时也保持心跳
+            continue
+        kind = command[0]
+        if kind == "shutdown":
+            break
+        session, payload = command[1], command[2]
+        if session is not None and session != session_counter.value:
+            continue  # 会话已停止，跳过积压的任务
+        args = ()
+        try:
+            if kind == "threads":
+                print(f"[工作进程 {index}] {apply_thread_plan(payload)}")
+            elif kind == "load":
+                path, fast_path = payload
+                cascade_path = fast_path
+                # 路径只在加载成功后记录，加载失败的模型下次 load 时重试，另一个已加载的模型不受影响
+                if path != model_path:
+                    health.set_state(slot, LOADING, f"加载 {path}")
+                    model = model_path = None  # 先释放旧模型
+                    model, device = load_model(path)
+                    model_path = path
+                    print(f"[工作进程 {index}] 模型已加载并预热：{model_path}")
+                if fast_path != fast_model_path:
+                    fast_model = fast_model_path = None
+                    if fast_path:
+                        health.set_state(slot, LOADING, f"加载 {fast_path}")
+                        fast_model, _ = load_model(fast_path)
+                        print(f"[工作进程 {index}] 级联小模型已加载并预热：{fast_path}")
+                    fast_model_path = fast_path
+                load_error = None
+                health.record_load(slot, True)
+                health.set_state(slot, IDLE, "")
+            elif kind in CAPTURE_TARGETS:
+                capture_args, capture_kwargs = pickle.loads(payload)
+                args = capture_args + tuple(capture_kwargs.values())
+                _attach_lock(args, schedule_lock)
+                health.set_state(slot, RUNNING, "")
+                CAPTURE_TARGETS[kind](*capture_args, target_fps=target_fps,
+                                      stop_event=SessionToken(session_counter, session), health=reporter,
+                                      **capture_kwargs)
+                health.set_state(slot, IDLE)
+            elif kind in DETECT_TARGETS:
+                reason = f"（{load_error}）" if load_error else ""
+                if model is None:
+                    raise RuntimeError(f"模型未加载{reason}")
+                if cascade_path and fast_model is None:
+                    raise RuntimeError(f"级联小模型未加载：{cascade_path}{reason}")
+                detect_args, detect_kwargs = pickle.loads(payload)
+                args = detect_args + tuple(detect_kwargs.values())
+                _attach_lock(args, schedule_lock)
+                detector = model if fast_model is None else ModelCascade(fast_model, model)
+                health.set_state(slot, RUNNING, "")
+                DETECT_TARGETS[kind](detector, device, *detect_args, target_fps=target_fps,
+                                     stop_event=SessionToken(session_counter, session), health=reporter,
+                                     **detect_kwargs)
+                health.set_state(slot, IDLE)
+        except Exception as e:
+            if kind == "load":
+                load_error = str(e)
+                health.record_load(slot, False)
+            health.set_state(slot, ERROR, f"{kind}: {e}")
+            print(f"[工作进程 {index}] 任务 {kind} 出错：{e}")
+        finally:
+            _close_shared(args)
+
+
+class WorkerPool:
+    """按需扩容的常驻工作进程池；检测工作进程按 0, 1, 2... 编号，采集使用单独的工作进程"""
+
+    def __init__(self, target_fps):
+        self.target_fps = target_fps
+        self.session_counter = multiprocessing.Value("i", 0, lock=False)
+        self.health = SharedWorkerHealth(1 + MAX_POOL_WORKERS)
+        self._workers = {}  # key -> (进程, 命令队列)
+        self._jobs = {}  # 本次会话派发的任务：key -> 命令
+        self._thread_plans = {}  # 各工作进程的线程规划（重建工作进程后重新下发）
+        self.schedule_lock = multiprocessing.Lock()  # 多窗口调度表的锁（只能在创建进程时传入）
+        self._model_paths = None  # (模型路径, 级联小模型路径)
+        # 主线程（派发、停止）和监控线程（重启）都会修改 _workers/_jobs
+        self._lock = threading.RLock()
+
+    @property
+    def session(self):
+        return self.session_counter.value
+
+    @staticmethod
+    def _slot(key):
+        return CAPTURE_WORKER_SLOT if key == CAPTURE_WORKER else worker_slot(key)
+
+    def _spawn(self, key):
+        commands = multiprocessing.Queue()
+        slot = self._slot(key)
+        p = multiprocessing.Process(target=_worker_main, args=(key, commands, self.session_counter,
+                                                               self.target_fps, self.health, slot,
+                                                               self.schedule_lock))
+        p.daemon = True
+        # 线程规划开启时，子进程 import torch/numpy 时先按单线程初始化，之后由线程规划设置实际线程数
+        with single_threaded_env() if THREAD_PLANNING else nullcontext():
+            p.start()
+        self.health.set_pid(slot, p.pid)
+        self._workers[key] = (p, commands)
+
+    def _ensure(self, count):
+        """调用方需持有 _lock（_spawn、_submit 同）"""
+        if count > MAX_POOL_WORKERS:
+            raise ValueError(f"检测工作进程数 {count} 超过上限 MAX_POOL_WORKERS={MAX_POOL_WORKERS}")
+        for key in [CAPTURE_WORKER] + list(range(count)):
+            worker = self._workers.get(key)
+            if worker is None or not worker[0].is_alive():
+                self._spawn(key)  # 新建或替换意外退出的工作进程
+
+    def configure_threads(self, plans):
+        """下发 detection.threads.plan_threads() 的规划（在 load 之前调用，模型加载和预热即使用规划的线程数）"""
+        with self._lock:
+            self._ensure(max((key for key in plans if key != CAPTURE_WORKER), default=-1) + 1)
+            for key, plan in plans.items():
+                if plan != self._thread_plans.get(key):
+                    self._thread_plans[key] = plan
+                    self._workers[key][1].put(("threads", None, plan))
+
+    def load(self, model_path, count, fast_model_path=None):
+        """让前 count 个检测工作进程加载 model_path；已加载同一模型的工作进程直接跳过，不阻塞调用方
+
+        fast_model_path 不为 None 时开启模型级联，工作进程额外常驻该小模型。
+        """
+        with self._lock:
+            self._ensure(count)
+            self._model_paths = (model_path, fast_model_path)
+            for i in range(count):
+                self.health.record_load(worker_slot(i), True)  # 新的加载请求重新计算连续失败次数
+                self._workers[i][1].put(("load", None, self._model_paths))
+
+    def _submit(self, key, command):
+        self._jobs[key] = command
+        self._workers[key][1].put(command)
+
+    def run_capture(self, source, frame_ring, metrics, layout=None):
+        with self._lock:
+            self._ensure(0)
+            payload = pickle.dumps(((source, frame_ring), {"metrics": metrics, "layout": layout}))
+            self._submit(CAPTURE_WORKER, ("capture", self.session, payload))
+
+    def run_capture_windows(self, sources, frame_rings, scheduler, metrics, layouts=None):
+        """多窗口模式：由同一个采集工作进程轮流为所有窗口截图"""
+        with self._lock:
+            self._ensure(0)
+            payload = pickle.dumps(((list(sources), list(frame_rings), scheduler),
+                                    {"metrics": metrics, "layouts": layouts}))
+            self._submit(CAPTURE_WORKER, ("windows", self.session, payload))
+
+    def run_detect(self, index, target, args, **kwargs):
+        """让第 index 个检测工作进程执行 DETECT_TARGETS 中的检测循环（target 为 "region"、"batched"、"roi" 或 "scheduled"）
+
+        args 为位置参数（模型、设备、目标帧率、停止事件和心跳由工作进程补充），kwargs 如 metrics、layout。
+        """
+        with self._lock:
+            self._submit(index, (target, self.session, pickle.dumps((tuple(args), kwargs))))
+
+    def active_workers(self):
+        """本次会话有任务的工作进程"""
+        with self._lock:
+            return list(self._jobs)
+
+    def status(self, key):
+        """返回 (进程是否存活, 健康状态)"""
+        with self._lock:
+            p, _ = self._workers[key]
+            return p.is_alive(), self.health.read(self._slot(key))
+
+    def restart(self, key, hard=False):
+        """重新派发 key 在本次会话中的任务；hard=True 时先结束并重建工作进程（崩溃或卡死）"""
+        with self._lock:
+            command = self._jobs.get(key)
+            if command is None or command[1] != self.session:
+                return
+            slot = self._slot(key)
+            if hard:
+                p, _ = self._workers[key]
+                if p.is_alive():
+                    p.terminate()
+                    p.join(timeout=1.0)
+                self.health.set_state(slot, DEAD)
+                self._spawn(key)
+                if key in self._thread_plans:
+                    self._workers[key][1].put(("threads", None, self._thread_plans[key]))
+            self.health.add_restart(slot)
+            if key != CAPTURE_WORKER:
+                self._workers[key][1].put(("load", None, self._model_paths))
+            self._workers[key][1].put(command)
+
+    def worker_health(self):
+        """{工作进程名: 健康状态}，只包含已创建的工作进程"""
+        with self._lock:
+            workers = dict(self._workers)  # 只在锁内取快照，界面刷新不等待进行中的重启
+        report = {}
+        for key in sorted(workers, key=lambda k: -1 if k == CAPTURE_WORKER else k):
+            health = self.health.read(self._slot(key))
+            if not workers[key][0].is_alive():
+                health["state"] = DEAD
+            report["采集" if key == CAPTURE_WORKER else f"worker{key}"] = health
+        return report
+
+    def stop(self):
+        """结束当前会话：运行中的任务在下一个节拍退出，模型保持加载"""
+        with self._lock:
+            self.session_counter.value += 1
+            self._jobs.clear()
+
+    def shutdown(self, timeout=2.0):
+        with self._lock:
+            self.stop()
+            for _, commands in self._workers.values():
+                commands.put(("shutdown",))
+            for p, _ in self._workers.values():
+                p.join(timeout=timeout)
+                if p.is_alive():
+                    p.terminate()
+            self._workers.clear()
+            self.health.close()
@@ -0,0 +1,86 @@
+# gui/canvas_view.py
+"""
+持久画布视图
+
+画布上始终只有一个图像项和一组可复用的矩形/文字项：每帧只更新发生变化的
+检测框坐标和标签，多余的项隐藏而不是删除，画布项数量不随运行时间增长，
+检测框的更新开销也与画面像素无关。
+"""
+
+
+class CanvasView:
+    def __init__(self, canvas, color="#00ff00", font=("Consolas", 9)):
+        self.canvas = canvas
+        self.color = color
+        self.font = font
+        self.image_item = None
+        self.photo = None  # 必须保留引用，否则图像消失
+        self._image_position = None
+        self._rects = []
+        self._texts = []
+        self._states = []  # 每个池化项最近一次的 (矩形坐标, 标签)，None 表示隐藏
+        self.visible = 0
+
+    def show_image(self, photo, x, y):
+        """显示画面；只在首次、PhotoImage 更换或位置变化时修改图像项"""
+        if self.image_item is None:
+            self.image_item = self.canvas.create_image(x, y, anchor="nw", image=photo)
+            self.canvas.tag_lower(self.image_item)
+        elif photo is not self.photo:
+            self.canvas.itemconfigure(self.image_item, image=photo)
+        if (x, y) != self._image_position:
+            self.canvas.coords(self.image_item, x, y)
+            self._image_position = (x, y)
+        self.photo = photo
+
+    def _grow(self, count):
+        while len(self._rects) < count:
+            self._rects.append(self.canvas.create_rectangle(0, 0, 0, 0, outline=self.color, width=2,
+                                                            state="hidden"))
+            self._texts.append(self.canvas.create_text(0, 0, anchor="sw", fill=self.color, font=self.font,
+                                                       state="hidden"))
+            self._states.append(None)
+
+    def show_detections(self, result, scale, x_offset, y_offset):
+        """把检测框（屏幕绝对坐标）换算到画布坐标后更新到池化的矩形/文字项上"""
+        monitor = result.app_region
+        detections = result.detections
+        self._grow(len(detections))
+
+        for k, det in enumerate(detections):
+            x1 = int((int(det["x1"]) - monitor["left"]) * scale) + x_offset
+            y1 = int((int(det["y1"]) - monitor["top"]) * scale) + y_offset
+            x2 = int((int(det["x2"]) - monitor["left"]) * scale) + x_offset
+            y2 = int((int(det["y2"]) - monitor["top"]) * scale) + y_offset
+            cls_name = result.names.get(int(det["cls"]), int(det["cls"]))
+            label = f"Class {cls_name}: {float(det['conf']):.2f}"
+            if det["track_id"] >= 0:
+                label = f"#{int(det['track_id'])} {label}"
+            state = ((x1, y1, x2, y2), label)
+            previous = self._states[k]
+            if state == previous:
+                continue
+            if previous is None:
+                self.canvas.itemconfigure(self._rects[k], state="normal")
+                self.canvas.itemconfigure(self._texts[k], state="normal")
+            if previous is None or previous[0] != state[0]:
+                self.canvas.coords(self._rects[k], x1, y1, x2, y2)
+                self.canvas.coords(self._texts[k], x1, max(y1 - 2, 12))
+            if previous is None or previous[1] != label:
+                self.canvas.itemconfigure(self._texts[k], text=label)
+            self._states[k] = state
+
+        # 多余的项隐藏，留待后续帧复用
+        for k in range(len(detections), self.visible):
+            self.canvas.itemconfigure(self._rects[k], state="hidden")
+            self.canvas.itemconfigure(self._texts[k], state="hidden")
+            self._states[k] = None
+        self.visible = len(detections)
+
+    def clear(self):
+        """隐藏所有检测框（停止检测时调用），保留画面和池化项"""
+        for k in range(self.visible):
+            self.canvas.itemconfigure(self._rects[k], state="hidden")
+            self.canvas.itemconfigure(self._texts[k], state="hidden")
+            self._states[k] = None
+        self.visible = 0
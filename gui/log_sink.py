@@ -0,0 +1,125 @@
+# gui/log_sink.py
+"""
+结果面板的批量日志输出
+
+任意线程调用 write() 只把消息放进缓冲区；主循环按 LOG_FLUSH_HZ 定时把缓冲的消息
+合并成一次插入，短时间内连续重复的消息折叠为一行并注明重复次数和最后一次的时间，
+面板超过 LOG_MAX_LINES 行时删除最早的行。可选同时写入滚动日志文件。
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+import tkinter as tk
+
+from config import (LOG_FLUSH_HZ, LOG_MAX_LINES, LOG_MAX_PENDING, LOG_FILE_PATH, LOG_FILE_MAX_BYTES,
+                    LOG_FILE_BACKUPS)
+
+
+class LogSink:
+    REPEAT_SUMMARY_INTERVAL = 5.0  # 消息持续重复时，至少隔多少秒输出一次重复计数
+    REPEAT_WINDOW = 5.0  # 与上一条相同的消息相隔超过该时间时作为新消息输出，而不是计为重复
+
+    def __init__(self, root, text_widget, flush_hz=LOG_FLUSH_HZ, max_lines=LOG_MAX_LINES,
+                 max_pending=LOG_MAX_PENDING, file_path=LOG_FILE_PATH):
+        self.root = root
+        self.text_widget = text_widget
+        self.interval_ms = max(1, int(1000 / flush_hz))
+        self.max_lines = max_lines
+        self._pending = deque(maxlen=max_pending)
+        self._lock = threading.Lock()
+        self._last_message = None
+        self._last_time = 0.0  # 上一条消息（或其最后一次重复）的时间
+        self._last_repeat = 0.0  # 最后一次重复的时间（time.time()，用于显示）
+        self._repeats = 0
+        self._last_summary = time.monotonic()
+        self._after_id = None
+        self.dropped = 0
+        self._file_logger = self._open_file_logger(file_path) if file_path else None
+
+    @staticmethod
+    def _open_file_logger(path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        logger = logging.getLogger(f"yolo_gui.{os.path.abspath(path)}")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        if not logger.handlers:
+            handler = RotatingFileHandler(path, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS,
+                                          encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            logger.addHandler(handler)
+        return logger
+
+    def write(self, msg):
+        """缓冲一条消息（任意线程）"""
+        with self._lock:
+            now = time.monotonic()
+            if msg == self._last_message and now - self._last_time <= self.REPEAT_WINDOW:
+                self._repeats += 1  # 短时间内连续重复的消息只计数，刷新时折叠为一行
+                self._last_time = now
+                self._last_repeat = time.time()
+                return
+            self._push_repeats()
+            self._append(msg)
+            self._last_message = msg
+            self._last_time = now
+        if self._file_logger is not None:
+            self._file_logger.info(msg)
+
+    def _append(self, line):
+        """调用方需持有 _lock；缓冲区已满时最旧的消息被挤出，计入 dropped"""
+        if len(self._pending) == self._pending.maxlen:
+            self.dropped += 1
+        self._pending.append(line)
+
+    def _push_repeats(self):
+        if self._repeats:
+            last = time.strftime("%H:%M:%S", time.localtime(self._last_repeat))
+            self._append(f"    （上一条消息重复 {self._repeats} 次，最后一次 {last}）")
+            if self._file_logger is not None:
+                self._file_logger.info(f"上一条消息重复 {self._repeats} 次：{self._last_message}")
+            self._repeats = 0
+        self._last_summary = time.monotonic()
+
+    def start(self):
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval_ms, self._flush_loop)
+
+    def stop(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        with self._lock:
+            self._push_repeats()
+        self.flush()
+
+    def _flush_loop(self):
+        try:
+            self.flush()
+        finally:
+            self._after_id = self.root.after(self.interval_ms, self._flush_loop)
+
+    def flush(self):
+        """把缓冲的消息一次性写入面板（主线程）"""
+        with self._lock:
+            if self._repeats and time.monotonic() - self._last_summary >= self.REPEAT_SUMMARY_INTERVAL:
+                self._push_repeats()
+            if not self._pending:
+                return
+            lines = list(self._pending)
+            self._pending.clear()
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            lines.insert(0, f"⚠️ 日志过多，已丢弃 {dropped} 条")
+
+        self.text_widget.insert(tk.END, "\n".join(lines) + "\n")
+        # 超过行数上限时删除最早的行（Text 末尾总有一个空行）
+        line_count = int(self.text_widget.index("end-1c").split(".")[0]) - 1
+        if line_count > self.max_lines:
+            self.text_widget.delete("1.0", f"{line_count - self.max_lines + 1}.0")
+        self.text_widget.see(tk.END)
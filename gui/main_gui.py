@@ -1,18 +1,27 @@
-import multiprocessing
-import queue
 import threading
+import time
 import tkinter as tk
 from tkinter import messagebox, ttk, filedialog
-from PIL import Image, ImageTk
-import cv2
-import mss
-import numpy as np
 import os
 import glob
-
-from detection.detector import detect_region
+import re
+from functools import partial
+
+from detection.engine import DetectionEngine
+from detection.metrics import format_metrics
+from detection.multi_engine import MultiWindowEngine
+from detection.scheduler import format_schedule
+from detection.supervisor import format_health
+from gui.canvas_view import CanvasView
+from gui.log_sink import LogSink
+from gui.renderer import FrameRenderer
+from gui.ui_channel import UIChannel
+from detection.pacing import RateController
 from utils.app_window_utils import list_all_visible_apps, get_app_window_region, divide_region
-from config import MODELS_FOLDER, DEFAULT_MODEL, SUPPORTED_MODEL_EXTENSIONS
+from utils.window_tracker import WindowTracker
+from config import (MODELS_FOLDER, DEFAULT_MODEL, SUPPORTED_MODEL_EXTENSIONS, DETECTION_MODES,
+                    DEFAULT_DETECTION_MODE, DEFAULT_TARGET_FPS, TRACKING_ENABLED, KEYFRAME_INTERVAL,
+                    CASCADE_ENABLED, CASCADE_FAST_MODEL, DEFAULT_WINDOW_PRIORITY, WINDOW_LIST_SEPARATORS)
 
 
 class AppYOLOMultiRegionGUI:
@@ -23,27 +32,35 @@ class AppYOLOMultiRegionGUI:
 
         self.is_detecting = False
         self.detection_thread = None
-        self.processes = []
-        self.shared_list = None
-        self.manager = None
-        self.image_queue = queue.Queue(maxsize=5)  # 最多保存 5 帧图像
+        self.window_trackers = []
+        self.detect_session = 0  # 每次停止检测加一，跟踪线程投递的旧事件据此丢弃
+        # 单个窗口使用 DetectionEngine，多个窗口使用共享工作进程池的 MultiWindowEngine
+        self.engine = DetectionEngine()
+        # 后台线程不直接操作 Tk 控件：画面经最新帧邮箱、其余操作经事件队列交给主线程
+        self.ui = UIChannel(root, on_frame=self.show_frame)
+        self.renderer = FrameRenderer()
+        self.canvas_size = (1, 1)  # 由 <Configure> 事件更新，后台线程只读
         self.app_region = None
+        self.window_regions = []
         self.region_divisions = []
         self.mode = None
         self.selected_model_path = DEFAULT_MODEL
         self.setup_ui()
         self.frame_stack = []  # 每一项是一个元组 (frame, detections)，或者更复杂的对象
         self.max_stack_size = 5  # 最多保存 5 帧z
+        # 关闭窗口时结束常驻工作进程
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def setup_ui(self):
         # --- App 选择区 ---
         input_frame = tk.Frame(self.root)
         input_frame.pack(pady=10, padx=10, fill="x")
 
-        tk.Label(input_frame, text="📱 输入要监控的 App 窗口标题关键字：").pack(anchor="w")
+        tk.Label(input_frame, text="📱 输入要监控的 App 窗口标题关键字（多个窗口用 ; 分隔，关键字后加 @数字 设置优先级）：").pack(anchor="w")
         self.app_entry = tk.Entry(input_frame, width=30)
         self.app_entry.pack(anchor="w", pady=5)
         self.app_entry.insert(0, "Chrome")
+        self.app_entry.bind("<KeyRelease>", lambda event: self.update_mode_controls())
 
         # --- 模型选择区和App列表区（同一行） ---
         control_frame = tk.Frame(input_frame)
@@ -113,14 +130,61 @@ class AppYOLOMultiRegionGUI:
 
         self.stop_btn = tk.Button(btn_frame, text="⏹️ 停止检测", command=self.stop_detection, state=tk.DISABLED)
         self.stop_btn.pack(side=tk.LEFT, padx=5)
+
+        # 目标帧率（运行中可调）
+        tk.Label(btn_frame, text="🎯 目标 FPS（0=不限速）：").pack(side=tk.LEFT, padx=(15, 0))
+        self.target_fps_var = tk.IntVar(value=DEFAULT_TARGET_FPS)
+        fps_spinbox = tk.Spinbox(btn_frame, from_=0, to=60, width=4, textvariable=self.target_fps_var,
+                                 command=self.on_target_fps_changed)
+        fps_spinbox.pack(side=tk.LEFT)
+        fps_spinbox.bind("<Return>", lambda event: self.on_target_fps_changed())
+        fps_spinbox.bind("<FocusOut>", lambda event: self.on_target_fps_changed())
+
+        # 检测模式（启动时生效）
+        tk.Label(btn_frame, text="⚙️ 检测模式：").pack(side=tk.LEFT, padx=(15, 0))
+        self.mode = tk.StringVar(value=DEFAULT_DETECTION_MODE)
+        self.mode_buttons = []
+        self.single_window_controls = []  # 多窗口监控不支持的设置，输入多个窗口时禁用
+        for mode, label in DETECTION_MODES.items():
+            rb = tk.Radiobutton(btn_frame, text=label, variable=self.mode, value=mode)
+            rb.pack(side=tk.LEFT)
+            self.mode_buttons.append(rb)
+            self.single_window_controls.append(rb)
+        # 跟踪模式：每隔几帧检测一次，中间帧用光流移动检测框并显示目标编号
+        self.tracking_var = tk.BooleanVar(value=TRACKING_ENABLED)
+        tracking_check = tk.Checkbutton(btn_frame, text="🎯 跟踪", variable=self.tracking_var)
+        tracking_check.pack(side=tk.LEFT, padx=(5, 0))
+        self.mode_buttons.append(tracking_check)
+        self.single_window_controls.append(tracking_check)
+        # 模型级联：小模型持续筛查，发现候选目标时才用所选模型复检
+        self.cascade_var = tk.BooleanVar(value=CASCADE_ENABLED)
+        cascade_check = tk.Checkbutton(btn_frame, text="🪜 级联", variable=self.cascade_var)
+        cascade_check.pack(side=tk.LEFT, padx=(5, 0))
+        self.mode_buttons.append(cascade_check)
         
         # --- Canvas 显示区域 ---
         canvas_frame = tk.Frame(self.root)
         canvas_frame.pack(pady=10, padx=10, fill="both", expand=True)
 
-        tk.Label(canvas_frame, text="🖥️ 实时检测画面（App 窗口 + 检测框）：").pack(anchor="w")
+        display_frame = tk.Frame(canvas_frame)
+        display_frame.pack(anchor="w", fill="x")
+        tk.Label(display_frame, text="🖥️ 实时检测画面（App 窗口 + 检测框）：").pack(side=tk.LEFT)
+        # 多窗口监控时选择显示哪个窗口
+        self.display_combo = ttk.Combobox(display_frame, state="readonly", width=40)
+        self.display_combo.pack(side=tk.LEFT, padx=5)
+        self.display_combo.bind("<<ComboboxSelected>>", self.on_display_window_selected)
+
+        # 性能统计（各阶段耗时 p50/p95/p99，每秒刷新）
+        self.metrics_label = tk.Label(canvas_frame, text="", fg="gray25", font=("Consolas", 9), justify=tk.LEFT)
+        self.metrics_label.pack(anchor="w")
+        # 工作进程健康状态（心跳、最近出帧时间、重启次数）
+        self.health_label = tk.Label(canvas_frame, text="", fg="gray25", font=("Consolas", 9), justify=tk.LEFT)
+        self.health_label.pack(anchor="w")
         self.canvas = tk.Canvas(canvas_frame, bg="black", height=400)
         self.canvas.pack(fill="both", expand=True)
+        # 画布上只保留一个图像项和一组复用的检测框项
+        self.canvas_view = CanvasView(self.canvas)
+        self.canvas.bind("<Configure>", self.on_canvas_resized)
 
         # --- 检测结果文本框 ---
         result_frame = tk.Frame(self.root)
@@ -129,9 +193,49 @@ class AppYOLOMultiRegionGUI:
         tk.Label(result_frame, text="📋 实时检测结果（类别 + 置信度 + 区域）：").pack(anchor="w")
         self.result_text = tk.Text(result_frame, height=12)
         self.result_text.pack(fill="both", expand=True)
+        # 日志先缓冲，定时合并写入面板
+        self.log_sink = LogSink(self.root, self.result_text)
+        self.log_sink.start()
         
         # 初始化模型列表
         self.refresh_model_list()
+        self.update_metrics_label()
+        self.ui.start()
+
+    def on_close(self):
+        if self.is_detecting:
+            self.stop_detection()
+        self.engine.shutdown()
+        self.log_sink.stop()
+        self.ui.stop()
+        self.root.destroy()
+
+    def on_canvas_resized(self, event):
+        self.canvas_size = (event.width, event.height)
+
+    def update_metrics_label(self):
+        """在主线程中每秒刷新一次性能统计和工作进程健康状态；工作进程无法恢复时结束检测"""
+        error = self.engine.error if self.is_detecting else None
+        if error is not None:
+            self.log(f"❌ {error}")
+            self.stop_detection()
+            messagebox.showerror("错误", f"检测已停止：{error}")
+        if self.engine.is_running:
+            text = format_metrics(self.engine.metrics())
+            self.metrics_label.config(text=f"📊 各阶段耗时 p50/p95/p99：\n{text}" if text else "📊 等待性能数据...")
+            health = f"🩺 工作进程：{format_health(self.engine.health())}"
+            if self.is_multi_window():
+                health += f"\n⚖️ 窗口调度：{format_schedule(self.engine.schedule())}"
+            self.health_label.config(text=health)
+        self.root.after(1000, self.update_metrics_label)
+
+    def on_target_fps_changed(self):
+        """目标帧率变化时写入共享值，采集、检测和显示循环下一个节拍即生效；0 表示不限速（仍受 CPU_BUDGET 限制）"""
+        try:
+            fps = int(self.target_fps_var.get())
+        except (tk.TclError, ValueError):
+            return
+        self.engine.target_fps.value = max(0, min(fps, 60))
 
     def browse_model_file(self):
         """浏览并选择模型文件"""
@@ -230,9 +334,8 @@ class AppYOLOMultiRegionGUI:
             self.model_info_label.config(text="⚠️ 模型文件不存在", fg="orange")
             
     def log(self, msg):
-        self.result_text.insert(tk.END, f"{msg}\n")
-        self.result_text.see(tk.END)
-        self.root.update()
+        """任意线程都可调用：消息进入日志缓冲区，由主循环按固定频率批量写入面板"""
+        self.log_sink.write(msg)
 
     def list_visible_apps(self):
         apps = list_all_visible_apps()
@@ -315,15 +418,55 @@ class AppYOLOMultiRegionGUI:
         print(f"[INFO] 用户选择了 App：{app_title}")
         self.app_entry.delete(0, tk.END)
         self.app_entry.insert(0, app_title)  # 将选中的 App 名称填入输入框
+        self.update_mode_controls()
         self.log(f"✅ 已选择 App（通过按钮）：{app_title}")
 
+    def parse_window_keywords(self):
+        """把输入框内容拆成 [(窗口标题关键字, 优先级), ...]，例如 "Chrome@2; 记事本" """
+        windows = []
+        for part in re.split(f"[{re.escape(WINDOW_LIST_SEPARATORS)}]", self.app_entry.get()):
+            keyword, priority = part.strip(), DEFAULT_WINDOW_PRIORITY
+            head, sep, tail = keyword.rpartition("@")
+            if sep and head.strip():
+                try:
+                    keyword, priority = head.strip(), float(tail)
+                except ValueError:
+                    pass  # 标题本身含有 @
+            if keyword:
+                windows.append((keyword, priority))
+        return windows
+
     def get_app_region(self):
-        app_name = self.app_entry.get().strip()
-        if not app_name:
+        windows = self.parse_window_keywords()
+        if not windows:
             raise Exception("请输入 App 名称")
-        self.app_region = get_app_window_region(app_name)
+        self.window_regions = []
+        for keyword, _ in windows:
+            region = get_app_window_region(keyword)
+            self.window_regions.append(region)
+            self.log(f"✅ 已选择 App：{region['title']} | 区域：{region}")
+        self.app_region = self.window_regions[0]
         self.region_divisions = divide_region(self.app_region)
-        self.log(f"✅ 已选择 App：{self.app_region['title']} | 区域：{self.app_region}")
+        return windows
+
+    def update_mode_controls(self):
+        """输入多个窗口时禁用检测模式和跟踪（多窗口监控固定按窗口批量推理，不支持跟踪）"""
+        if self.is_detecting:
+            return
+        state = tk.DISABLED if len(self.parse_window_keywords()) > 1 else tk.NORMAL
+        for control in self.single_window_controls:
+            control.config(state=state)
+
+    def is_multi_window(self):
+        return isinstance(self.engine, MultiWindowEngine)
+
+    def use_engine(self, multi):
+        """按窗口数切换检测引擎；切换时结束另一种引擎的常驻工作进程，避免两份模型同时占用内存"""
+        if multi == self.is_multi_window():
+            return
+        self.engine.shutdown()
+        self.engine = MultiWindowEngine() if multi else DetectionEngine()
+        self.on_target_fps_changed()
 
     def start_detection(self):
         try:
@@ -333,29 +476,55 @@ class AppYOLOMultiRegionGUI:
             
             if not os.path.exists(self.selected_model_path):
                 raise Exception(f"模型文件不存在：{self.selected_model_path}")
+
+            cascade = self.cascade_var.get()  # 级联小模型是否存在由检测引擎检查
             
-            self.get_app_region()
+            windows = self.get_app_region()
+            multi = len(windows) > 1
+            self.use_engine(multi)
+            mode = self.mode.get()
             self.is_detecting = True
             self.start_btn.config(state=tk.DISABLED)
             self.stop_btn.config(state=tk.NORMAL)
-
-            self.manager = multiprocessing.Manager()
-            self.shared_list = [self.manager.list() for _ in range(4)]  # 所有子进程写入的检测结果
-
-            # 启动 4 个子进程，每个负责一个区域，传递选择的模型路径
-            i = 0
-            for region in self.region_divisions:
-                p = multiprocessing.Process(target=detect_region, args=(region, self.shared_list, i, self.selected_model_path))
-                i += 1
-                p.daemon = True
-                p.start()
-                self.processes.append(p)
+            for rb in self.mode_buttons:
+                rb.config(state=tk.DISABLED)
+
+            # 采集、检测进程和共享内存全部由检测引擎管理
+            tracking = self.tracking_var.get()
+            if multi and (tracking or mode == "roi"):
+                self.log("⚠️ 多窗口监控固定按窗口批量推理，跟踪和 ROI 聚焦模式不生效")
+            if multi:
+                # 多个窗口共用一组检测工作进程，按优先级和目标帧率调度
+                self.engine.start([{"region": region, "priority": priority}
+                                   for region, (_, priority) in zip(self.window_regions, windows)],
+                                  self.selected_model_path, cascade=cascade)
+            else:
+                self.engine.start(self.app_region, self.selected_model_path, mode, tracking=tracking,
+                                  cascade=cascade)
+            self.display_combo.config(values=[region["title"] for region in self.window_regions])
+            self.display_combo.current(0)
+
+            # 跟踪目标窗口：移动/缩放时实时更新区域切分，最小化时暂停截图
+            for index, (keyword, _) in enumerate(windows):
+                tracker = WindowTracker(
+                    keyword, partial(self.post_window_event, self.detect_session, self.on_window_changed, index),
+                    partial(self.post_window_event, self.detect_session, self.on_window_minimized, index),
+                    log=self.log)
+                tracker.start(self.window_regions[index])
+                self.window_trackers.append(tracker)
 
             # 启动检测结果显示线程
             self.detection_thread = threading.Thread(target=self.detection_display_loop, daemon=True)
             self.detection_thread.start()
 
-            self.log(f"🚀 检测已启动，使用模型：{os.path.basename(self.selected_model_path)}")
+            tracking_text = f"，跟踪：每 {KEYFRAME_INTERVAL} 帧检测一次" if tracking else ""
+            cascade_text = f"，级联筛查：{os.path.basename(CASCADE_FAST_MODEL)}" if cascade else ""
+            if multi:
+                mode_text = f"{len(windows)} 个窗口共用 {self.engine.worker_count} 个检测进程"
+            else:
+                mode_text = f"{DETECTION_MODES[mode]}模式{tracking_text}"
+            self.log(f"🚀 检测已启动（{mode_text}{cascade_text}），"
+                     f"使用模型：{os.path.basename(self.selected_model_path)}")
 
         except Exception as e:
             messagebox.showerror("错误", f"启动检测失败：{e}")
@@ -363,87 +532,104 @@ class AppYOLOMultiRegionGUI:
 
     def stop_detection(self):
         self.is_detecting = False
+        self.detect_session += 1
         self.start_btn.config(state=tk.NORMAL)
         self.stop_btn.config(state=tk.DISABLED)
-
-        for p in self.processes:
-            try:
-                p.terminate()
-            except:
-                pass
-        self.processes.clear()
+        for rb in self.mode_buttons:
+            rb.config(state=tk.NORMAL)
+        self.update_mode_controls()
+
+        for tracker in self.window_trackers:
+            tracker.stop()
+        self.window_trackers = []
+        # 等待显示线程退出后再停止引擎、释放共享内存
+        if self.detection_thread is not None:
+            self.detection_thread.join(timeout=1.0)
+            self.detection_thread = None
+        pending = self.ui.frames.take()
+        if pending is not None:
+            self.renderer.release(pending.buffers)
+        self.engine.stop()
+        self.canvas_view.clear()
         self.log("⏹️ 检测已停止")
 
-    def detection_display_loop(self):
-        sct = mss.mss()
-        app_region = self.app_region
-        if not app_region:
-            self.log("❌ 未获取到 App 区域，无法显示图像")
-            return
+    def on_display_window_selected(self, event=None):
+        """多窗口监控时切换画布上显示的窗口"""
+        if self.is_multi_window():
+            self.engine.display_index = self.display_combo.current()
 
-        monitor = {
-            "left": app_region["left"],
-            "top": app_region["top"],
-            "width": app_region["width"],
-            "height": app_region["height"]
-        }
+    def post_window_event(self, session, handler, index, value):
+        """窗口跟踪线程回调：投递到主线程执行，检测引擎只在主线程中启停和重新切分"""
+        self.ui.post(self.handle_window_event, session, handler, index, value)
 
-        try:
-            while self.is_detecting:
-                try:
-                    # =====================
-                    # 1. 截取当前最新屏幕图像（只截一次！）
-                    # =====================
-                    sct_img = sct.grab(monitor)
-                    frame = np.array(sct_img)
-                    frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+    def handle_window_event(self, session, handler, index, value):
+        # 停止检测（或已重新开始）之后才取出的旧事件直接丢弃
+        if self.is_detecting and session == self.detect_session:
+            handler(value, index)
 
-                    # =====================
-                    # 2. 绘制检测框（在当前帧上绘制！）
-                    # =====================
-                    for items in self.shared_list:  # 当前最新的检测结果
-                        for item in items:
-                            if item is not None:
-                                x1, y1, x2, y2, conf, cls_name, region_id, region_box = item
-                                abs_x1 = x1 + monitor["left"]
-                                abs_y1 = y1 + monitor["top"]
-                                abs_x2 = x2 + monitor["left"]
-                                abs_y2 = y2 + monitor["top"]
-                                cv2.rectangle(frame, (abs_x1, abs_y1), (abs_x2, abs_y2), (0, 255, 0), 2)
-                                label = f"Class {cls_name}: {conf:.2f}"
-                                cv2.putText(frame, label, (abs_x1, abs_y1 - 10),cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+    def on_window_changed(self, region, index=0):
+        """主线程：把新的窗口区域推送给运行中的检测引擎"""
+        try:
+            if self.is_multi_window():
+                restarted = self.engine.update_region(region, index)
+            else:
+                restarted = self.engine.update_region(region)
+            self.app_region = self.engine.app_region
+            self.region_divisions = self.engine.regions
+            action = "已按新尺寸重新切分区域" if restarted else "区域已实时更新"
+            self.log(f"🔄 窗口位置/尺寸变化，{action}：{region['width']}x{region['height']} @ ({region['left']}, {region['top']})")
+        except Exception as e:
+            self.log(f"❌ 更新窗口区域失败：{e}")
 
+    def on_window_minimized(self, minimized, index=0):
+        if self.is_multi_window():
+            self.engine.set_paused(minimized, index)
+        else:
+            self.engine.set_paused(minimized)
+        self.log("⏸️ 目标窗口已最小化，暂停截图" if minimized else "▶️ 目标窗口已恢复，继续截图")
 
+    def detection_display_loop(self):
+        """后台显示线程：取最新结果并缩放好画面，投递到最新帧邮箱，由主线程显示"""
+        pacer = RateController(self.engine.target_fps)
+        try:
+            while self.is_detecting:
+                try:
+                    # 会话可能因窗口缩放而快速重启，每次都取引擎当前的记录器
+                    recorder = self.engine.display_recorder
                     # =====================
-                    # 3. 转换为 PIL -> PhotoImage
+                    # 1. 从检测引擎取最新结果（画面与检测框来自同一帧，按帧尺寸合成到复用缓冲区）
                     # =====================
-                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    pil_image = Image.fromarray(frame_rgb)
-
-                    canvas_width = self.canvas.winfo_width()
-                    canvas_height = self.canvas.winfo_height()
-
-                    if canvas_width > 1 and canvas_height > 1:
-                        img_ratio = min(canvas_width / pil_image.width, canvas_height / pil_image.height)
-                        new_width = int(pil_image.width * img_ratio)
-                        new_height = int(pil_image.height * img_ratio)
-                        pil_image = pil_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-                    tk_image = ImageTk.PhotoImage(pil_image)
+                    result = self.engine.latest(out=self.renderer.frame_out)
+                    if result is None:
+                        time.sleep(0.005)
+                        continue
 
                     # =====================
-                    # 4. 清除上一帧，显示最新图像
+                    # 2. 缩放到画布尺寸，投递到邮箱；主线程尚未显示的旧帧直接丢弃
                     # =====================
-                    x_offset = (canvas_width - pil_image.width) // 2
-                    y_offset = (canvas_height - pil_image.height) // 2
-                    self.canvas.create_image(x_offset, y_offset, anchor="nw", image=tk_image)
-                    self.canvas.image = tk_image  # 必须保留引用，否则图像消失
+                    canvas_width, canvas_height = self.canvas_size
+                    rendered = self.renderer.prepare(result, canvas_width, canvas_height, recorder)
+                    displaced = self.ui.publish_frame(rendered)
+                    if displaced is not None:
+                        self.renderer.release(displaced.buffers)
 
                 except Exception as e:
                     self.log(f"渲染出错：{e}")
+                pacer.tick()
         except Exception as e:
             self.log(f"主循环出错：{e}")
-        finally:
-            sct.close()
-
 
+    def show_frame(self, rendered):
+        """主线程：原地更新 PhotoImage，画面居中显示，检测框以画布矢量项叠加（只更新变化的框）"""
+        if not self.is_detecting:
+            self.renderer.release(rendered.buffers)
+            return
+        recorder = self.engine.display_recorder
+        photo = self.renderer.present(rendered, recorder)
+        canvas_width, canvas_height = self.canvas_size
+        x_offset = (canvas_width - self.renderer.size[0]) // 2
+        y_offset = (canvas_height - self.renderer.size[1]) // 2
+        self.canvas_view.show_image(photo, x_offset, y_offset)
+        with recorder.time("draw"):
+            self.canvas_view.show_detections(rendered.result, self.renderer.scale, x_offset, y_offset)
+        recorder.frame_done()
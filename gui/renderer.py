@@ -0,0 +1,102 @@
+# gui/renderer.py
+"""
+低分配显示渲染器
+
+所有中间缓冲区按窗口/画布尺寸预先分配并复用：引擎把合成帧写入 frame_buffer，
+一次 cv2.resize 直接缩放到画布尺寸（缩小用 INTER_AREA，放大用 INTER_LINEAR），
+颜色转换写入与 PIL 图像共享内存的 RGBA 缓冲区，最后原地更新同一个 PhotoImage。
+只有画布或窗口尺寸变化时才重新分配。检测框不画进像素，由 gui/canvas_view.py
+以画布矢量项叠加显示。
+
+prepare() 只做 numpy/OpenCV 运算，在后台显示线程中调用；present() 操作 Tk 对象，
+必须在主线程中调用。两者之间通过 gui/ui_channel.py 的最新帧邮箱传递，
+缓冲区在三组之间轮换（后台写入、邮箱中、主线程显示），互不覆盖。
+"""
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+# 一帧已缩放好的画面：result 为对应的 DetectionResult，buffers 为所用的缓冲区组
+RenderedFrame = namedtuple("RenderedFrame", ["result", "buffers", "scale"])
+
+
+class _FrameBuffers:
+    """同一尺寸的一组缓冲区：缩放结果、RGBA 缓冲区和与之共享内存的 PIL 图像"""
+
+    def __init__(self, width, height):
+        self.size = (width, height)
+        self.scaled = np.empty((height, width, 3), dtype=np.uint8)
+        self.rgba = np.empty((height, width, 4), dtype=np.uint8)
+        # RGBA 模式下 PIL 直接引用 numpy 缓冲区，不再复制
+        self.pil_image = Image.frombuffer("RGBA", (width, height), self.rgba, "raw", "RGBA", 0, 1)
+
+
+class FrameRenderer:
+    def __init__(self, pool_size=3):
+        self.frame_buffer = None  # 窗口尺寸的 BGR 缓冲区，供 DetectionEngine.latest(out=...) 写入
+        self.photo = None  # 持久的 PhotoImage，每帧原地更新
+        self.size = (0, 0)  # 当前显示尺寸 (宽, 高)
+        self.scale = 1.0
+        self.size_changed = False
+        self.pool_size = pool_size
+        self._free = []
+        self._lock = threading.Lock()
+
+    def frame_out(self, height, width):
+        """返回窗口尺寸的复用缓冲区"""
+        if self.frame_buffer is None or self.frame_buffer.shape[:2] != (height, width):
+            self.frame_buffer = np.empty((height, width, 3), dtype=np.uint8)
+        return self.frame_buffer
+
+    def _acquire(self, width, height):
+        with self._lock:
+            while self._free:
+                buffers = self._free.pop()
+                if buffers.size == (width, height):
+                    return buffers
+        return _FrameBuffers(width, height)
+
+    def release(self, buffers):
+        """归还缓冲区组（例如邮箱中被新帧覆盖的旧帧）"""
+        with self._lock:
+            if len(self._free) < self.pool_size:
+                self._free.append(buffers)
+
+    def prepare(self, result, canvas_width, canvas_height, recorder=None):
+        """缩放并转换颜色（后台线程），返回 RenderedFrame"""
+        frame = result.frame
+        frame_height, frame_width = frame.shape[:2]
+        if canvas_width > 1 and canvas_height > 1:
+            scale = min(canvas_width / frame_width, canvas_height / frame_height)
+        else:
+            scale = 1.0
+        width = max(1, int(frame_width * scale))
+        height = max(1, int(frame_height * scale))
+
+        resize_start = time.perf_counter()
+        buffers = self._acquire(width, height)
+        # 一次缩放到画布尺寸，颜色转换写入与 PIL 共享的缓冲区
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        cv2.resize(frame, (width, height), dst=buffers.scaled, interpolation=interpolation)
+        cv2.cvtColor(buffers.scaled, cv2.COLOR_BGR2RGBA, dst=buffers.rgba)
+        if recorder is not None:
+            recorder.record("resize", time.perf_counter() - resize_start)
+        return RenderedFrame(result, buffers, scale)
+
+    def present(self, rendered, recorder=None):
+        """把 prepare() 的结果原地更新到持久 PhotoImage 中并返回它（主线程）"""
+        blit_start = time.perf_counter()
+        self.size_changed = rendered.buffers.size != self.size
+        if self.size_changed:
+            self.size = rendered.buffers.size
+            self.photo = ImageTk.PhotoImage("RGBA", self.size)
+        self.scale = rendered.scale
+        self.photo.paste(rendered.buffers.pil_image)
+        self.release(rendered.buffers)
+        if recorder is not None:
+            recorder.record("blit", time.perf_counter() - blit_start)
+        return self.photo
@@ -0,0 +1,97 @@
+# gui/ui_channel.py
+"""
+后台线程与 Tk 主循环之间的线程安全通道
+
+Tk 控件只能在主线程中操作。后台线程把画面投递到单槽“最新帧优先”邮箱
+（新帧直接覆盖未显示的旧帧），把其余界面操作（如窗口跟踪线程的移动/缩放/最小化事件）投递到有界事件队列；
+主循环通过 root.after 按固定刷新率取出并执行，不再在后台线程中调用 root.update()。
+"""
+import queue
+import threading
+
+from config import UI_REFRESH_FPS, UI_EVENT_QUEUE_SIZE, UI_MAX_EVENTS_PER_TICK
+
+
+class LatestMailbox:
+    """单槽邮箱：put 覆盖未取走的旧内容并返回它，take 取走当前内容"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._item = None
+        self.dropped = 0  # 未显示就被覆盖的帧数
+
+    def put(self, item):
+        with self._lock:
+            displaced = self._item
+            self._item = item
+        if displaced is not None:
+            self.dropped += 1
+        return displaced
+
+    def take(self):
+        with self._lock:
+            item = self._item
+            self._item = None
+        return item
+
+
+class UIChannel:
+    """on_frame(frame) 在主线程中处理邮箱里的最新帧；post(callback, *args) 投递任意界面操作"""
+
+    def __init__(self, root, on_frame=None, refresh_fps=UI_REFRESH_FPS, max_events=UI_EVENT_QUEUE_SIZE,
+                 events_per_tick=UI_MAX_EVENTS_PER_TICK):
+        self.root = root
+        self.on_frame = on_frame
+        self.interval_ms = max(1, int(1000 / refresh_fps))
+        self.events_per_tick = events_per_tick
+        self.frames = LatestMailbox()
+        self.events = queue.Queue(maxsize=max_events)
+        self.dropped_events = 0
+        self._after_id = None
+
+    def publish_frame(self, frame):
+        """投递最新帧（任意线程），返回被覆盖的旧帧以便调用方回收其缓冲区"""
+        return self.frames.put(frame)
+
+    def post(self, callback, *args):
+        """投递一个界面操作（任意线程）；队列已满时丢弃最旧的事件"""
+        while True:
+            try:
+                self.events.put_nowait((callback, args))
+                return
+            except queue.Full:
+                try:
+                    self.events.get_nowait()
+                    self.dropped_events += 1
+                except queue.Empty:
+                    pass
+
+    def start(self):
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    def stop(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _drain(self):
+        try:
+            for _ in range(self.events_per_tick):
+                try:
+                    callback, args = self.events.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    callback(*args)
+                except Exception as e:
+                    print(f"[界面通道] 事件处理出错：{e}")
+
+            frame = self.frames.take()
+            if frame is not None and self.on_frame is not None:
+                try:
+                    self.on_frame(frame)
+                except Exception as e:
+                    print(f"[界面通道] 画面显示出错：{e}")
+        finally:
+            self._after_id = self.root.after(self.interval_ms, self._drain)
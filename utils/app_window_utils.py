@@ -2,6 +2,8 @@
 
 import pygetwindow as gw
 
+from utils.tiling import tile_region
+
 
 def list_all_visible_apps():
     apps = []
@@ -11,13 +13,12 @@ def list_all_visible_apps():
             apps.append(title)
     return apps
 
-def get_app_window_region(app_name_keyword):
+def find_app_window(app_name_keyword):
+    """返回标题包含关键字的第一个窗口对象，找不到时返回 None"""
     windows = gw.getWindowsWithTitle(app_name_keyword)
-    if not windows:
-        raise Exception(f"未找到标题包含 '{app_name_keyword}' 的窗口")
-    win = windows[0]
-    if not win.visible:
-        raise Exception(f"窗口 '{win.title}' 当前不可见（可能已最小化）")
+    return windows[0] if windows else None
+
+def window_region(win):
     return {
         "left": win.left,
         "top": win.top,
@@ -26,18 +27,14 @@ def get_app_window_region(app_name_keyword):
         "title": win.title
     }
 
+def get_app_window_region(app_name_keyword):
+    win = find_app_window(app_name_keyword)
+    if win is None:
+        raise Exception(f"未找到标题包含 '{app_name_keyword}' 的窗口")
+    if not win.visible:
+        raise Exception(f"窗口 '{win.title}' 当前不可见（可能已最小化）")
+    return window_region(win)
+
 def divide_region(app_region):
-    left = app_region["left"]
-    top = app_region["top"]
-    w = app_region["width"]
-    h = app_region["height"]
-
-    region_width = w // 2
-    region_height = h // 2
-
-    return [
-        {"left": left, "top": top, "width": region_width, "height": region_height, "id": 0},  # 左上
-        {"left": left + region_width, "top": top, "width": region_width, "height": region_height, "id": 1},  # 右上
-        {"left": left, "top": top + region_height, "width": region_width, "height": region_height, "id": 2},  # 左下
-        {"left": left + region_width, "top": top + region_height, "width": region_width, "height": region_height, "id": 3},  # 右下
-    ]
\ No newline at end of file
+    """按 config 中的 TILE_ROWS × TILE_COLS（含重叠）切分窗口区域"""
+    return tile_region(app_region)
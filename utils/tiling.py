@@ -0,0 +1,52 @@
+# utils/tiling.py
+"""
+通用区域切分：rows × cols 网格，相邻区域可重叠，区域过小时自动减少行列数
+"""
+from config import TILE_ROWS, TILE_COLS, TILE_OVERLAP, MIN_TILE_SIZE
+
+
+def _axis_tiles(start, length, count, overlap):
+    """沿一个方向切分，返回 [(起点, 长度), ...]；最后一块与边缘对齐"""
+    if count <= 1 or length <= 0:
+        return [(start, length)]
+    size = -(-(length + (count - 1) * overlap) // count)  # 向上取整
+    size = min(size, length)
+    overlap = min(overlap, size - 1)  # 重叠小于区域边长，保证起点递增且不超出窗口
+    step = size - overlap
+    spans = []
+    for k in range(count):
+        offset = min(k * step, length - size)
+        spans.append((start + offset, size))
+    return spans
+
+
+def _fit_count(length, count, overlap, min_size):
+    """在保证每块不小于 min_size 且大于重叠宽度的前提下，返回最多可切的块数"""
+    while count > 1:
+        size = -(-(length + (count - 1) * overlap) // count)
+        if size >= min_size and size > overlap:
+            break
+        count -= 1
+    return max(count, 1)
+
+
+def tile_region(app_region, rows=TILE_ROWS, cols=TILE_COLS, overlap=TILE_OVERLAP, min_tile_size=MIN_TILE_SIZE):
+    """把窗口区域切分为 rows × cols 个（可重叠的）区域，按行优先编号
+
+    重叠宽度不小于窗口边长时该方向不再切分。
+    """
+    if overlap < 0:
+        raise ValueError(f"区域重叠不能为负数：{overlap}")
+    left = app_region["left"]
+    top = app_region["top"]
+    w = app_region["width"]
+    h = app_region["height"]
+
+    cols = _fit_count(w, cols, overlap, min_tile_size)
+    rows = _fit_count(h, rows, overlap, min_tile_size)
+
+    regions = []
+    for y, th in _axis_tiles(top, h, rows, overlap):
+        for x, tw in _axis_tiles(left, w, cols, overlap):
+            regions.append({"left": x, "top": y, "width": tw, "height": th, "id": len(regions)})
+    return regions
@@ -0,0 +1,86 @@
+# utils/window_tracker.py
+"""
+目标窗口跟踪
+
+后台线程按 WINDOW_POLL_INTERVAL 读取目标窗口的位置、尺寸和最小化状态。窗口句柄只在
+开始时（以及窗口关闭后重新出现时）按标题查找一次，之后每次只读取该窗口的几何信息，开销很小。
+
+- 窗口移动（尺寸不变）：立即回调 on_change
+- 窗口缩放：连续两次读取到相同尺寸后再回调，避免拖动边框过程中反复重新切分
+- 最小化 / 恢复：回调 on_minimized(True / False)
+"""
+import threading
+
+from config import WINDOW_POLL_INTERVAL
+from utils.app_window_utils import find_app_window, window_region
+
+
+class WindowTracker:
+    def __init__(self, title_keyword, on_change, on_minimized=None, interval=WINDOW_POLL_INTERVAL, log=print):
+        self.title_keyword = title_keyword
+        self.on_change = on_change
+        self.on_minimized = on_minimized
+        self.interval = interval
+        self.log = log
+        self._window = None
+        self._region = None  # 最近一次上报的窗口区域
+        self._pending = None  # 尺寸变化后等待稳定的区域
+        self._minimized = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, initial_region=None):
+        self._region = dict(initial_region) if initial_region else None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self._window = None
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                # 窗口已关闭或句柄失效：下次重新按标题查找
+                if self._window is not None:
+                    self.log(f"⚠️ 目标窗口暂时不可用：{e}")
+                self._window = None
+
+    def poll(self):
+        if self._window is None:
+            self._window = find_app_window(self.title_keyword)
+            if self._window is None:
+                return
+
+        minimized = bool(self._window.isMinimized)
+        if minimized != self._minimized:
+            self._minimized = minimized
+            if self.on_minimized is not None:
+                self.on_minimized(minimized)
+        if minimized:
+            return  # 最小化时的坐标没有意义（Windows 上为 -32000）
+
+        region = window_region(self._window)
+        if region["width"] <= 0 or region["height"] <= 0:
+            return
+        if self._region is not None and _same_geometry(region, self._region):
+            self._pending = None
+            return
+        resized = self._region is None or (region["width"], region["height"]) != (
+            self._region["width"], self._region["height"])
+        if resized and (self._pending is None or not _same_geometry(region, self._pending)):
+            self._pending = region  # 等下一次读取确认尺寸已稳定
+            return
+        self._pending = None
+        self._region = region
+        self.on_change(region)
+
+
+def _same_geometry(a, b):
+    return all(a[key] == b[key] for key in ("left", "top", "width", "height"))